@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Benchmark check throughput per check type against local stand-in servers.
+
+Synthetic EnvVars style configs of each size go through PrepareServiceChecks
+and ExecuteServiceCheck.arrange_service_check, without any student boxes.
+Run from the repository root:
+    python -m BenchmarkScripts.BenchEngine --sizes 10,100,1000 --save bench.json
+    python -m BenchmarkScripts.BenchEngine --latency-ms 20 --fail-rate 0.05 --compare bench.json
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from ServiceCheckScripts import CheckRegistry
+from ServiceCheckScripts import EventLoop
+from ServiceCheckScripts import ExecuteServiceCheck
+from ServiceCheckScripts import PrepareServiceChecks
+from ServiceCheckScripts.Scheduler import percentile
+from ServiceCheckScripts.Simulation import rss_bytes
+from BenchmarkScripts import StandInServers
+
+SERVICES = ("ICMP", "TCP", "HTTP", "HTTPS", "FTP", "SSH", "SQL")
+TARGETS_PER_TEAM = 4
+SQL_TABLE = "scores"
+SQL_TEST_DATA = {"team": "bench", "points": 1}
+
+
+def action_for(service: str, ports: dict, key_path: str, ca_file: str) -> dict:
+    """One EnvVars action of `service` pointed at the stand-ins."""
+    md5_sum = StandInServers.file_md5("test.txt")
+    match service:
+        case "ICMP":
+            return {"SERVICE_NAME": "ICMP"}
+        case "TCP":
+            return {"SERVICE_NAME": "TCP", "PORT": ports["TCP"]}
+        case "HTTP":
+            return {
+                "SERVICE_NAME": "HTTP",
+                "PORT": ports["HTTP"],
+                "URL": f"127.0.0.1:{ports['HTTP']}",
+                "PATH": StandInServers.PAGE_PATH,
+                "CONTAINS": "stand-in",
+            }
+        case "HTTPS":
+            return {
+                "SERVICE_NAME": "HTTPS",
+                "PORT": ports["HTTPS"],
+                "URL": "127.0.0.1",
+                "PATH": StandInServers.PAGE_PATH,
+                "CA_FILE": ca_file,
+                "CONTAINS": "stand-in",
+            }
+        case "FTP":
+            return {
+                "SERVICE_NAME": "FTP",
+                "PORT": ports["FTP"],
+                "FTP_USERNAME": "bench",
+                "FTP_PASSWORD": "bench",
+                "FTP_ACTION": "GET",
+                "FILES": ["test.txt"],
+                "MD5_SUM": [md5_sum],
+                "DIRECTORY": "/",
+            }
+        case "SSH":
+            return {
+                "SERVICE_NAME": "SSH",
+                "PORT": ports["SSH"],
+                "SSH_USERNAME": "bench",
+                "SSH_PRIV_KEY": key_path,
+                "SSH_SCRIPT": "md5sum test.txt",
+                "MD5_SUM": md5_sum,
+            }
+        case "SQL":
+            return {
+                "SERVICE_NAME": "SQL",
+                "SQL_USERNAME": "bench",
+                "SQL_PASSWORD": "bench",
+                "DB_NAME": "bench",
+                "TABLE_NAME": SQL_TABLE,
+                "TEST_DATA": SQL_TEST_DATA,
+            }
+
+
+def build_config(action: dict, count: int) -> dict:
+    """An EnvVars shaped config with `count` copies of the action over loopback targets."""
+    teams = []
+    for target_id in range(count):
+        team_index = target_id // TARGETS_PER_TEAM
+        if team_index == len(teams):
+            teams.append(
+                {
+                    "TEAM_NAME": f"bench{team_index}",
+                    "TEAM_ID": team_index + 1,
+                    "TARGETS": [],
+                }
+            )
+        teams[team_index]["TARGETS"].append(
+            {"ID": target_id + 1, "IP": "127.0.0.1", "ACTIONS": [dict(action)]}
+        )
+    return {"TEAMS": teams}
+
+
+async def run_checks(service_checks: list, concurrency: int) -> dict:
+    """Run the checks like a round would and measure them."""
+    plugins = CheckRegistry.load_plan(service_checks)
+    await CheckRegistry.setup_round(plugins)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    peak_threads = threading.active_count()
+    done = asyncio.Event()
+
+    async def sample_threads():
+        nonlocal peak_threads
+        while not done.is_set():
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.05)
+
+    async def run_one(service_check):
+        async with semaphore:
+            return await ExecuteServiceCheck.arrange_service_check(service_check)
+
+    sampler = asyncio.get_running_loop().create_task(sample_threads())
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    await asyncio.gather(*(run_one(service_check) for service_check in service_checks))
+    elapsed = time.perf_counter() - start
+    rss_after = rss_bytes()
+    # Executor threads outlive the checks, catch them if the run beat the sampler.
+    peak_threads = max(peak_threads, threading.active_count())
+    done.set()
+    await sampler
+    await CheckRegistry.teardown_round(plugins)
+
+    latencies = sorted(service_check.duration for service_check in service_checks)
+    results = collections.Counter(
+        service_check.result.result.value if service_check.result.result else "NONE"
+        for service_check in service_checks
+    )
+    return {
+        "seconds": round(elapsed, 4),
+        "checks_per_second": round(len(service_checks) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "peak_threads": peak_threads,
+        "rss_bytes_per_check": round((rss_after - rss_before) / len(service_checks), 1),
+        "results": dict(results),
+    }
+
+
+def start_stand_ins(args, tls_files) -> tuple:
+    """Start StandInServers in a child process and return it with its ports."""
+    command = [sys.executable, "-m", "BenchmarkScripts.StandInServers"]
+    command += [
+        "--latency-ms", str(args.latency_ms),
+        "--jitter", str(args.jitter),
+        "--fail-rate", str(args.fail_rate),
+        "--timeout-rate", str(args.timeout_rate),
+        "--hang-seconds", str(args.hang_seconds),
+    ]
+    if args.seed is not None:
+        command += ["--seed", str(args.seed)]
+    if tls_files:
+        command += ["--tls-cert", tls_files[0], "--tls-key", tls_files[1]]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    ports = json.loads(process.stdout.readline())
+    return process, ports
+
+
+def write_client_key(directory: str):
+    """Write a private key for the SSH checks, None without paramiko."""
+    try:
+        import paramiko
+    except ImportError:
+        return None
+    key_path = os.path.join(directory, "bench_ssh_key")
+    paramiko.RSAKey.generate(2048).write_private_key_file(key_path)
+    return key_path
+
+
+def unavailable(service: str, ports: dict, key_path, sql_ready: bool):
+    """Why a service can't be benchmarked here, or None if it can."""
+    try:
+        CheckRegistry.get_plugin(service)
+    except ImportError as e:
+        return f"check module needs {e.name}"
+    if service in ("TCP", "HTTP", "HTTPS", "FTP", "SSH") and service not in ports:
+        return "no stand-in (HTTPS needs --tls-cert/--tls-key, SSH needs paramiko)"
+    if service == "SSH" and not key_path:
+        return "paramiko is not installed"
+    if service == "SQL" and not sql_ready:
+        return "mysql-connector-python is not installed"
+    return None
+
+
+def compare(rows: list, baseline_path: str):
+    with open(baseline_path, encoding="utf-8") as baseline_file:
+        baseline = {
+            (row["service"], row["checks"]): row
+            for row in json.load(baseline_file)["rows"]
+        }
+    print(f"\nCompared with {baseline_path}:")
+    for row in rows:
+        before = baseline.get((row["service"], row["checks"]))
+        if before is None:
+            continue
+        print(
+            f"{row['service']:<6} {row['checks']:>6} checks  "
+            f"checks/s {before['checks_per_second']:>10.1f} -> {row['checks_per_second']:>10.1f} "
+            f"({(row['checks_per_second'] / before['checks_per_second'] - 1) * 100:+.1f}%)  "
+            f"p99 {before['p99_ms']:.1f} -> {row['p99_ms']:.1f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10,100,1000", help="check counts, up to 10000")
+    parser.add_argument("--services", default=",".join(SERVICES))
+    parser.add_argument("--concurrency", type=int, default=512, help="checks in flight at once")
+    parser.add_argument("--loop", choices=EventLoop.LOOPS, default="asyncio")
+    parser.add_argument("--tls-cert", help="certificate for the HTTPS stand-in, also used as CA_FILE")
+    parser.add_argument("--tls-key")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare against results saved by an earlier --save")
+    StandInServers.behavior_arguments(parser)
+    args = parser.parse_args()
+
+    EventLoop.install(args.loop)
+    tls_files = (args.tls_cert, args.tls_key) if args.tls_cert else None
+    stand_ins, ports = start_stand_ins(args, tls_files)
+    workdir = tempfile.mkdtemp(prefix="bench-engine-")
+    key_path = write_client_key(workdir)
+    sql_ready = StandInServers.install_sqlite_shim(
+        StandInServers.Behavior(StandInServers.behavior_settings(args), args.seed),
+        os.path.join(workdir, "bench.sqlite3"),
+        {SQL_TABLE: list(SQL_TEST_DATA)},
+    )
+
+    rows = []
+    try:
+        for service in args.services.split(","):
+            reason = unavailable(service, ports, key_path, sql_ready)
+            if reason:
+                print(f"{service:<6} skipped: {reason}")
+                continue
+            action = action_for(service, ports, key_path, args.tls_cert)
+            for size in (int(size) for size in args.sizes.split(",")):
+                service_checks = PrepareServiceChecks.prepare_service_check(
+                    build_config(action, size)
+                )
+                row = {"service": service, "checks": size}
+                row.update(asyncio.run(run_checks(service_checks, args.concurrency)))
+                rows.append(row)
+                print(
+                    f"{service:<6} {size:>6} checks  {row['checks_per_second']:>9.1f} checks/s  "
+                    f"p50 {row['p50_ms']:>8.2f} ms  p99 {row['p99_ms']:>8.2f} ms  "
+                    f"threads {row['peak_threads']:>3}  "
+                    f"{row['rss_bytes_per_check']:>8.0f} B/check  {row['results']}"
+                )
+    finally:
+        stand_ins.terminate()
+        stand_ins.wait()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as save_file:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "loop": EventLoop.selected,
+                    "concurrency": args.concurrency,
+                    "behavior": StandInServers.behavior_settings(args),
+                    "rows": rows,
+                },
+                save_file,
+                indent=2,
+            )
+    if args.compare:
+        compare(rows, args.compare)
+
+
+if __name__ == "__main__":
+    main()
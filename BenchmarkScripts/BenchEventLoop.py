@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Measure per-check overhead of the FairScheduler on each event loop implementation.
+
+Checks do no real work, so the time per check is what the loop and scheduler
+cost. The TCP scenario connects to a local listener to include socket handling.
+Run from the repository root:
+    python -m BenchmarkScripts.BenchEventLoop --checks 10000 --runs 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from ServiceCheckScripts import EventLoop
+from ServiceCheckScripts.Results import ServiceHealthCheck
+from ServiceCheckScripts.Scheduler import FairScheduler
+
+# Limits high enough that only loop and scheduler overhead is measured.
+UNLIMITED = {
+    "MAX_IN_FLIGHT": 1024,
+    "TEAM_MAX_IN_FLIGHT": 1024,
+    "TEAM_CONNECTS_PER_SECOND": 0,
+    "TARGET_MAX_IN_FLIGHT": 1024,
+    "TARGET_CONNECTS_PER_SECOND": 0,
+}
+
+
+def build_checks(count: int, teams: int) -> list:
+    return [
+        ServiceHealthCheck(
+            target_host=f"10.0.{index % teams}.{index % 10}",
+            team_name=f"team{index % teams}",
+            team_id=str(index % teams),
+            target_id=index,
+            service_name="TCP",
+        )
+        for index in range(count)
+    ]
+
+
+async def no_op_check(service_check):
+    await asyncio.sleep(0)
+    return service_check
+
+
+async def bare_gather(checks: list):
+    """Baseline without the scheduler, one task per check."""
+    await asyncio.gather(*(no_op_check(service_check) for service_check in checks))
+
+
+async def scheduled(checks: list):
+    scheduler = FairScheduler(UNLIMITED)
+    async for _ in scheduler.run_round(checks, no_op_check):
+        pass
+
+
+async def scheduled_tcp(checks: list):
+    async def accept(reader, writer):
+        writer.close()
+
+    server = await asyncio.start_server(accept, "127.0.0.1", 0, backlog=1024)
+    port = server.sockets[0].getsockname()[1]
+
+    async def connect_check(service_check):
+        _, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.close()
+        return service_check
+
+    scheduler = FairScheduler(dict(UNLIMITED, MAX_IN_FLIGHT=256))
+    async for _ in scheduler.run_round(checks, connect_check):
+        pass
+    server.close()
+    await server.wait_closed()
+
+
+SCENARIOS = {
+    "gather, no-op checks": (bare_gather, 1),
+    "scheduler, no-op checks": (scheduled, 1),
+    "scheduler, TCP connect": (scheduled_tcp, 10),
+}
+
+
+def run_scenario(scenario, checks: list, runs: int) -> list:
+    """Seconds per check for each run, each on a fresh loop."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        asyncio.run(scenario(checks))
+        samples.append((time.perf_counter() - start) / len(checks))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--checks", type=int, default=10000)
+    parser.add_argument("--teams", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--loops", default="asyncio,uvloop")
+    args = parser.parse_args()
+
+    for loop_name in args.loops.split(","):
+        if EventLoop.install(loop_name) != loop_name:
+            print(f"{loop_name}: not available ({EventLoop.fallback_reason}), skipped")
+            continue
+        for label, (scenario, divisor) in SCENARIOS.items():
+            checks = build_checks(max(1, args.checks // divisor), args.teams)
+            samples = run_scenario(scenario, checks, args.runs)
+            per_check = statistics.median(samples)
+            print(
+                f"{loop_name:<8} {label:<24} {len(checks):>6} checks  "
+                f"{per_check * 1e6:8.1f} us/check  {1 / per_check:>10,.0f} checks/s"
+            )
+    EventLoop.install("asyncio")
+
+
+if __name__ == "__main__":
+    main()
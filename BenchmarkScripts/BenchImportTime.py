@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Measure engine import time with the lazy check registry against importing
+every check module up front, as ExecuteServiceCheck used to.
+
+Each scenario runs in a fresh interpreter. Run from the repository root:
+    python -m BenchmarkScripts.BenchImportTime --runs 10
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+# Code timed in a fresh interpreter for each scenario.
+SCENARIOS = {
+    "eager (all check modules)": (
+        "from ServiceCheckScripts import CheckIcmp, CheckFTP, CheckSSH, CheckHTTP, CheckSQL"
+    ),
+    "registry, ICMP only plan": (
+        "from ServiceCheckScripts import ExecuteServiceCheck, CheckRegistry\n"
+        "CheckRegistry.get_plugin('ICMP')"
+    ),
+    "registry, no plan loaded": "from ServiceCheckScripts import ExecuteServiceCheck",
+}
+
+TIMER = """
+import time
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+"""
+
+
+def time_scenario(code: str, runs: int):
+    """Return the import times in seconds, or the error of the first failed run."""
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", TIMER.format(code=code)],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if completed.returncode != 0:
+            return completed.stderr.strip().splitlines()[-1]
+        samples.append(float(completed.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    for label, code in SCENARIOS.items():
+        samples = time_scenario(code, args.runs)
+        if isinstance(samples, str):
+            print(f"{label:<28} failed: {samples}")
+            continue
+        print(
+            f"{label:<28} median {statistics.median(samples) * 1000:8.2f} ms "
+            f"min {min(samples) * 1000:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
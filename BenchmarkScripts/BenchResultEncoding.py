@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-result encoding cost of the round exporter against
+FinalResult.json(), which goes through the ResultJSONEncoder default hook.
+
+Run from the repository root:
+    python -m BenchmarkScripts.BenchResultEncoding --count 20000
+"""
+import argparse
+import gzip
+import io
+import json
+import time
+
+from ServiceCheckScripts import Results
+from ServiceCheckScripts import ResultExport
+
+
+def build_checks(count: int) -> list:
+    """Create scored service checks with realistic feedback strings."""
+    checks = []
+    for index in range(count):
+        service_check = Results.ServiceHealthCheck(
+            target_host=f"10.0.{index % 250}.{index % 200}",
+            team_name=f"Team{index % 40}",
+            team_id=str(100000 + index % 40),
+            target_id=index % 500,
+            service_name="HTTP",
+            target_port="80",
+        )
+        service_check.result.success(
+            feedback=f"HTTP Accessible to host {service_check.target_host} for page index.html",
+            staff_feedback="status 200",
+        )
+        service_check.points = 25
+        service_check.duration = 0.0123
+        checks.append(service_check)
+    return checks
+
+
+def time_per_result(label: str, encode, checks: list):
+    """Encode every check once and print the average cost."""
+    start = time.perf_counter()
+    total_bytes = 0
+    for service_check in checks:
+        total_bytes += len(encode(service_check))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<28} {elapsed / len(checks) * 1e6:8.2f} us/result "
+        f"{total_bytes / len(checks):8.1f} bytes/result"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=20000)
+    args = parser.parse_args()
+
+    checks = build_checks(args.count)
+
+    time_per_result("FinalResult.json()", lambda c: c.result.json(), checks)
+
+    def hooked_record(service_check):
+        # Same record, but the ResultCode goes through the default hook.
+        record = ResultExport.build_record(service_check, 1, 0.0)
+        record["result"] = service_check.result.result
+        return json.dumps(record, cls=Results.ResultJSONEncoder)
+
+    time_per_result("record via default hook", hooked_record, checks)
+    time_per_result(
+        "precompiled record encoder",
+        lambda c: ResultExport.encode_record(ResultExport.build_record(c, 1, 0.0)),
+        checks,
+    )
+
+    # Full write path into an in-memory gzip stream.
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=5) as stream:
+        start = time.perf_counter()
+        for service_check in checks:
+            record = ResultExport.build_record(service_check, 1, 0.0)
+            stream.write(ResultExport.encode_record(record).encode())
+            stream.write(b"\n")
+        elapsed = time.perf_counter() - start
+    print(
+        f"{'encode + gzip write':<28} {elapsed / len(checks) * 1e6:8.2f} us/result "
+        f"{buffer.tell() / len(checks):8.1f} compressed bytes/result"
+    )
+
+
+if __name__ == "__main__":
+    main()
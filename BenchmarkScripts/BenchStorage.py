@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark round writes per second on each storage backend.
+
+Seeds teams, targets and ports rows, then persists rounds where every status
+row changed, the worst case for a round write. SQLite always runs in a
+temporary file, MySQL and PostgreSQL only when given a server to use.
+Run from the repository root:
+    python -m BenchmarkScripts.BenchStorage --rows 1000,10000
+    python -m BenchmarkScripts.BenchStorage --postgresql HOST=127.0.0.1,DATABASE=bench,USER=bench,PASSWORD=bench
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import uuid
+
+from DBScripts import StorageBackends
+from DBScripts.DeltaPersistence import RoundWrites
+
+SERVICES = ("ICMP", "TCP", "HTTP", "HTTPS", "FTP", "SSH", "SQL")
+TARGETS_PER_TEAM = 4
+
+
+def server_settings(backend_name: str, option: str) -> dict:
+    """ENGINE -> DATABASE style settings from a key=value,key=value option."""
+    settings = {"BACKEND": backend_name}
+    for pair in option.split(","):
+        key, value = pair.split("=", 1)
+        settings[key.strip().upper()] = value.strip()
+    return settings
+
+
+def layout(row_count: int) -> list:
+    """(team_id, target_id, service_name) keys for about row_count ports rows."""
+    keys = []
+    target_id = 0
+    while len(keys) < row_count:
+        target_id += 1
+        team_id = (target_id - 1) // TARGETS_PER_TEAM + 1
+        keys.extend((team_id, target_id, service) for service in SERVICES)
+    return keys[:row_count]
+
+
+def seed(backend: StorageBackends.StorageBackend, keys: list):
+    """Empty the tables and insert a team, target and ports row for every key."""
+    backend.create_schema()
+    sql = backend.sql
+    connection = backend.connect()
+    cursor = connection.cursor()
+    try:
+        for table in ("scoring_rounds", "ports", "targets", "teams"):
+            cursor.execute(f"DELETE FROM {table}")
+        team_ids = sorted({key[0] for key in keys})
+        target_ids = sorted({(key[1], key[0]) for key in keys})
+        cursor.executemany(
+            sql("INSERT INTO teams (team_id, name) VALUES (%s, %s)"),
+            [(team_id, f"bench{team_id}") for team_id in team_ids],
+        )
+        cursor.executemany(
+            sql("INSERT INTO targets (target_id, target_host, team_id) VALUES (%s, %s, %s)"),
+            [(target_id, "127.0.0.1", team_id) for target_id, team_id in target_ids],
+        )
+        cursor.executemany(
+            sql(
+                "INSERT INTO ports (service_name, port_number, result_code, participant_feedback, "
+                "staff_feedback, points_obtained, target_id, team_id) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
+            ),
+            [
+                (service, "0", "UNK", "", "", 0, target_id, team_id)
+                for team_id, target_id, service in keys
+            ],
+        )
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def round_writes(keys: list, round_number: int, run_id: str) -> RoundWrites:
+    """A round where every status row changed."""
+    writes = RoundWrites(round_number, run_id)
+    result_code = "SUC" if round_number % 2 else "FAL"
+    for key in keys:
+        writes.status_rows[key] = (
+            result_code,
+            f"Round {round_number} feedback for {key[2]}",
+            f"Round {round_number} staff feedback",
+            "22",
+            round_number % 2 * 25,
+        )
+        writes.team_points[key[0]] = writes.team_points.get(key[0], 0) + 25
+    return writes
+
+
+def run(backend: StorageBackends.StorageBackend, row_count: int, rounds: int) -> dict:
+    keys = layout(row_count)
+    seed(backend, keys)
+    run_id = uuid.uuid4().hex
+    timings = []
+    rows_written = 0
+    for round_number in range(1, rounds + 1):
+        writes = round_writes(keys, round_number, run_id)
+        start = time.perf_counter()
+        rows_written += backend.persist_round(writes)
+        timings.append(time.perf_counter() - start)
+    # A replayed round must be skipped, not applied twice.
+    replayed = backend.persist_round(round_writes(keys, rounds, run_id))
+    seconds = sum(timings)
+    return {
+        "rows_per_second": round(rows_written / seconds, 1),
+        "round_ms": round(seconds / rounds * 1000, 2),
+        "slowest_round_ms": round(max(timings) * 1000, 2),
+        "replay_skipped": replayed == 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", default="1000,10000", help="ports rows changed per round")
+    parser.add_argument("--rounds", type=int, default=5, help="rounds written per size")
+    parser.add_argument("--mysql", metavar="HOST=..,USER=..", help="MySQL server settings")
+    parser.add_argument("--postgresql", metavar="HOST=..,USER=..", help="PostgreSQL server settings")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-storage-")
+    backends = [
+        StorageBackends.create_backend(
+            {"BACKEND": "sqlite", "PATH": os.path.join(workdir, "bench.sqlite3")}
+        )
+    ]
+    for backend_name in ("mysql", "postgresql"):
+        option = getattr(args, backend_name)
+        if option:
+            backends.append(
+                StorageBackends.create_backend(server_settings(backend_name, option))
+            )
+        else:
+            print(
+                f"{backend_name:<10} skipped: "
+                f"pass --{backend_name} HOST=..,DATABASE=..,USER=..,PASSWORD=.."
+            )
+
+    rows = []
+    for backend in backends:
+        for row_count in (int(size) for size in args.rows.split(",")):
+            try:
+                row = {"backend": backend.name, "rows": row_count}
+                row.update(run(backend, row_count, args.rounds))
+            except ImportError as e:
+                print(f"{backend.name:<10} skipped: {e.name} is not installed")
+                break
+            rows.append(row)
+            print(
+                f"{backend.name:<10} {row_count:>7} rows/round  {row['rows_per_second']:>10.0f} rows/s  "
+                f"round {row['round_ms']:>8.1f} ms  slowest {row['slowest_round_ms']:>8.1f} ms  "
+                f"replay skipped: {row['replay_skipped']}"
+            )
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as save_file:
+            json.dump(
+                {"python": platform.python_version(), "rounds": args.rounds, "rows": rows},
+                save_file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
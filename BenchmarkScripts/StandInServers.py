@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Loopback stand-ins for the services the engine checks, for offline benchmarks.
+
+HTTP(S), FTP and SSH stand-ins run in this process (start it with
+`python -m BenchmarkScripts.StandInServers`), which prints one JSON line with
+their ports once everything is listening. SQL checks use a SQLite backed
+shim for mysql.connector.connect, installed in the process running the checks.
+
+Every connection draws an outcome: a delay from a log-normal distribution
+around LATENCY_MS, a failure with FAIL_RATE, or a hang with TIMEOUT_RATE.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import socket
+import sqlite3
+import ssl
+import threading
+import time
+
+from ServiceCheckScripts.LocalHTTPServer import LocalHTTPServer, Response
+
+DEFAULT_BEHAVIOR = {
+    "LATENCY_MS": 2.0,
+    "JITTER": 0.5,
+    "FAIL_RATE": 0.0,
+    "TIMEOUT_RATE": 0.0,
+    "HANG_SECONDS": 30.0,
+}
+
+FTP_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_items", "ftp_test_items")
+PAGE_PATH = "index.html"
+PAGE = b"<html><body><h1>stand-in</h1><p>scoring engine benchmark page</p></body></html>\n"
+
+OK = "ok"
+FAIL = "fail"
+HANG = "hang"
+
+
+class Behavior:
+    """Draws the outcome and delay of each connection."""
+
+    def __init__(self, settings: dict = None, seed: int = None):
+        config = dict(DEFAULT_BEHAVIOR)
+        config.update(settings or {})
+        self.latency = float(config["LATENCY_MS"]) / 1000
+        self.jitter = float(config["JITTER"])
+        self.fail_rate = float(config["FAIL_RATE"])
+        self.timeout_rate = float(config["TIMEOUT_RATE"])
+        self.hang_seconds = float(config["HANG_SECONDS"])
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """Returns (outcome, seconds to wait before answering)."""
+        with self._lock:
+            roll = self._random.random()
+            delay = 0.0
+            if self.latency > 0:
+                delay = self._random.lognormvariate(math.log(self.latency), self.jitter)
+        if roll < self.timeout_rate:
+            return HANG, self.hang_seconds
+        if roll < self.timeout_rate + self.fail_rate:
+            return FAIL, delay
+        return OK, delay
+
+
+def file_md5(name: str) -> str:
+    with open(os.path.join(FTP_ROOT, name), "rb") as served_file:
+        return hashlib.md5(served_file.read()).hexdigest()
+
+
+def http_server(behavior: Behavior, host: str, ssl_context=None) -> LocalHTTPServer:
+    """HTTP(S) stand-in serving PAGE at / and /index.html."""
+
+    async def page(request, writer):
+        outcome, delay = behavior.draw()
+        await asyncio.sleep(delay)
+        if outcome == FAIL:
+            return Response(500, b"stand-in failure\n")
+        return Response(200, PAGE, "text/html")
+
+    server = LocalHTTPServer(host, 0, ssl_context=ssl_context, backlog=4096)
+    server.route("/", page)
+    server.route("/" + PAGE_PATH, page)
+    return server
+
+
+class FTPStandIn:
+    """
+    Just enough FTP for ftplib: login, passive mode, RETR from FTP_ROOT and
+    STOR into memory. A failed draw rejects the login.
+    """
+
+    def __init__(self, behavior: Behavior, host: str):
+        self.behavior = behavior
+        self.host = host
+        self.port = None
+
+    async def start(self):
+        server = await asyncio.start_server(self._session, self.host, 0, backlog=4096)
+        self.port = server.sockets[0].getsockname()[1]
+
+    async def _session(self, reader, writer):
+        outcome, delay = self.behavior.draw()
+        await asyncio.sleep(delay)
+        if outcome == HANG:
+            writer.close()
+            return
+
+        def reply(line: str):
+            writer.write(line.encode() + b"\r\n")
+
+        data_connection = None
+        try:
+            reply("220 stand-in FTP ready")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command, _, argument = line.decode().strip().partition(" ")
+                command = command.upper()
+                if command == "USER":
+                    reply("331 Password required")
+                elif command == "PASS":
+                    if outcome == FAIL:
+                        reply("530 Login incorrect")
+                    else:
+                        reply("230 Logged in")
+                elif command in ("TYPE", "MODE", "STRU"):
+                    reply("200 OK")
+                elif command == "SYST":
+                    reply("215 UNIX Type: L8")
+                elif command == "PWD":
+                    reply('257 "/"')
+                elif command == "CWD":
+                    reply("250 OK")
+                elif command == "PASV":
+                    data_connection = await self._passive()
+                    port = data_connection[1]
+                    reply(f"227 Entering Passive Mode (127,0,0,1,{port >> 8},{port & 0xFF})")
+                elif command in ("RETR", "STOR") and data_connection is not None:
+                    await self._transfer(command, argument, data_connection, reply, writer)
+                    data_connection = None
+                elif command == "QUIT":
+                    reply("221 Bye")
+                    break
+                else:
+                    reply("502 Not implemented")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _passive(self):
+        """Listen for one data connection. Returns (accepted future, port, server)."""
+        accepted = asyncio.get_running_loop().create_future()
+
+        def on_connect(data_reader, data_writer):
+            if not accepted.done():
+                accepted.set_result((data_reader, data_writer))
+
+        server = await asyncio.start_server(on_connect, self.host, 0)
+        return accepted, server.sockets[0].getsockname()[1], server
+
+    async def _transfer(self, command, argument, data_connection, reply, writer):
+        accepted, _, server = data_connection
+        name = os.path.basename(argument)
+        path = os.path.join(FTP_ROOT, name)
+        if command == "RETR" and not os.path.isfile(path):
+            reply("550 No such file")
+            server.close()
+            return
+        reply("150 Opening data connection")
+        await writer.drain()
+        try:
+            data_reader, data_writer = await asyncio.wait_for(accepted, 10)
+        except asyncio.TimeoutError:
+            reply("425 No data connection")
+            return
+        finally:
+            server.close()
+        if command == "RETR":
+            with open(path, "rb") as served_file:
+                data_writer.write(served_file.read())
+        else:
+            while await data_reader.read(65536):
+                pass
+        await data_writer.drain()
+        data_writer.close()
+        reply("226 Transfer complete")
+
+
+def sftp_interface(paramiko):
+    """A read-only SFTP server interface where every path is the file of that name in FTP_ROOT."""
+
+    class Handle(paramiko.SFTPHandle):
+        def stat(self):
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+    class Interface(paramiko.SFTPServerInterface):
+        def _local(self, path):
+            return os.path.join(FTP_ROOT, os.path.basename(path))
+
+        def stat(self, path):
+            try:
+                return paramiko.SFTPAttributes.from_stat(os.stat(self._local(path)))
+            except OSError as e:
+                return paramiko.SFTPServer.convert_errno(e.errno)
+
+        lstat = stat
+
+        def open(self, path, flags, attr):
+            try:
+                local_file = open(self._local(path), "rb")
+            except OSError as e:
+                return paramiko.SFTPServer.convert_errno(e.errno)
+            handle = Handle(flags)
+            handle.readfile = local_file
+            return handle
+
+    return Interface
+
+
+class SSHStandIn:
+    """
+    paramiko server accepting any public key, answering `md5sum FILE` and
+    serving files over SFTP from FTP_ROOT. A failed draw rejects the key.
+    One thread per connection.
+    """
+
+    def __init__(self, behavior: Behavior, host: str):
+        import paramiko  # Optional, only needed for SSH benchmarks
+
+        self.paramiko = paramiko
+        self.behavior = behavior
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.sftp_interface = sftp_interface(paramiko)
+        self._listener = socket.create_server((host, 0), backlog=4096)
+        self.port = self._listener.getsockname()[1]
+
+    def start(self):
+        threading.Thread(target=self._accept, name="ssh-stand-in", daemon=True).start()
+
+    def _accept(self):
+        while True:
+            connection, _ = self._listener.accept()
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        paramiko = self.paramiko
+        outcome, delay = self.behavior.draw()
+        time.sleep(delay)
+        if outcome == HANG:
+            connection.close()
+            return
+
+        exec_requested = threading.Event()
+        commands = []
+
+        class Interface(paramiko.ServerInterface):
+            def get_allowed_auths(self, username):
+                return "publickey"
+
+            def check_auth_publickey(self, username, key):
+                if outcome == FAIL:
+                    return paramiko.AUTH_FAILED
+                return paramiko.AUTH_SUCCESSFUL
+
+            def check_channel_request(self, kind, chanid):
+                if kind == "session":
+                    return paramiko.OPEN_SUCCEEDED
+                return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+            def check_channel_exec_request(self, channel, command):
+                commands.append(command.decode())
+                exec_requested.set()
+                return True
+
+        transport = paramiko.Transport(connection)
+        try:
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, self.sftp_interface)
+            transport.start_server(server=Interface())
+            channel = transport.accept(20)
+            if channel is None:
+                return
+            # SFTP runs in the transport's subsystem thread until the client hangs up.
+            deadline = time.monotonic() + 20
+            while not exec_requested.wait(0.05):
+                if not transport.is_active() or time.monotonic() > deadline:
+                    return
+            program, _, argument = commands[0].partition(" ")
+            name = os.path.basename(argument.strip())
+            if program == "md5sum" and os.path.isfile(os.path.join(FTP_ROOT, name)):
+                channel.sendall(f"{file_md5(name)}  {name}\n".encode())
+                channel.send_exit_status(0)
+            else:
+                channel.sendall_stderr(f"{program}: not supported by the stand-in\n".encode())
+                channel.send_exit_status(1)
+            channel.close()
+        except Exception:
+            pass
+        finally:
+            transport.close()
+
+
+class _SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        # mysql.connector placeholders are %s, SQLite's are ?.
+        return self._cursor.execute(query.replace("%s", "?"), params)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+
+class _SQLiteConnection:
+    def __init__(self, path):
+        # Autocommit: SQLite locks the whole database for a write, holding it
+        # until CheckSQL's commit() gets an executor thread would serialize
+        # (and with few threads, starve) every other check.
+        self._db = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+
+    def cursor(self):
+        return _SQLiteCursor(self._db.cursor())
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self._db.close()
+
+
+def install_sqlite_shim(behavior: Behavior, path: str, tables: dict) -> bool:
+    """
+    Replace mysql.connector.connect with SQLite connections to `path`, after
+    creating `tables` (name -> column names). Returns False when
+    mysql-connector-python is not installed, as CheckSQL imports it.
+    """
+    try:
+        import mysql.connector
+    except ImportError:
+        return False
+
+    setup = sqlite3.connect(path)
+    setup.execute("PRAGMA journal_mode=WAL")
+    for table_name, columns in tables.items():
+        setup.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({', '.join(columns)})")
+    setup.commit()
+    setup.close()
+
+    def connect(**kwargs):
+        outcome, delay = behavior.draw()
+        # Called from the executor, like the real blocking connect.
+        time.sleep(delay)
+        if outcome == HANG:
+            raise mysql.connector.errors.InterfaceError(msg="Lost connection to MySQL server")
+        if outcome == FAIL:
+            raise mysql.connector.errors.InterfaceError(msg="Can't connect to MySQL server")
+        return _SQLiteConnection(path)
+
+    mysql.connector.connect = connect
+    return True
+
+
+def behavior_arguments(parser: argparse.ArgumentParser):
+    """Add the latency and failure distribution options to a parser."""
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_BEHAVIOR["LATENCY_MS"], help="median answer delay")
+    parser.add_argument("--jitter", type=float, default=DEFAULT_BEHAVIOR["JITTER"], help="sigma of the log-normal delay")
+    parser.add_argument("--fail-rate", type=float, default=DEFAULT_BEHAVIOR["FAIL_RATE"])
+    parser.add_argument("--timeout-rate", type=float, default=DEFAULT_BEHAVIOR["TIMEOUT_RATE"])
+    parser.add_argument("--hang-seconds", type=float, default=DEFAULT_BEHAVIOR["HANG_SECONDS"])
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def behavior_settings(args) -> dict:
+    return {
+        "LATENCY_MS": args.latency_ms,
+        "JITTER": args.jitter,
+        "FAIL_RATE": args.fail_rate,
+        "TIMEOUT_RATE": args.timeout_rate,
+        "HANG_SECONDS": args.hang_seconds,
+    }
+
+
+async def serve(args):
+    behavior = Behavior(behavior_settings(args), args.seed)
+    ports = {}
+
+    http = http_server(behavior, args.host)
+    await http.start()
+    ports["HTTP"] = ports["TCP"] = http.port
+
+    if args.tls_cert:
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(args.tls_cert, args.tls_key)
+        https = http_server(behavior, args.host, context)
+        await https.start()
+        ports["HTTPS"] = https.port
+
+    ftp = FTPStandIn(behavior, args.host)
+    await ftp.start()
+    ports["FTP"] = ftp.port
+
+    try:
+        ssh = SSHStandIn(behavior, args.host)
+    except ImportError:
+        pass
+    else:
+        ssh.start()
+        ports["SSH"] = ssh.port
+
+    print(json.dumps(ports), flush=True)
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--tls-cert", help="certificate for the HTTPS stand-in")
+    parser.add_argument("--tls-key", help="key for the HTTPS stand-in")
+    behavior_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
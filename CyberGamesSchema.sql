@@ -9,20 +9,32 @@ CREATE TABLE `targets` (
 CREATE TABLE `teams` (
   `team_id` integer AUTO_INCREMENT NOT NULL PRIMARY KEY, 
   `name` varchar(255) NOT NULL, 
-  `points` integer NOT NULL DEFAULT 0);
+  `points` integer NOT NULL DEFAULT 0,
+  `last_checked` datetime NULL);
 --
 -- Create model ports
 --
 CREATE TABLE `ports` (
-  `service_name` varchar(255) NOT NULL PRIMARY KEY,  
+  `port_id` integer AUTO_INCREMENT NOT NULL PRIMARY KEY, 
+  `service_name` varchar(255) NOT NULL, 
   `port_number` varchar(255) NULL, 
   `result_code` varchar(3) NOT NULL, 
   `participant_feedback` longtext NOT NULL, 
   `staff_feedback` longtext NOT NULL, 
   `points_obtained` integer NOT NULL, 
-  `target_id` integer NULL);
+  `target_id` integer NULL, 
+  `team_id` integer NULL, 
+  UNIQUE KEY `ports_team_target_service` (`team_id`, `target_id`, `service_name`));
 --
 -- Add field team to targets
 --
 ALTER TABLE `targets` ADD COLUMN `team_id` integer NULL , ADD CONSTRAINT `targets_team_id_d1f7c2b6_fk_teams_team_id` FOREIGN KEY (`team_id`) REFERENCES `teams`(`team_id`);
 ALTER TABLE `ports` ADD CONSTRAINT `ports_target_id_3fe4af15_fk_targets_target_id` FOREIGN KEY (`target_id`) REFERENCES `targets` (`target_id`);
+--
+-- Rounds the engine has written, so a replayed round is only applied once
+--
+CREATE TABLE `scoring_rounds` (
+  `run_id` varchar(32) NOT NULL, 
+  `round_number` integer NOT NULL, 
+  `written_at` datetime NOT NULL,
+  PRIMARY KEY (`run_id`, `round_number`));
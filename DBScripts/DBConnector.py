@@ -1,8 +1,32 @@
 #!/usr/bin/env python3
-import mysql.connector
-from mysql.connector import Error
 from ServiceCheckScripts import Results
+from ServiceCheckScripts.EngineLogger import get_logger
 from typing import Optional
+from DBScripts.DeltaPersistence import RoundWrites
+from DBScripts import StorageBackends
+
+logger = get_logger("db")
+
+# The configured StorageBackend, see configure().
+_backend = None
+
+
+def configure(settings: dict):
+    """Select the backend and connection settings from ENGINE -> DATABASE."""
+    global _backend
+    _backend = StorageBackends.create_backend(settings)
+
+
+def get_backend() -> StorageBackends.StorageBackend:
+    """The configured backend, MySQL with the default settings if none was configured."""
+    if _backend is None:
+        configure({})
+    return _backend
+
+
+def get_connection():
+    """Open a connection with the configured settings."""
+    return get_backend().connect()
 
 
 def update_team_points(team_id: int, points: int, cursor, connection):
@@ -14,18 +38,20 @@ def update_team_points(team_id: int, points: int, cursor, connection):
     - points_to_add (int): The number of points to add to the team's current points.
     """
     # Define points based on result_code
-    print(team_id)
-    update_team_points_statement = (
-        f"UPDATE teams set points = points + %s WHERE team_id = %s;",
-        (points, team_id),
-    )
+    logger.debug("Updating points for team %s", team_id, extra={"team_id": team_id})
+    update_team_points_statement = "UPDATE teams set points = points + %s WHERE team_id = %s;"
 
     try:
-        cursor.execute(update_team_points_statement)
+        cursor.execute(update_team_points_statement, (points, team_id))
         # Commit the transaction
         connection.commit()
-    except mysql.connector.Error as error:
-        print(f"Failed to update points for team: {team_id} \nError: {error}\n")
+    except get_backend().error as error:
+        logger.error(
+            "Failed to update points for team: %s, error: %s",
+            team_id,
+            error,
+            extra={"team_id": team_id},
+        )
 
 
 def update_service_status(
@@ -58,7 +84,7 @@ def update_service_status(
     if port_number is not None:
         fields_to_update["port_number"] = port_number
     if result_code is not None:
-        fields_to_update["result_code"] = result_code
+        fields_to_update["result_code"] = result_code.value
     if participant_feedback is not None:
         fields_to_update["participant_feedback"] = participant_feedback
     if staff_feedback is not None:
@@ -78,23 +104,22 @@ def update_service_status(
     update_values.extend([service_name, target_id, team_id])
 
     try:
-        cursor.execute(update_service_statement)
+        cursor.execute(update_service_statement, update_values)
         # Commit the transaction
         connection.commit()
-    except mysql.connector.Error as error:
-        print(
-            f"Failed to update service: {service_name}\nFor team: {team_id} \nError: {error}\n"
+    except get_backend().error as error:
+        logger.error(
+            "Failed to update service: %s, error: %s",
+            service_name,
+            error,
+            extra={"team_id": team_id, "service_name": service_name},
         )
 
 
+# Writes a single check, from before rounds were persisted in one transaction. MySQL only.
 def insert_service_health_check(health_check: Results.ServiceHealthCheck):
     try:
-        connection = mysql.connector.connect(
-            host="your_database_host",
-            database="health_checks",
-            user="your_database_user",
-            password="your_database_password",
-        )
+        connection = get_connection()
 
         if connection.is_connected():
             cursor = connection.cursor()
@@ -105,7 +130,11 @@ def insert_service_health_check(health_check: Results.ServiceHealthCheck):
 
             team = cursor.fetchone()
             if team:
-                print("Team exists, scoring team: %s", team)
+                logger.debug(
+                    "Team exists, scoring team: %s",
+                    team,
+                    extra={"team_id": health_check.team_id},
+                )
                 # Update a team's points
                 update_team_points(
                     int(health_check.team_id), health_check.points, cursor, connection
@@ -128,10 +157,23 @@ def insert_service_health_check(health_check: Results.ServiceHealthCheck):
             else:
                 raise ValueError("That Team Does Not Exist in DB.")
 
-    except Error as e:
-        print(f"Error while connecting to MySQL: {e}")
+    except get_backend().error as e:
+        logger.error("Error while connecting to the database: %s", e)
     finally:
         if connection.is_connected():
             cursor.close()
             connection.close()
-            print("MySQL connection is closed")
+            logger.debug("MySQL connection is closed")
+
+
+def load_team_points() -> dict:
+    """Every team's stored points with the configured backend, team_id -> (name, points)."""
+    return get_backend().team_points()
+
+
+def persist_round(round_writes: RoundWrites) -> int:
+    """
+    Write a round in one transaction with the configured backend, see
+    StorageBackend.persist_round. Returns the rows written.
+    """
+    return get_backend().persist_round(round_writes)
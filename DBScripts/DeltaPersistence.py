@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+import sys
+import time
+
+from ServiceCheckScripts import Results
+
+
+class RoundWrites:
+    """
+    Rows a round needs written: service status rows that changed since the
+    last persisted round, and one points/heartbeat row per team.
+    """
+
+    def __init__(self, round_number: int, run_id: str = None):
+        self.round_number = round_number
+        # Identifies the engine run, so a replayed round is only written once.
+        self.run_id = run_id
+        self.heartbeat = time.time()
+        # (team_id, target_id, service_name) -> status tuple, changed rows only.
+        self.status_rows = {}
+        # team_id -> points earned this round.
+        self.team_points = {}
+        self.unchanged = 0
+
+    @property
+    def rows_written(self) -> int:
+        """Rows this round writes to the database."""
+        return len(self.status_rows) + len(self.team_points)
+
+
+class StatusDeltaTracker:
+    """
+    Remembers the last persisted status of every (team, target, service) so
+    a status row is only rewritten when its result, feedback, port or points
+    change.
+    """
+
+    def __init__(self):
+        # (team_id, target_id, service_name) ->
+        # (result_code, participant_feedback, staff_feedback, port_number, points)
+        self._persisted = {}
+        # Rows and points of rounds whose write failed, sent with the next round.
+        self._unpersisted = None
+
+    def __len__(self):
+        return len(self._persisted)
+
+    def record(self, round_writes: RoundWrites, health_check: Results.ServiceHealthCheck):
+        """Add a scored check to the round, keeping its status row only if it changed."""
+        team_id = int(health_check.team_id)
+        round_writes.team_points[team_id] = (
+            round_writes.team_points.get(team_id, 0) + health_check.points
+        )
+
+        result_code = health_check.result.result
+        # The same feedback repeats round after round, keep one copy of each string.
+        status = (
+            result_code.value if result_code else Results.ResultCode.UNKNOWN.value,
+            sys.intern(health_check.result.feedback),
+            sys.intern(health_check.result.staff_feedback),
+            sys.intern(str(health_check.target_port)),
+            health_check.points,
+        )
+        key = (team_id, health_check.target_id, sys.intern(health_check.service_name))
+        if self._persisted.get(key) == status:
+            round_writes.unchanged += 1
+            # A row carried over from a failed write is back to what is stored.
+            round_writes.status_rows.pop(key, None)
+        else:
+            round_writes.status_rows[key] = status
+
+    def commit(self, round_writes: RoundWrites):
+        """Mark a round's rows as persisted, call only once the write succeeded."""
+        self._persisted.update(round_writes.status_rows)
+
+    def defer(self, round_writes: RoundWrites):
+        """Keep the rows and points of a round whose write failed for the next round."""
+        self._unpersisted = round_writes
+
+    def carry_over(self, round_writes: RoundWrites):
+        """Start a round with whatever the last failed write did not persist."""
+        if self._unpersisted is None:
+            return
+        round_writes.status_rows.update(self._unpersisted.status_rows)
+        for team_id, points in self._unpersisted.team_points.items():
+            round_writes.team_points[team_id] = (
+                round_writes.team_points.get(team_id, 0) + points
+            )
+        self._unpersisted = None
+
+    def state(self) -> dict:
+        """The persisted statuses, for a checkpoint."""
+        return self._persisted
+
+    def restore(self, state: dict):
+        """Pick up the persisted statuses from a checkpoint."""
+        self._persisted = state
@@ -1,47 +1,24 @@
 #!/usr/bin/env python3
-import mysql.connector
-from mysql.connector import Error
+from DBScripts import DBConnector
+from ServiceCheckScripts import ImportEnvVars
 
 
 def insert_team(entered_team_name: str):
+    backend = DBConnector.get_backend()
     try:
-        connection = mysql.connector.connect(
-            host="your_database_host",
-            database="health_checks",
-            user="your_database_user",
-            password="your_database_password",
-        )
+        team_id, created = backend.insert_team(entered_team_name)
+        # If the team exists
+        if not created:
+            print(f"Team {entered_team_name} already exists with TEAM_ID {team_id}")
+        else:
+            print("-------------------------------------")
+            print(f"SUCCESSFUL CREATION OF TEAM {entered_team_name}")
+            print("NEEDED INFO FOR YAML FILE")
+            print(f"TEAM_NAME: {entered_team_name}")
+            print(f"TEAM_ID: {team_id}")
 
-        if connection.is_connected():
-            cursor = connection.cursor()
-            cursor.execute("SELECT id FROM teams WHERE name = %s", (entered_team_name))
-            team = cursor.fetchone()
-            # If the team exists
-            if team:
-                print("Team {} already exists, exiting program!", team)
-            # if team does not exist
-            else:
-                cursor.execute(
-                    "INSERT INTO teams (name) VALUES (%s)", (entered_team_name,)
-                )
-                cursor.execute(
-                    "SELECT id FROM teams WHERE name = %s", (entered_team_name)
-                )
-                team_id = cursor.fetchone()
-                print("-------------------------------------")
-                print("SUCCESSFUL CREATION OF TEAM %s", entered_team_name)
-                print("NEEDED INFO FOR YAML FILE")
-                print("TEAM_NAME: %s", entered_team_name)
-                print("TEAM_ID: %s", team_id)
-
-    except Error as e:
-        print(f"Error while connecting to MySQL: {e}")
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
-            print("MySQL connection is closed")
-        print("Exiting....")
+    except backend.error as e:
+        print(f"Error while connecting to the {backend.name} database: {e}")
 
 
 def get_string_input(prompt):
@@ -55,6 +32,11 @@ def get_string_input(prompt):
 
 def main():
     print("Team Generation Program\n")
+    # Same database as the engine, from ENGINE -> DATABASE in EnvVars.yaml.
+    DBConnector.configure(
+        ImportEnvVars.get_engine_settings(ImportEnvVars.load_env_vars(), "DATABASE")
+    )
+    DBConnector.get_backend().create_schema()
     try:
 
         while True:
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+import csv
+import io
+
+from ServiceCheckScripts.EngineLogger import get_logger
+from DBScripts.DeltaPersistence import RoundWrites
+
+logger = get_logger("db")
+
+# Defaults for the ENGINE -> DATABASE section of EnvVars.yaml.
+DEFAULT_SETTINGS = {
+    "BACKEND": "mysql",
+    "HOST": "your_database_host",
+    # None for the driver's default port.
+    "PORT": None,
+    "DATABASE": "health_checks",
+    "USER": "your_database_user",
+    "PASSWORD": "your_database_password",
+    # Database file of the sqlite backend.
+    "PATH": "health_checks.sqlite3",
+}
+
+# Columns of a status row, in the order RoundWrites keeps them: the status
+# tuple followed by the (team_id, target_id, service_name) key.
+STATUS_COLUMNS = (
+    "result_code",
+    "participant_feedback",
+    "staff_feedback",
+    "port_number",
+    "points_obtained",
+    "team_id",
+    "target_id",
+    "service_name",
+)
+
+
+def status_values(round_writes: RoundWrites) -> list:
+    """The round's changed status rows as tuples in STATUS_COLUMNS order."""
+    return [status + key for key, status in round_writes.status_rows.items()]
+
+
+class StorageBackend:
+    """
+    Writes rounds to one kind of database.
+
+    A backend opens its driver's connections, creates the schema and writes
+    a round in one transaction, each with the fastest bulk path its driver
+    has. Drivers are imported on first use, so only the configured one
+    needs to be installed. Statements are written with %s placeholders and
+    translated for drivers that use another style.
+    """
+
+    name = ""
+    placeholder = "%s"
+    # SQL expression turning a unix timestamp parameter into a datetime.
+    from_unixtime = "FROM_UNIXTIME(%s)"
+    # Statements creating the tables if they don't exist.
+    schema = ()
+
+    def __init__(self, settings: dict):
+        self.settings = settings
+
+    @property
+    def error(self):
+        """The driver's base exception class."""
+        raise NotImplementedError
+
+    def connect(self):
+        """Open a connection with the configured settings."""
+        raise NotImplementedError
+
+    def sql(self, statement: str) -> str:
+        return statement.replace("%s", self.placeholder)
+
+    def create_schema(self):
+        """Create the engine's tables where they are missing."""
+        connection = self.connect()
+        cursor = connection.cursor()
+        try:
+            for statement in self.schema:
+                cursor.execute(statement)
+            connection.commit()
+        finally:
+            cursor.close()
+            connection.close()
+
+    def persist_round(self, round_writes: RoundWrites) -> int:
+        """
+        Write a round in one transaction: only the status rows that changed, then
+        a single points and heartbeat update per team. Returns the rows written.
+
+        Rounds with a run_id are also recorded in scoring_rounds in the same
+        transaction, and a round that is already recorded is not written again,
+        so a round replayed after a crash is applied exactly once.
+        """
+        connection = self.connect()
+        cursor = connection.cursor()
+        try:
+            if round_writes.run_id:
+                if self._round_written(cursor, round_writes):
+                    connection.rollback()
+                    logger.info(
+                        "Round %d was already written, skipping it",
+                        round_writes.round_number,
+                    )
+                    return 0
+                cursor.execute(
+                    self.sql(
+                        "INSERT INTO scoring_rounds (run_id, round_number, written_at) "
+                        f"VALUES (%s, %s, {self.from_unixtime})"
+                    ),
+                    (round_writes.run_id, round_writes.round_number, round_writes.heartbeat),
+                )
+            if round_writes.status_rows:
+                self.write_status_rows(cursor, status_values(round_writes))
+            if round_writes.team_points:
+                self.write_team_points(cursor, round_writes)
+            connection.commit()
+        except self.error:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+        return round_writes.rows_written
+
+    def _round_written(self, cursor, round_writes: RoundWrites) -> bool:
+        cursor.execute(
+            self.sql(
+                "SELECT 1 FROM scoring_rounds WHERE run_id = %s AND round_number = %s FOR UPDATE"
+            ),
+            (round_writes.run_id, round_writes.round_number),
+        )
+        return cursor.fetchone() is not None
+
+    def write_status_rows(self, cursor, rows: list):
+        """Update the ports rows, rows are tuples in STATUS_COLUMNS order."""
+        cursor.executemany(
+            self.sql(
+                "UPDATE ports SET result_code = %s, participant_feedback = %s, staff_feedback = %s, "
+                "port_number = %s, points_obtained = %s "
+                "WHERE team_id = %s AND target_id = %s AND service_name = %s"
+            ),
+            rows,
+        )
+
+    def write_team_points(self, cursor, round_writes: RoundWrites):
+        """Add the round's points to each team and set its heartbeat."""
+        cursor.executemany(
+            self.sql(
+                f"UPDATE teams SET points = points + %s, last_checked = {self.from_unixtime} "
+                "WHERE team_id = %s"
+            ),
+            [
+                (points, round_writes.heartbeat, team_id)
+                for team_id, points in round_writes.team_points.items()
+            ],
+        )
+
+    def team_points(self) -> dict:
+        """Every team's stored points, team_id -> (name, points)."""
+        connection = self.connect()
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT team_id, name, points FROM teams")
+            return {team_id: (name, points) for team_id, name, points in cursor.fetchall()}
+        finally:
+            cursor.close()
+            connection.close()
+
+    def insert_team(self, team_name: str) -> tuple:
+        """Add a team unless one has that name. Returns (team_id, created)."""
+        connection = self.connect()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(self.sql("SELECT team_id FROM teams WHERE name = %s"), (team_name,))
+            team = cursor.fetchone()
+            if team:
+                return team[0], False
+            team_id = self._insert_team(cursor, team_name)
+            connection.commit()
+            return team_id, True
+        finally:
+            cursor.close()
+            connection.close()
+
+    def _insert_team(self, cursor, team_name: str) -> int:
+        cursor.execute(self.sql("INSERT INTO teams (name) VALUES (%s)"), (team_name,))
+        return cursor.lastrowid
+
+
+class MySQLBackend(StorageBackend):
+    """
+    MySQL through mysql-connector-python. Changed rows are loaded into a
+    temporary table with multi-row INSERTs, which executemany batches, and
+    applied with a single UPDATE ... JOIN.
+    """
+
+    name = "mysql"
+    schema = (
+        "CREATE TABLE IF NOT EXISTS `teams` ("
+        "`team_id` integer AUTO_INCREMENT NOT NULL PRIMARY KEY, "
+        "`name` varchar(255) NOT NULL, "
+        "`points` integer NOT NULL DEFAULT 0, "
+        "`last_checked` datetime NULL)",
+        "CREATE TABLE IF NOT EXISTS `targets` ("
+        "`target_id` integer AUTO_INCREMENT NOT NULL PRIMARY KEY, "
+        "`target_host` varchar(255) NOT NULL, "
+        "`team_id` integer NULL REFERENCES `teams` (`team_id`))",
+        "CREATE TABLE IF NOT EXISTS `ports` ("
+        "`port_id` integer AUTO_INCREMENT NOT NULL PRIMARY KEY, "
+        "`service_name` varchar(255) NOT NULL, "
+        "`port_number` varchar(255) NULL, "
+        "`result_code` varchar(3) NOT NULL, "
+        "`participant_feedback` longtext NOT NULL, "
+        "`staff_feedback` longtext NOT NULL, "
+        "`points_obtained` integer NOT NULL, "
+        "`target_id` integer NULL REFERENCES `targets` (`target_id`), "
+        "`team_id` integer NULL, "
+        "UNIQUE KEY `ports_team_target_service` (`team_id`, `target_id`, `service_name`))",
+        "CREATE TABLE IF NOT EXISTS `scoring_rounds` ("
+        "`run_id` varchar(32) NOT NULL, "
+        "`round_number` integer NOT NULL, "
+        "`written_at` datetime NOT NULL, "
+        "PRIMARY KEY (`run_id`, `round_number`))",
+    )
+
+    @property
+    def error(self):
+        import mysql.connector
+
+        return mysql.connector.Error
+
+    def connect(self):
+        import mysql.connector
+
+        options = {}
+        if self.settings["PORT"]:
+            options["port"] = int(self.settings["PORT"])
+        return mysql.connector.connect(
+            host=self.settings["HOST"],
+            database=self.settings["DATABASE"],
+            user=self.settings["USER"],
+            password=self.settings["PASSWORD"],
+            **options,
+        )
+
+    def write_status_rows(self, cursor, rows: list):
+        cursor.execute(
+            "CREATE TEMPORARY TABLE round_ports ("
+            "result_code varchar(3), participant_feedback longtext, staff_feedback longtext, "
+            "port_number varchar(255), points_obtained integer, "
+            "team_id integer, target_id integer, service_name varchar(255))"
+        )
+        try:
+            cursor.executemany(
+                f"INSERT INTO round_ports ({', '.join(STATUS_COLUMNS)}) "
+                f"VALUES ({', '.join(['%s'] * len(STATUS_COLUMNS))})",
+                rows,
+            )
+            cursor.execute(
+                "UPDATE ports JOIN round_ports USING (team_id, target_id, service_name) "
+                "SET ports.result_code = round_ports.result_code, "
+                "ports.participant_feedback = round_ports.participant_feedback, "
+                "ports.staff_feedback = round_ports.staff_feedback, "
+                "ports.port_number = round_ports.port_number, "
+                "ports.points_obtained = round_ports.points_obtained"
+            )
+        finally:
+            cursor.execute("DROP TEMPORARY TABLE round_ports")
+
+
+class PostgreSQLBackend(StorageBackend):
+    """
+    PostgreSQL through psycopg2. Changed rows are streamed into a temporary
+    table with COPY and applied with a single UPDATE ... FROM, team points
+    are sent with execute_values.
+    """
+
+    name = "postgresql"
+    from_unixtime = "to_timestamp(%s)"
+    schema = (
+        "CREATE TABLE IF NOT EXISTS teams ("
+        "team_id serial PRIMARY KEY, "
+        "name varchar(255) NOT NULL, "
+        "points integer NOT NULL DEFAULT 0, "
+        "last_checked timestamp NULL)",
+        "CREATE TABLE IF NOT EXISTS targets ("
+        "target_id serial PRIMARY KEY, "
+        "target_host varchar(255) NOT NULL, "
+        "team_id integer NULL REFERENCES teams (team_id))",
+        "CREATE TABLE IF NOT EXISTS ports ("
+        "port_id serial PRIMARY KEY, "
+        "service_name varchar(255) NOT NULL, "
+        "port_number varchar(255) NULL, "
+        "result_code varchar(3) NOT NULL, "
+        "participant_feedback text NOT NULL, "
+        "staff_feedback text NOT NULL, "
+        "points_obtained integer NOT NULL, "
+        "target_id integer NULL REFERENCES targets (target_id), "
+        "team_id integer NULL, "
+        "CONSTRAINT ports_team_target_service UNIQUE (team_id, target_id, service_name))",
+        "CREATE TABLE IF NOT EXISTS scoring_rounds ("
+        "run_id varchar(32) NOT NULL, "
+        "round_number integer NOT NULL, "
+        "written_at timestamp NOT NULL, "
+        "PRIMARY KEY (run_id, round_number))",
+    )
+
+    @property
+    def error(self):
+        import psycopg2
+
+        return psycopg2.Error
+
+    def connect(self):
+        import psycopg2
+
+        options = {}
+        if self.settings["PORT"]:
+            options["port"] = int(self.settings["PORT"])
+        return psycopg2.connect(
+            host=self.settings["HOST"],
+            dbname=self.settings["DATABASE"],
+            user=self.settings["USER"],
+            password=self.settings["PASSWORD"],
+            **options,
+        )
+
+    def write_status_rows(self, cursor, rows: list):
+        buffer = io.StringIO()
+        # Quoted, so an empty feedback string isn't read back as NULL.
+        csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+        buffer.seek(0)
+        cursor.execute(
+            "CREATE TEMPORARY TABLE round_ports ("
+            "result_code varchar(3), participant_feedback text, staff_feedback text, "
+            "port_number varchar(255), points_obtained integer, "
+            "team_id integer, target_id integer, service_name varchar(255)) ON COMMIT DROP"
+        )
+        cursor.copy_expert(
+            f"COPY round_ports ({', '.join(STATUS_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+        cursor.execute(
+            "UPDATE ports SET result_code = r.result_code, "
+            "participant_feedback = r.participant_feedback, "
+            "staff_feedback = r.staff_feedback, "
+            "port_number = r.port_number, points_obtained = r.points_obtained "
+            "FROM round_ports r WHERE ports.team_id = r.team_id "
+            "AND ports.target_id = r.target_id AND ports.service_name = r.service_name"
+        )
+
+    def write_team_points(self, cursor, round_writes: RoundWrites):
+        from psycopg2.extras import execute_values
+
+        execute_values(
+            cursor,
+            "UPDATE teams SET points = teams.points + v.points, last_checked = to_timestamp(v.heartbeat) "
+            "FROM (VALUES %s) AS v (team_id, points, heartbeat) WHERE teams.team_id = v.team_id",
+            [
+                (team_id, points, round_writes.heartbeat)
+                for team_id, points in round_writes.team_points.items()
+            ],
+        )
+
+    def _insert_team(self, cursor, team_name: str) -> int:
+        cursor.execute("INSERT INTO teams (name) VALUES (%s) RETURNING team_id", (team_name,))
+        return cursor.fetchone()[0]
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Embedded SQLite in WAL mode, for events that don't want a database
+    server. There is no network round trip, so executemany in one
+    transaction per round is the bulk path.
+    """
+
+    name = "sqlite"
+    placeholder = "?"
+    from_unixtime = "datetime(%s, 'unixepoch')"
+    schema = (
+        "CREATE TABLE IF NOT EXISTS teams ("
+        "team_id integer PRIMARY KEY AUTOINCREMENT, "
+        "name varchar(255) NOT NULL, "
+        "points integer NOT NULL DEFAULT 0, "
+        "last_checked datetime NULL)",
+        "CREATE TABLE IF NOT EXISTS targets ("
+        "target_id integer PRIMARY KEY AUTOINCREMENT, "
+        "target_host varchar(255) NOT NULL, "
+        "team_id integer NULL REFERENCES teams (team_id))",
+        "CREATE TABLE IF NOT EXISTS ports ("
+        "port_id integer PRIMARY KEY AUTOINCREMENT, "
+        "service_name varchar(255) NOT NULL, "
+        "port_number varchar(255) NULL, "
+        "result_code varchar(3) NOT NULL, "
+        "participant_feedback text NOT NULL, "
+        "staff_feedback text NOT NULL, "
+        "points_obtained integer NOT NULL, "
+        "target_id integer NULL REFERENCES targets (target_id), "
+        "team_id integer NULL, "
+        "UNIQUE (team_id, target_id, service_name))",
+        "CREATE TABLE IF NOT EXISTS scoring_rounds ("
+        "run_id varchar(32) NOT NULL, "
+        "round_number integer NOT NULL, "
+        "written_at datetime NOT NULL, "
+        "PRIMARY KEY (run_id, round_number))",
+    )
+
+    @property
+    def error(self):
+        import sqlite3
+
+        return sqlite3.Error
+
+    def connect(self):
+        import sqlite3
+
+        # Rounds are written from executor threads, one connection per round.
+        connection = sqlite3.connect(self.settings["PATH"], timeout=30)
+        connection.execute("PRAGMA journal_mode = WAL")
+        # Every commit is synced to disk, NORMAL can lose the last commits on a
+        # power loss and a lost round can't be replayed once round.wal moves on.
+        # Rounds are one transaction, so this is one fsync per round.
+        connection.execute("PRAGMA synchronous = FULL")
+        return connection
+
+    def _round_written(self, cursor, round_writes: RoundWrites) -> bool:
+        # SQLite has no row locks, writers are serialized by the database lock.
+        cursor.execute(
+            "SELECT 1 FROM scoring_rounds WHERE run_id = ? AND round_number = ?",
+            (round_writes.run_id, round_writes.round_number),
+        )
+        return cursor.fetchone() is not None
+
+
+BACKENDS = {
+    backend.name: backend for backend in (MySQLBackend, PostgreSQLBackend, SQLiteBackend)
+}
+
+
+def create_backend(settings: dict = None) -> StorageBackend:
+    """The backend named by BACKEND, with the other settings filled in from the defaults."""
+    config = dict(DEFAULT_SETTINGS)
+    config.update(settings or {})
+    backend_name = str(config["BACKEND"]).lower()
+    if backend_name not in BACKENDS:
+        raise ValueError(
+            f"Unknown database backend {config['BACKEND']}, use one of {', '.join(BACKENDS)}"
+        )
+    return BACKENDS[backend_name](config)
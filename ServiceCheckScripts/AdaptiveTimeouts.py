@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+import collections
+
+from ServiceCheckScripts import CheckRegistry
+from .Results import ServiceHealthCheck, ResultCode
+from .Scheduler import percentile
+from .EngineLogger import get_logger
+
+logger = get_logger("timeouts")
+
+# Defaults for the ENGINE -> ADAPTIVE_TIMEOUTS section of EnvVars.yaml.
+DEFAULT_SETTINGS = {
+    "ENABLED": False,
+    "FLOOR": 0.5,
+    "CEILING": 10,
+    # Weight of the newest sample in the moving average.
+    "ALPHA": 0.125,
+    "PERCENTILE": 0.95,
+    # The timeout is at least this multiple of the percentile.
+    "HEADROOM": 2,
+    # Recent samples kept per target and service for the percentile.
+    "WINDOW": 64,
+    # Samples needed before the learned timeout replaces the check's default.
+    "MIN_SAMPLES": 5,
+}
+
+# Results that say the service answered, only their latency is learned.
+ANSWERED = (ResultCode.PASS, ResultCode.WARN)
+
+
+def default_timeout(service_name: str):
+    """The timeout a check uses when none is learned, None if it has none."""
+    try:
+        check_class = CheckRegistry.get_plugin(service_name).check_class
+    except (KeyError, ImportError):
+        return None
+    return getattr(check_class, "timeout", None) or getattr(
+        check_class, "connect_timeout", None
+    )
+
+
+class LatencyEstimate:
+    """
+    Moving average and mean deviation of one target and service's latency,
+    as TCP estimates round trip times, plus a window of recent samples.
+    """
+
+    __slots__ = ("average", "deviation", "samples")
+
+    def __init__(self, window: int):
+        self.average = None
+        self.deviation = 0.0
+        self.samples = collections.deque(maxlen=window)
+
+    def observe(self, latency: float, alpha: float):
+        self.samples.append(latency)
+        if self.average is None:
+            self.average = latency
+            self.deviation = latency / 2
+            return
+        self.deviation += min(1.0, 2 * alpha) * (abs(latency - self.average) - self.deviation)
+        self.average += alpha * (latency - self.average)
+
+    def timeout(self, fraction: float, headroom: float) -> float:
+        return max(
+            self.average + 4 * self.deviation,
+            percentile(sorted(self.samples), fraction) * headroom,
+        )
+
+
+class AdaptiveTimeouts:
+    """
+    Timeouts per (target, service) learned from the latency of the checks
+    that answered, clamped between FLOOR and CEILING. A fast target that
+    goes down then costs a fraction of the fixed default while it is down.
+    """
+
+    def __init__(self, settings: dict = None):
+        config = dict(DEFAULT_SETTINGS)
+        config.update(settings or {})
+        self.floor = float(config["FLOOR"])
+        self.ceiling = float(config["CEILING"])
+        self.alpha = float(config["ALPHA"])
+        self.fraction = float(config["PERCENTILE"])
+        self.headroom = float(config["HEADROOM"])
+        self.window = int(config["WINDOW"])
+        self.min_samples = int(config["MIN_SAMPLES"])
+        self._estimates = {}
+        self._defaults = {}
+        self.round_timeouts = 0
+        self.round_seconds_waited = 0.0
+        self.round_seconds_saved = 0.0
+
+    def reset(self):
+        """Forget every estimate, for when the config is replaced."""
+        self._estimates.clear()
+        self._defaults.clear()
+        logger.info("Adaptive timeouts reset")
+
+    def _default(self, service_name: str):
+        if service_name not in self._defaults:
+            self._defaults[service_name] = default_timeout(service_name)
+        return self._defaults[service_name]
+
+    def assign(self, service_check: ServiceHealthCheck):
+        """Set the check's timeout from its estimate, or leave the default."""
+        estimate = self._estimates.get(
+            (service_check.target_host, service_check.service_name)
+        )
+        if estimate is None or len(estimate.samples) < self.min_samples:
+            service_check.timeout = None
+            return
+        service_check.timeout = min(
+            self.ceiling,
+            max(self.floor, estimate.timeout(self.fraction, self.headroom)),
+        )
+
+    def learn(self, service_check: ServiceHealthCheck) -> bool:
+        """Learn the latency of a finished check. Returns False when it did not answer."""
+        if service_check.result.result not in ANSWERED:
+            return False
+        key = (service_check.target_host, service_check.service_name)
+        estimate = self._estimates.get(key)
+        if estimate is None:
+            estimate = self._estimates[key] = LatencyEstimate(self.window)
+        estimate.observe(service_check.duration, self.alpha)
+        return True
+
+    def observe(self, service_check: ServiceHealthCheck):
+        """Learn from a scored check and count the time it spent timing out this round."""
+        if self.learn(service_check):
+            return
+
+        default = self._default(service_check.service_name)
+        limit = service_check.timeout or default
+        if limit and service_check.duration >= limit:
+            self.round_timeouts += 1
+            self.round_seconds_waited += service_check.duration
+            if default and service_check.timeout:
+                self.round_seconds_saved += max(default - service_check.timeout, 0.0)
+
+    def report(self, round_number: int):
+        """Log this round's time spent waiting on timeouts, then reset the counters."""
+        logger.info(
+            "Round %d timeouts: %d checks waited %.2f check-seconds, "
+            "%.2f check-seconds saved by learned timeouts, %d targets learned",
+            round_number,
+            self.round_timeouts,
+            self.round_seconds_waited,
+            self.round_seconds_saved,
+            sum(
+                1
+                for estimate in self._estimates.values()
+                if len(estimate.samples) >= self.min_samples
+            ),
+        )
+        self.round_timeouts = 0
+        self.round_seconds_waited = 0.0
+        self.round_seconds_saved = 0.0
+
+
+def configure(settings: dict = None):
+    """An AdaptiveTimeouts from ENGINE -> ADAPTIVE_TIMEOUTS, or None when it is disabled."""
+    config = dict(DEFAULT_SETTINGS)
+    config.update(settings or {})
+    if not config["ENABLED"]:
+        return None
+    return AdaptiveTimeouts(config)
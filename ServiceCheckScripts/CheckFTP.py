@@ -4,9 +4,12 @@ from ftplib import FTP, all_errors as FTPError  # Import FTP client and error ha
 import hashlib  # For generating md5 hashes to verify file integrity.
 import os  # To handle file paths.
 from .Results import ServiceHealthCheck  # Import a custom results handler.
+from .Metrics import phase, timed_calls  # Per-phase timings for the metrics endpoint.
 
 
 class FTPCheck:
+    timeout = 10
+
     def __init__(self, service_check: ServiceHealthCheck):
         # Initialize with a service check object containing necessary details for the FTP check.
         self.service_check_priv = service_check
@@ -27,14 +30,18 @@ class FTPCheck:
 
         # Attempt to connect to the FTP server.
         try:
-            ftp = await loop.run_in_executor(None, lambda: self._connect_ftp(details))
+            with phase(self.service_check_priv, "connect"):
+                ftp = await loop.run_in_executor(
+                    None, lambda: self._connect_ftp(details)
+                )
         except Exception as e:
             # Handle any connection errors.
             return self._handle_ftp_error(e, details, action="connect")
 
         # Try to log in to the FTP server.
         try:
-            await self._login_ftp(ftp, details)
+            with phase(self.service_check_priv, "auth"):
+                await self._login_ftp(ftp, details)
         except Exception as e:
             # Handle any login errors and ensure the connection is closed before returning.
             service_check_login_error = self._handle_ftp_error(
@@ -80,12 +87,24 @@ class FTPCheck:
 
     def _connect_ftp(self, details):
         """Establish a connection to the FTP server."""
-        ftp = FTP(details["target"])
+        # The timeout also applies to every later command and transfer.
+        ftp = FTP(timeout=self.service_check_priv.timeout or self.timeout)
+        ftp.connect(details["target"], self._port())
         return ftp
 
+    def _port(self):
+        """Use the action's PORT when it is numeric, otherwise 21."""
+        try:
+            return int(self.service_check_priv.target_port)
+        except (TypeError, ValueError):
+            return 21
+
     async def _login_ftp(self, ftp, details):
         """Login to the FTP server using provided credentials."""
-        ftp.login(user=details["username"], passwd=details["password"])
+        # login() waits on the server, keep it off the event loop.
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: ftp.login(user=details["username"], passwd=details["password"])
+        )
 
     def _handle_ftp_error(self, error, details, action="operation"):
         """Handle and report FTP errors based on the action being performed."""
@@ -108,11 +127,16 @@ class FTPCheck:
         for index, file in enumerate(details["files"]):
             try:
                 file_hash = hashlib.md5()
+                update = timed_calls(file_hash.update)
                 # Execute the file download and hashing in an executor to prevent blocking.
-                await loop.run_in_executor(
-                    None,
-                    lambda: ftp.retrbinary(f"RETR {file}", file_hash.update),
-                )
+                try:
+                    with phase(self.service_check_priv, "transfer"):
+                        await loop.run_in_executor(
+                            None,
+                            lambda: ftp.retrbinary(f"RETR {file}", update),
+                        )
+                finally:
+                    update.split(self.service_check_priv, "hash", "transfer")
                 # Compare the computed hash with the expected hash to verify file integrity.
                 if file_hash.hexdigest() == details["sums"][index]:
                     success_files.append(file)
@@ -151,9 +175,10 @@ class FTPCheck:
             file_path = os.path.join(file_base_path, file_name)
             try:
                 # Upload the file, executing the upload operation in an executor to prevent blocking.
-                await loop.run_in_executor(
-                    None, lambda: self._upload_file(ftp, file_path, file_name)
-                )
+                with phase(self.service_check_priv, "transfer"):
+                    await loop.run_in_executor(
+                        None, lambda: self._upload_file(ftp, file_path, file_name)
+                    )
                 success_files.append(file_name)
             except Exception as e:
                 failed_files.append(file_name)
@@ -1,17 +1,45 @@
 import requests
 import asyncio
 from .Results import ServiceHealthCheck
+from .ContentVerification import ContentVerifier, CHUNK_SIZE
+from .Metrics import phase, timed_calls
 
 
 class HTTPCheck:
+    timeout = 4
+
     def __init__(self, service_check: ServiceHealthCheck):
         # Initialize the HTTPCheck object with a ServiceHealthCheck instance.
         self.service_check_priv = service_check
 
+    def _fetch(self, full_url, timeout, verifier):
+        """Blocking GET that streams the body through the content verifier."""
+        # With stream=True this returns once the headers are in.
+        with phase(self.service_check_priv, "connect"):
+            response = requests.get(full_url, timeout=timeout, stream=True)
+        try:
+            if response.status_code == 200 and verifier:
+                feed = timed_calls(verifier.feed)
+                try:
+                    with phase(self.service_check_priv, "transfer"):
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            # Stop as soon as the verifier has what it needs.
+                            if feed(chunk):
+                                break
+                finally:
+                    feed.split(self.service_check_priv, "hash", "transfer")
+            return response.status_code
+        finally:
+            # Closing drops any unread body instead of downloading it.
+            response.close()
+
     async def execute(self):
         """Execute the HTTP Check."""
         # Initialize details dictionary with target host and timeout.
-        details = {"target": self.service_check_priv.target_host, "timeout": 4}
+        details = {
+            "target": self.service_check_priv.target_host,
+            "timeout": self.service_check_priv.timeout or self.timeout,
+        }
 
         # If HTTP info is provided, populate the details dictionary with URL and path.
         if self.service_check_priv.http_info:
@@ -27,22 +55,36 @@ class HTTPCheck:
             full_url = f"http://{details['url']}"
         details["full_url"] = full_url
 
+        # Optional hash/substring/regex checks on the page body.
+        verifier = None
+        if self.service_check_priv.http_info:
+            verifier = ContentVerifier.from_info(self.service_check_priv.http_info)
+
         try:
             # Since requests.get is a blocking operation, use run_in_executor to run it asynchronously.
-            response = await loop.run_in_executor(
-                None, requests.get, full_url, details["timeout"]
+            status_code = await loop.run_in_executor(
+                None, self._fetch, full_url, details["timeout"], verifier
             )
             # Check if the HTTP request was successful.
-            if response.status_code == 200:
-                # Mark the check as successful if the status code is 200.
-                self.service_check_priv.result.success(
-                    feedback=f"HTTP Accessible to host {self.service_check_priv.target_host} for page {details['path']}",
+            if status_code != 200:
+                # Fail the check if the status code is not 200.
+                self.service_check_priv.result.fail(
+                    feedback=f"Host {self.service_check_priv.target_host} returned status {status_code}",
+                    staff_details=details,
+                )
+            elif verifier and verifier.problems():
+                # Up, but the page is defaced, empty or otherwise wrong.
+                details.update(verifier.details())
+                self.service_check_priv.result.warn(
+                    feedback=f"HTTP Accessible to host {self.service_check_priv.target_host} but page {details['path']} is wrong: {', '.join(verifier.problems())}",
                     staff_details=details,
                 )
             else:
-                # Fail the check if the status code is not 200.
-                self.service_check_priv.result.fail(
-                    feedback=f"Host {self.service_check_priv.target_host} returned status {response.status_code}",
+                # Mark the check as successful if the status code is 200 and the content verified.
+                if verifier:
+                    details.update(verifier.details())
+                self.service_check_priv.result.success(
+                    feedback=f"HTTP Accessible to host {self.service_check_priv.target_host} for page {details['path']}",
                     staff_details=details,
                 )
         except requests.exceptions.ConnectionError as e:
@@ -65,9 +107,5 @@ class HTTPCheck:
                 feedback="An unknown error occurred during the HTTP check",
                 staff_details=details,
             )
-        finally:
-            # Ensure the response is closed to free up resources.
-            if "response" in locals() and response is not None:
-                response.close()
 
         return self.service_check_priv
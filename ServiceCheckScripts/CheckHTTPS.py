@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+import asyncio
+import http.client
+import ssl
+import threading
+import time
+
+from .Results import ServiceHealthCheck
+from .ContentVerification import ContentVerifier, CHUNK_SIZE
+from .Metrics import phase, add_phase, timed_calls
+from .EngineLogger import get_logger
+
+logger = get_logger("https")
+
+
+class ResumingHTTPSConnection(http.client.HTTPSConnection):
+    """
+    HTTPSConnection that offers a cached TLS session and times the TCP connect
+    and the handshake.
+    """
+
+    def __init__(self, host, port, context, tls_session, timeout):
+        super().__init__(host, port, timeout=timeout, context=context)
+        self.tls_session = tls_session
+        self.connect_start = None
+        self.connect_time = None
+        self.handshake_time = None
+
+    def connect(self):
+        # Plain TCP connect, then the TLS handshake with the cached session.
+        self.connect_start = time.perf_counter()
+        http.client.HTTPConnection.connect(self)
+        self.connect_time = time.perf_counter() - self.connect_start
+        start = time.perf_counter()
+        self.sock = self._context.wrap_socket(
+            self.sock, server_hostname=self.host, session=self.tls_session
+        )
+        self.handshake_time = time.perf_counter() - start
+
+
+class HTTPSCheck:
+    timeout = 4
+
+    # (host, port, ca_file, verified) -> ssl.SSLSession, kept across rounds
+    # so later rounds resume instead of doing a full handshake.
+    _session_cache = {}
+    # (ca_file, verified) -> ssl.SSLContext, sessions only resume on the same context.
+    _contexts = {}
+    _lock = threading.Lock()
+
+    # Handshake counts since the engine started, and for the current round.
+    handshake_totals = {"full": 0, "resumed": 0}
+    handshake_round = {"full": 0, "resumed": 0}
+
+    def __init__(self, service_check: ServiceHealthCheck):
+        # Initialize the HTTPSCheck object with a ServiceHealthCheck instance.
+        self.service_check_priv = service_check
+
+    @classmethod
+    async def setup_round(cls):
+        """Reset the per-round handshake counters."""
+        cls.handshake_round = {"full": 0, "resumed": 0}
+
+    @classmethod
+    async def teardown_round(cls):
+        """Report how many full handshakes session resumption saved."""
+        logger.info(
+            "HTTPS handshakes this round: %d full, %d resumed (saved), %d resumed in total",
+            cls.handshake_round["full"],
+            cls.handshake_round["resumed"],
+            cls.handshake_totals["resumed"],
+            extra={"service_name": "HTTPS"},
+        )
+
+    @classmethod
+    def _context(cls, ca_file, verified: bool) -> ssl.SSLContext:
+        """Get the shared SSLContext for a CA file and verification mode."""
+        key = (ca_file, verified)
+        with cls._lock:
+            context = cls._contexts.get(key)
+            if context is None:
+                context = ssl.create_default_context(cafile=ca_file)
+                if not verified:
+                    # Only used to see if the site is up once verification failed.
+                    context.check_hostname = False
+                    context.verify_mode = ssl.CERT_NONE
+                cls._contexts[key] = context
+        return context
+
+    def _fetch(self, host: str, port: int, path: str, verified: bool) -> dict:
+        """Blocking GET over TLS, resuming a cached session when there is one."""
+        ca_file = self.service_check_priv.https_info.ca_file
+        cache_key = (host, port, ca_file, verified)
+        connection = ResumingHTTPSConnection(
+            host,
+            port,
+            self._context(ca_file, verified),
+            self._session_cache.get(cache_key),
+            self.service_check_priv.timeout or self.timeout,
+        )
+        try:
+            connection.connect()
+            add_phase(
+                self.service_check_priv,
+                "connect",
+                connection.connect_time,
+                connection.connect_start,
+            )
+            add_phase(
+                self.service_check_priv,
+                "handshake",
+                connection.handshake_time,
+                connection.connect_start + connection.connect_time,
+            )
+            with phase(self.service_check_priv, "request"):
+                connection.request("GET", "/" + (path or ""))
+                # The connection hands its socket to the response, keep a reference.
+                tls_socket = connection.sock
+                response = connection.getresponse()
+
+            # Read the TLS details before the body, the socket closes once the
+            # response is consumed. Session tickets (TLS 1.3) have arrived with
+            # the response headers by now.
+            reused = tls_socket.session_reused
+            info = {
+                "status": response.status,
+                "handshake_ms": round(connection.handshake_time * 1000, 3),
+                "tls_version": tls_socket.version(),
+                "cipher": tls_socket.cipher()[0],
+                "session_reused": reused,
+                "cert": tls_socket.getpeercert() if verified else None,
+            }
+            with self._lock:
+                if tls_socket.session is not None:
+                    self._session_cache[cache_key] = tls_socket.session
+                counter = "resumed" if reused else "full"
+                self.handshake_totals[counter] += 1
+                self.handshake_round[counter] += 1
+
+            # The body is only read when there is content to verify, and then
+            # only until the verifier is satisfied or hits its byte cap.
+            verifier = ContentVerifier.from_info(self.service_check_priv.https_info)
+            if response.status == 200 and verifier:
+                feed = timed_calls(verifier.feed)
+                try:
+                    with phase(self.service_check_priv, "transfer"):
+                        while not verifier.done:
+                            chunk = response.read(CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            feed(chunk)
+                finally:
+                    feed.split(self.service_check_priv, "hash", "transfer")
+                info.update(verifier.details())
+                info["content_problems"] = verifier.problems()
+            return info
+        finally:
+            connection.close()
+
+    def _port(self) -> int:
+        """Use the action's PORT when it is numeric, otherwise 443."""
+        try:
+            return int(self.service_check_priv.target_port)
+        except (TypeError, ValueError):
+            return 443
+
+    async def execute(self):
+        """Execute the HTTPS Check."""
+        target = self.service_check_priv.target_host
+        https_info = self.service_check_priv.https_info
+        if not https_info:
+            self.service_check_priv.result.error(
+                feedback=f"No HTTPS info given for target: {target}",
+                staff_details={"target": target},
+            )
+            return self.service_check_priv
+
+        details = {
+            "target": target,
+            "url": https_info.url,
+            "path": https_info.path,
+            "port": self._port(),
+        }
+        loop = asyncio.get_running_loop()
+        cert_problem = None
+
+        try:
+            # The TLS handshake and request are blocking, run them in the executor.
+            info = await loop.run_in_executor(
+                None, self._fetch, https_info.url, details["port"], https_info.path, True
+            )
+        except ssl.SSLCertVerificationError as e:
+            # The site may be up with a bad certificate, retry without verification.
+            cert_problem = e.verify_message
+            details["cert_error"] = cert_problem
+            try:
+                info = await loop.run_in_executor(
+                    None,
+                    self._fetch,
+                    https_info.url,
+                    details["port"],
+                    https_info.path,
+                    False,
+                )
+            except Exception as retry_error:
+                return self._connect_failed(retry_error, details)
+        except Exception as e:
+            return self._connect_failed(e, details)
+
+        cert = info.pop("cert")
+        details.update(info)
+
+        if info["status"] != 200:
+            self.service_check_priv.result.fail(
+                feedback=f"Host {target} returned status {info['status']}",
+                staff_details=details,
+            )
+            return self.service_check_priv
+
+        warnings = []
+        if cert_problem:
+            # Reachable, but the certificate is expired, untrusted or for another host.
+            if https_info.cert_fail_on_invalid:
+                self.service_check_priv.result.fail(
+                    feedback=f"HTTPS reachable on host {target} but the certificate is invalid: {cert_problem}",
+                    staff_details=details,
+                )
+                return self.service_check_priv
+            warnings.append(f"the certificate is invalid: {cert_problem}")
+        else:
+            days_left = (
+                ssl.cert_time_to_seconds(cert["notAfter"]) - time.time()
+            ) / 86400
+            details["cert_not_after"] = cert["notAfter"]
+            details["cert_days_left"] = round(days_left, 1)
+            if days_left < https_info.cert_warn_days:
+                warnings.append(f"the certificate expires in {int(days_left)} days")
+
+        # Up, but the page is defaced, empty or otherwise wrong.
+        warnings.extend(details.pop("content_problems", None) or [])
+
+        if warnings:
+            self.service_check_priv.result.warn(
+                feedback=f"HTTPS reachable on host {target} but {'; '.join(warnings)}",
+                staff_details=details,
+            )
+            return self.service_check_priv
+
+        self.service_check_priv.result.success(
+            feedback=f"HTTPS Accessible to host {target} for page {https_info.path}",
+            staff_details=details,
+        )
+        return self.service_check_priv
+
+    def _connect_failed(self, error, details):
+        """Map connection, handshake and timeout errors to a failed result."""
+        details["raw"] = str(error)
+        if isinstance(error, ssl.SSLError):
+            feedback = "TLS handshake failed"
+        elif isinstance(error, TimeoutError):
+            feedback = "Request timed out"
+        elif isinstance(error, OSError):
+            feedback = f"Failed to connect to server, is port {details['port']} open?"
+        else:
+            self.service_check_priv.result.error(
+                feedback="An unknown error occurred during the HTTPS check",
+                staff_details=details,
+            )
+            return self.service_check_priv
+        self.service_check_priv.result.fail(feedback=feedback, staff_details=details)
+        return self.service_check_priv
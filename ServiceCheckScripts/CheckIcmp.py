@@ -5,12 +5,15 @@ import asyncio  # Import the asyncio library for asynchronous programming.
 from .Results import (
     ServiceHealthCheck,
 )  # Import ServiceHealthCheck from the Results module in the current package.
+from .Metrics import phase
 
 # Enable specific Errors in ping3 library to be raised during execution.
 ping3.EXCEPTIONS = True
 
 
 class ICMPCheck:
+    timeout = 4
+
     def __init__(self, service_check: ServiceHealthCheck):
         # Initialize the ICMPCheck object with a service_check instance.
         self.service_check_priv = service_check
@@ -21,18 +24,20 @@ class ICMPCheck:
             "target": self.service_check_priv.target_host
         }  # Details dict to store target host information.
         loop = asyncio.get_running_loop()  # Get the current asyncio event loop.
+        timeout = self.service_check_priv.timeout or self.timeout
 
         try:
             # Perform the ping operation asynchronously.
-            # ping3.ping method is called in an executor, with the target host and a 4-second timeout as arguments.
-            result = await loop.run_in_executor(
-                None, ping3.ping, self.service_check_priv.target_host, 4
-            )
+            # ping3.ping method is called in an executor, with the target host and the timeout as arguments.
+            with phase(self.service_check_priv, "connect"):
+                result = await loop.run_in_executor(
+                    None, ping3.ping, self.service_check_priv.target_host, timeout
+                )
         except ping3.errors.Timeout as e:
             # Handle timeout errors by logging and setting the result to fail with a descriptive message.
             details["raw"] = str(e)
             self.service_check_priv.result.fail(
-                feedback=f"Request Timed Out after 4 seconds for host {self.service_check_priv.target_host}",
+                feedback=f"Request Timed Out after {timeout:g} seconds for host {self.service_check_priv.target_host}",
                 staff_details=details,
             )
             return self.service_check_priv
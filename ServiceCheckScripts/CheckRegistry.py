@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+import importlib
+
+from .EngineLogger import get_logger
+
+logger = get_logger("registry")
+
+# SERVICE_NAME -> (module, check class). Modules are only imported when a
+# prepared plan first contains that service, so an ICMP only config never
+# pulls in paramiko, requests or mysql.
+CHECK_PLUGINS = {
+    "ICMP": ("ServiceCheckScripts.CheckIcmp", "ICMPCheck"),
+    "FTP": ("ServiceCheckScripts.CheckFTP", "FTPCheck"),
+    "SSH": ("ServiceCheckScripts.CheckSSH", "SSHCheck"),
+    "HTTP": ("ServiceCheckScripts.CheckHTTP", "HTTPCheck"),
+    "HTTPS": ("ServiceCheckScripts.CheckHTTPS", "HTTPSCheck"),
+    "SQL": ("ServiceCheckScripts.CheckSQL", "SQLCheck"),
+    "TCP": ("ServiceCheckScripts.CheckTCP", "TCPCheck"),
+}
+
+
+class CheckPlugin:
+    """
+    A lazily imported check class and its per-round hooks.
+
+    A check class may define `async def setup_round(cls)` and
+    `async def teardown_round(cls)` classmethods to own resources such as
+    connection pools for the length of a round.
+    """
+
+    def __init__(self, service_name: str, module_name: str, class_name: str):
+        self.service_name = service_name
+        self.module_name = module_name
+        self.class_name = class_name
+        self.check_class = None
+
+    def load(self):
+        """Import the check module and resolve the check class."""
+        if self.check_class is None:
+            module = importlib.import_module(self.module_name)
+            self.check_class = getattr(module, self.class_name)
+            logger.debug(
+                "Loaded check plugin %s",
+                self.module_name,
+                extra={"service_name": self.service_name},
+            )
+        return self.check_class
+
+    async def setup_round(self):
+        """Run the check class's setup_round hook, if it has one."""
+        hook = getattr(self.load(), "setup_round", None)
+        if hook:
+            await hook()
+
+    async def teardown_round(self):
+        """Run the check class's teardown_round hook, if it has one."""
+        hook = getattr(self.load(), "teardown_round", None)
+        if hook:
+            await hook()
+
+
+_plugins = {
+    service_name: CheckPlugin(service_name, module_name, class_name)
+    for service_name, (module_name, class_name) in CHECK_PLUGINS.items()
+}
+
+
+def register_check(service_name: str, module_name: str, class_name: str):
+    """Register (or replace) the check class used for a SERVICE_NAME."""
+    _plugins[service_name] = CheckPlugin(service_name, module_name, class_name)
+
+
+def get_plugin(service_name: str) -> CheckPlugin:
+    """Get the loaded plugin for a service. Raises KeyError for unknown services."""
+    plugin = _plugins[service_name]
+    plugin.load()
+    return plugin
+
+
+def load_plan(service_checks: list) -> list:
+    """Import the plugins a prepared plan needs and return them."""
+    plugins = []
+    for service_name in {check.service_name for check in service_checks}:
+        try:
+            plugins.append(get_plugin(service_name))
+        except KeyError:
+            logger.error(
+                "No check registered for service, its checks will error",
+                extra={"service_name": service_name},
+            )
+    return plugins
+
+
+async def setup_round(plugins: list):
+    """Run every plugin's setup_round hook."""
+    for plugin in plugins:
+        await plugin.setup_round()
+
+
+async def teardown_round(plugins: list):
+    """Run every plugin's teardown_round hook, even if one of them fails."""
+    for plugin in plugins:
+        try:
+            await plugin.teardown_round()
+        except Exception as e:
+            logger.error(
+                "teardown_round failed: %s",
+                e,
+                extra={"service_name": plugin.service_name},
+            )
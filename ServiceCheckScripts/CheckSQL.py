@@ -1,9 +1,12 @@
 from .Results import ServiceHealthCheck
+from .Metrics import phase
 import mysql.connector
 import asyncio
 
 
 class SQLCheck:
+    timeout = 10
+
     def __init__(self, service_check: ServiceHealthCheck):
         # Store the service check instance for later use.
         self.service_check_priv = service_check
@@ -24,19 +27,23 @@ class SQLCheck:
 
         try:
             # Attempt to asynchronously connect to the database.
-            db = await loop.run_in_executor(
-                None,
-                lambda: mysql.connector.connect(
-                    host=details["target"],
-                    user=details["username"],
-                    password=details["password"],
-                    database=details["db_name"],
-                ),
-            )
+            with phase(self.service_check_priv, "connect"):
+                db = await loop.run_in_executor(
+                    None,
+                    lambda: mysql.connector.connect(
+                        host=details["target"],
+                        user=details["username"],
+                        password=details["password"],
+                        database=details["db_name"],
+                        connection_timeout=self.service_check_priv.timeout
+                        or self.timeout,
+                    ),
+                )
             try:
                 # Perform read and write checks on the database.
-                await self._check_table_read(loop, db, details)
-                await self._check_table_write(loop, db, details)
+                with phase(self.service_check_priv, "query"):
+                    await self._check_table_read(loop, db, details)
+                    await self._check_table_write(loop, db, details)
 
                 # If successful, return a success result.
                 return self.service_check_priv.result.success(
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import asyncio
+import os
 import sys
 import socket
 import paramiko
@@ -9,9 +10,20 @@ import paramiko.ssh_exception
 from pathlib import Path
 
 from .Results import ServiceHealthCheck
+from .ContentVerification import ContentVerifier, CHUNK_SIZE, DEFAULT_MAX_BYTES
+from .EngineLogger import get_logger, check_context
+from .Metrics import phase, timed_calls
+
+logger = get_logger("ssh")
 
 
 class SSHCheck:
+    timeout = 5
+
+    # (key file, modified time) -> loaded key, parsing a key costs more than
+    # using it and every target of a team shares one.
+    _keys = {}
+
     def __init__(self, service_check: ServiceHealthCheck):
         # Initialize the SSHCheck object with a service_check instance and details dictionary.
         self.service_check_priv = service_check
@@ -27,11 +39,41 @@ class SSHCheck:
                     "md5_sum": self.service_check_priv.ssh_info.md5sum,
                 }
             )
+            if self.service_check_priv.ssh_info.files:
+                self.details.update(
+                    {
+                        "files": self.service_check_priv.ssh_info.files,
+                        "sums": self.service_check_priv.ssh_info.md5_sums,
+                    }
+                )
         else:
             # Exit the program if SSH information is missing.
-            print("Error while retrieving SSH info for target", self.details["target"])
+            logger.error(
+                "Error while retrieving SSH info for target",
+                extra={"target_host": self.details["target"], "service_name": "SSH"},
+            )
             sys.exit(0)
 
+    def _port(self):
+        # Use the action's PORT when it is numeric, otherwise 22.
+        try:
+            return int(self.service_check_priv.target_port)
+        except (TypeError, ValueError):
+            return 22
+
+    def _timeout(self):
+        # The learned timeout for this target, otherwise the check's default.
+        return self.service_check_priv.timeout or self.timeout
+
+    @classmethod
+    def _private_key(cls, path: str) -> paramiko.RSAKey:
+        # A replaced key file has a new modified time and is loaded again.
+        cache_key = (path, os.stat(path).st_mtime_ns)
+        key = cls._keys.get(cache_key)
+        if key is None:
+            key = cls._keys[cache_key] = paramiko.RSAKey.from_private_key_file(path)
+        return key
+
     def is_completely_empty_err(self, s):
         # Check if a given string is not just whitespace.
         return s.strip()
@@ -41,27 +83,30 @@ class SSHCheck:
         try:
             # Load the private key from a file specified in the details.
             private_key_file_name = self.details["ssh_priv_key"]
-            private_key_file_path = str(Path.home()) + "/" + private_key_file_name
+            # Relative key names are looked up in the home directory.
+            private_key_file_path = str(Path.home() / private_key_file_name)
 
-            private_key_file_obj = paramiko.RSAKey.from_private_key_file(
-                private_key_file_path
-            )
-            # Connect to the target host asynchronously.
-            await loop.run_in_executor(
-                None,
-                lambda: ssh.connect(
-                    hostname=self.details["target"],
-                    username=self.details["ssh_username"],
-                    pkey=private_key_file_obj,
-                    timeout=5,
-                ),
-            )
+            # Only loading the key, the login is part of connect.
+            with phase(self.service_check_priv, "key_load"):
+                private_key_file_obj = self._private_key(private_key_file_path)
+            # Connect to the target host asynchronously, this includes the key exchange and login.
+            with phase(self.service_check_priv, "connect"):
+                await loop.run_in_executor(
+                    None,
+                    lambda: ssh.connect(
+                        hostname=self.details["target"],
+                        port=self._port(),
+                        username=self.details["ssh_username"],
+                        pkey=private_key_file_obj,
+                        timeout=self._timeout(),
+                    ),
+                )
             return self.service_check_priv
         except (paramiko.ssh_exception.NoValidConnectionsError, socket.timeout) as e:
             # Handle connection errors and timeouts, marking the result accordingly.
             self.details["raw"] = str(e)
             self.service_check_priv.result.fail(
-                feedback=f"Request Timed Out after 5 seconds for host {self.service_check_priv.target_host}",
+                feedback=f"Request Timed Out after {self._timeout():g} seconds for host {self.service_check_priv.target_host}",
                 staff_details=self.details,
             )
             return self.service_check_priv
@@ -84,10 +129,11 @@ class SSHCheck:
 
     def test_interactions(self, ssh: SSHClient):
         # Execute commands via SSH and process the output.
-        stdin, stdout, stderr = ssh.exec_command(self.details["ssh_script"])
+        with phase(self.service_check_priv, "exec"):
+            stdin, stdout, stderr = ssh.exec_command(self.details["ssh_script"])
 
-        stdout_data = stdout.read().decode()
-        stderr_data = stderr.readlines()
+            stdout_data = stdout.read().decode()
+            stderr_data = stderr.readlines()
 
         stdout_list = stdout_data.split(" ")
         retrieved_md5_sum = stdout_list[0]
@@ -106,6 +152,91 @@ class SSHCheck:
                 staff_details=self.details,
             )
 
+    def _open_files(self, sftp, max_bytes: int, file_details: dict) -> list:
+        # Open every file and request all of its blocks, so the reads of
+        # every file are in flight on the one session at the same time.
+        sums = self.service_check_priv.ssh_info.md5_sums or []
+        opened = []
+        for index, path in enumerate(self.service_check_priv.ssh_info.files):
+            if index >= len(sums):
+                file_details[path] = {"problems": ["no MD5_SUM given"]}
+                continue
+            try:
+                remote_file = sftp.open(path, "rb")
+                size = remote_file.stat().st_size
+            except (IOError, OSError) as e:
+                file_details[path] = {"problems": [f"could not open: {e}"]}
+                continue
+            if size > max_bytes:
+                # Can't match, don't spend the transfer on it.
+                remote_file.close()
+                file_details[path] = {
+                    "size": size,
+                    "problems": [f"file is larger than {max_bytes} bytes, MD5 not checked"],
+                }
+                continue
+            if size:
+                remote_file.prefetch(size)
+            verifier = ContentVerifier(md5_sum=sums[index], max_bytes=max_bytes)
+            opened.append((path, remote_file, verifier))
+        return opened
+
+    def verify_files(self, ssh: SSHClient):
+        # Hash the files on the checker as they stream in over one SFTP
+        # session, the results match FTP GET's.
+        max_bytes = self.service_check_priv.ssh_info.max_bytes or DEFAULT_MAX_BYTES
+        file_details = {}
+        success_files = []
+        # Hashing is timed apart from the SFTP reads it is interleaved with.
+        feed = timed_calls(ContentVerifier.feed)
+        try:
+            with phase(self.service_check_priv, "transfer"):
+                try:
+                    sftp = ssh.open_sftp()
+                except (paramiko.SSHException, OSError) as e:
+                    self.details["raw"] = str(e)
+                    self.service_check_priv.result.warn(
+                        feedback=f"Able to Connect: {self.details['target']}, but could not start SFTP as user {self.details['ssh_username']}",
+                        staff_details=self.details,
+                    )
+                    return
+                try:
+                    for path, remote_file, verifier in self._open_files(sftp, max_bytes, file_details):
+                        try:
+                            while not verifier.done:
+                                chunk = remote_file.read(CHUNK_SIZE)
+                                if not chunk:
+                                    break
+                                feed(verifier, chunk)
+                            problems = verifier.problems()
+                        except (IOError, OSError) as e:
+                            problems = [f"read failed: {e}"]
+                        finally:
+                            remote_file.close()
+                        file_details[path] = dict(verifier.details(), problems=problems)
+                        if not problems:
+                            success_files.append(path)
+                finally:
+                    sftp.close()
+        finally:
+            feed.split(self.service_check_priv, "hash", "transfer")
+
+        self.details["successful_files"] = success_files
+        self.details["file_results"] = file_details
+        failed_files = [
+            path for path in self.service_check_priv.ssh_info.files if path not in success_files
+        ]
+        if failed_files:
+            self.service_check_priv.result.warn(
+                feedback=f"Failed either to retrieve or pass integrity check on the following file(s): {', '.join(failed_files)} \nAs user: {self.details['ssh_username']}",
+                staff_details=self.details,
+            )
+            return
+        self.service_check_priv.result.success(
+            feedback=f"Successful Downloading of files as user {self.details['ssh_username']}",
+            staff_details=self.details,
+        )
+
     async def execute(self):
         # Main method to execute the SSH check.
         loop = asyncio.get_running_loop()
@@ -116,16 +247,26 @@ class SSHCheck:
         try:
             # Test the connection to the target.
             await self.test_connection(ssh_client, loop)
-        except Exception as exc:
-            print(exc)
-            return (
-                self.service_check_priv
-            )  # Return immediately if an error occurs during connection test.
+            if self.service_check_priv.result.result is not None:
+                # The connect failed and was scored, there is no session to use.
+                return self.service_check_priv
 
-        try:
-            # Execute interactions if connection is successful.
-            self.test_interactions(ssh_client)
-        except Exception as exc:
-            print(exc)
+            # Verify the files when given, otherwise run the script.
+            if self.service_check_priv.ssh_info.files:
+                interaction = self.verify_files
+            else:
+                interaction = self.test_interactions
+            try:
+                # Execute interactions if connection is successful, the command
+                # and its output are blocking reads so they run in the executor.
+                await loop.run_in_executor(None, interaction, ssh_client)
+            except Exception as exc:
+                logger.warning(
+                    "SSH interaction raised: %s",
+                    exc,
+                    extra=check_context(self.service_check_priv),
+                )
+        finally:
+            ssh_client.close()
 
         return self.service_check_priv
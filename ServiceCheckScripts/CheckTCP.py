@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+import asyncio
+import re
+import socket
+
+from .Results import ServiceHealthCheck
+from .Metrics import phase
+
+
+class TCPCheck:
+    # Defaults for the CONNECT_TIMEOUT and BANNER_TIMEOUT action keys.
+    # Connections per target host are limited by the SCHEDULER settings.
+    connect_timeout = 3
+    banner_timeout = 2
+    banner_bytes = 1024
+
+    def __init__(self, service_check: ServiceHealthCheck):
+        # Initialize the TCPCheck object with a service_check instance.
+        self.service_check_priv = service_check
+        tcp_info = service_check.tcp_info
+        if tcp_info and tcp_info.connect_timeout:
+            self.connect_timeout = float(tcp_info.connect_timeout)
+        if tcp_info and tcp_info.banner_timeout:
+            self.banner_timeout = float(tcp_info.banner_timeout)
+
+    async def execute(self):
+        """Execute the TCP Check."""
+        target = self.service_check_priv.target_host
+        details = {"target": target, "port": self.service_check_priv.target_port}
+
+        try:
+            port = int(self.service_check_priv.target_port)
+        except (TypeError, ValueError):
+            self.service_check_priv.result.error(
+                feedback=f"No valid PORT given for TCP check on target: {target}",
+                staff_details=details,
+            )
+            return self.service_check_priv
+
+        connect_timeout = self.service_check_priv.timeout or self.connect_timeout
+        try:
+            # Plain asyncio connect, no executor threads involved.
+            with phase(self.service_check_priv, "connect"):
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(target, port), connect_timeout
+                )
+        except ConnectionRefusedError as e:
+            # A RST came back, the host is up but nothing is listening.
+            details["raw"] = str(e)
+            self.service_check_priv.result.fail(
+                feedback=f"Port {port} on host {target} refused the connection",
+                staff_details=details,
+            )
+            return self.service_check_priv
+        except asyncio.TimeoutError:
+            # No answer at all, the port is filtered or the host is down.
+            self.service_check_priv.result.timeout(
+                feedback=f"Port {port} on host {target} did not answer after {connect_timeout:g} seconds, is it filtered?",
+                staff_details=details,
+            )
+            return self.service_check_priv
+        except socket.gaierror as e:
+            details["raw"] = str(e)
+            self.service_check_priv.result.error(
+                feedback=f"Could not resolve host: {target}",
+                staff_details=details,
+            )
+            return self.service_check_priv
+        except OSError as e:
+            # Host or network unreachable and similar ICMP errors.
+            details["raw"] = str(e)
+            self.service_check_priv.result.fail(
+                feedback=f"Could not reach port {port} on host {target}",
+                staff_details=details,
+            )
+            return self.service_check_priv
+
+        try:
+            return await self._check_banner(reader, port, details)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def _check_banner(self, reader, port, details):
+        """Match the service banner against BANNER_REGEX, if one is configured."""
+        target = self.service_check_priv.target_host
+        tcp_info = self.service_check_priv.tcp_info
+        if not tcp_info or not tcp_info.banner_regex:
+            return self._open(port, details)
+
+        try:
+            with phase(self.service_check_priv, "transfer"):
+                banner = await asyncio.wait_for(
+                    reader.read(self.banner_bytes), self.banner_timeout
+                )
+        except (asyncio.TimeoutError, OSError) as e:
+            details["raw"] = str(e)
+            self.service_check_priv.result.warn(
+                feedback=f"Port {port} on host {target} is open but sent no banner",
+                staff_details=details,
+            )
+            return self.service_check_priv
+
+        details["banner"] = banner.decode(errors="replace")
+        if re.search(tcp_info.banner_regex, details["banner"]):
+            return self._open(port, details)
+
+        self.service_check_priv.result.warn(
+            feedback=f"Port {port} on host {target} is open but the banner did not match",
+            staff_details=details,
+        )
+        return self.service_check_priv
+
+    def _open(self, port, details):
+        self.service_check_priv.result.success(
+            feedback=f"Port {port} open on host {self.service_check_priv.target_host}",
+            staff_details=details,
+        )
+        return self.service_check_priv
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+import os
+import pickle
+import time
+
+from .EngineLogger import get_logger
+
+logger = get_logger("checkpoint")
+
+# Defaults for the ENGINE -> CHECKPOINT section of EnvVars.yaml.
+DEFAULT_SETTINGS = {
+    "ENABLED": False,
+    "DIRECTORY": "state",
+    "EVERY_ROUNDS": 1,
+}
+
+# Bumped whenever the layout of the saved state changes.
+STATE_VERSION = 1
+
+
+def write_atomic(path: str, data):
+    """
+    Pickle data to path so a crash leaves either the old file or the new one:
+    write a temporary file, fsync it, rename it over path, fsync the directory.
+    """
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as temporary_file:
+        pickle.dump(data, temporary_file, protocol=pickle.HIGHEST_PROTOCOL)
+        temporary_file.flush()
+        os.fsync(temporary_file.fileno())
+    os.replace(temporary_path, path)
+    directory = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def read(path: str):
+    """Unpickle path, or None when it doesn't exist."""
+    try:
+        with open(path, "rb") as state_file:
+            return pickle.load(state_file)
+    except FileNotFoundError:
+        return None
+
+
+class Checkpointer:
+    """
+    Engine state saved between rounds, and a write-ahead copy of the round
+    being flushed to the database.
+
+    The state is a dict of picklable values (round number, run id, delta
+    tracker, breakers, scoreboard). The write-ahead log holds the last
+    round's RoundWrites and is written before each database flush, so a
+    crash during the flush can be replayed on resume. The files are local
+    to the engine and trusted, they are plain pickles.
+    """
+
+    def __init__(self, directory: str, every_rounds: int = 1):
+        self.directory = directory
+        self.every_rounds = max(1, every_rounds)
+        self.state_path = os.path.join(directory, "engine.ckpt")
+        self.wal_path = os.path.join(directory, "round.wal")
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, round_number: int, state: dict, force: bool = False):
+        """Save the state after round_number, every EVERY_ROUNDS rounds."""
+        if not force and round_number % self.every_rounds:
+            return
+        start = time.perf_counter()
+        state = dict(state, version=STATE_VERSION, round_number=round_number)
+        write_atomic(self.state_path, state)
+        logger.info(
+            "Checkpoint after round %d saved in %.1fms (%d bytes)",
+            round_number,
+            (time.perf_counter() - start) * 1000,
+            os.path.getsize(self.state_path),
+        )
+
+    def load(self):
+        """The saved state, or None when there is none or it is from another version."""
+        start = time.perf_counter()
+        state = read(self.state_path)
+        if state is None:
+            return None
+        if state.get("version") != STATE_VERSION:
+            logger.warning(
+                "Ignoring checkpoint %s from state version %s",
+                self.state_path,
+                state.get("version"),
+            )
+            return None
+        logger.info(
+            "Checkpoint after round %d loaded in %.1fms",
+            state["round_number"],
+            (time.perf_counter() - start) * 1000,
+        )
+        return state
+
+    def write_ahead(self, round_writes):
+        """Keep the round's writes on disk before they are flushed to the database."""
+        write_atomic(self.wal_path, round_writes)
+
+    def pending_writes(self):
+        """The last round written ahead, or None."""
+        return read(self.wal_path)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+import asyncio
+import time
+
+from .Results import ServiceHealthCheck, ResultCode
+from .EngineLogger import get_logger
+
+logger = get_logger("breaker")
+
+# Defaults for the ENGINE -> CIRCUIT_BREAKER section of EnvVars.yaml.
+DEFAULT_SETTINGS = {
+    "ENABLED": True,
+    "FAILURE_THRESHOLD": 3,
+    "FULL_CHECK_EVERY": 10,
+    "PROBE_TIMEOUT": 1,
+}
+
+# Services whose full check is expensive enough to sit behind a breaker, and
+# the port probed while the breaker is open when the action has no PORT.
+PROBE_PORTS = {"SSH": 22, "FTP": 21, "SQL": 3306, "HTTP": 80, "HTTPS": 443}
+
+
+def probe_address(service_check: ServiceHealthCheck) -> tuple:
+    """The (host, port) the service's full check connects to."""
+    service_name = service_check.service_name
+    default_port = PROBE_PORTS[service_name]
+    if service_name == "HTTP" and service_check.http_info and service_check.http_info.url:
+        # HTTP connects to URL, which may carry a port, and ignores PORT.
+        address = service_check.http_info.url.split("://")[-1].split("/")[0]
+        host, _, port = address.partition(":")
+        return host, int(port) if port.isdigit() else default_port
+    if service_name == "SQL":
+        # The SQL check always uses the MySQL default port.
+        return service_check.target_host, default_port
+    host = service_check.target_host
+    if service_name == "HTTPS" and service_check.https_info and service_check.https_info.url:
+        host = service_check.https_info.url
+    try:
+        return host, int(service_check.target_port)
+    except (TypeError, ValueError):
+        return host, default_port
+
+
+CLOSED = "closed"
+OPEN = "open"
+
+
+class Breaker:
+    """Failure history of one (team, target, service)."""
+
+    __slots__ = ("state", "consecutive_failures", "rounds_open", "full_check_cost")
+
+    def __init__(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.rounds_open = 0
+        # Duration of the last failed full check, what a skipped round saves.
+        self.full_check_cost = 0.0
+
+
+class CircuitBreakers:
+    """
+    Per (team, target, service) circuit breakers.
+
+    After FAILURE_THRESHOLD failed rounds in a row the breaker opens: each round
+    only a TCP connect to the service port is tried, and the full protocol check
+    runs when that probe succeeds or every FULL_CHECK_EVERY rounds. While the
+    probe fails the service is scored as failed without the full check.
+    """
+
+    def __init__(self, settings: dict = None, probe=None):
+        config = dict(DEFAULT_SETTINGS)
+        config.update(settings or {})
+        self.failure_threshold = int(config["FAILURE_THRESHOLD"])
+        self.full_check_every = int(config["FULL_CHECK_EVERY"])
+        if self.full_check_every < 1:
+            raise ValueError(
+                f"CIRCUIT_BREAKER FULL_CHECK_EVERY must be at least 1, got {self.full_check_every}"
+            )
+        self.probe_timeout = float(config["PROBE_TIMEOUT"])
+        # `await probe(service_check)` returns an error string, or None if the
+        # service answered. Simulations replace the TCP connect.
+        self._probe = probe or self._connect_probe
+        self._breakers = {}
+        self.round_seconds_saved = 0.0
+        self.round_checks_skipped = 0
+
+    def state(self) -> dict:
+        """Every breaker, for a checkpoint."""
+        return self._breakers
+
+    def restore(self, state: dict):
+        """Pick up the breakers from a checkpoint."""
+        self._breakers = state
+
+    def start_round(self):
+        """Reset the per-round savings counters."""
+        self.round_seconds_saved = 0.0
+        self.round_checks_skipped = 0
+
+    def report(self, round_number: int):
+        """Log how much check time the open breakers saved this round."""
+        open_breakers = sum(
+            1 for breaker in self._breakers.values() if breaker.state == OPEN
+        )
+        logger.info(
+            "Round %d circuit breakers: %d open, %d full checks skipped, %.2f check-seconds saved",
+            round_number,
+            open_breakers,
+            self.round_checks_skipped,
+            self.round_seconds_saved,
+        )
+
+    async def run(self, service_check: ServiceHealthCheck, full_check):
+        """Run full_check() for the service, unless its breaker is open and the probe fails."""
+        if service_check.service_name not in PROBE_PORTS:
+            await full_check()
+            return
+
+        key = (
+            service_check.team_id,
+            service_check.target_id,
+            service_check.service_name,
+        )
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = Breaker()
+
+        if breaker.state == OPEN:
+            breaker.rounds_open += 1
+            if breaker.rounds_open % self.full_check_every:
+                start = time.perf_counter()
+                probe_error = await self._probe(service_check)
+                if probe_error:
+                    probe_cost = time.perf_counter() - start
+                    breaker.consecutive_failures += 1
+                    self.round_checks_skipped += 1
+                    self.round_seconds_saved += max(
+                        breaker.full_check_cost - probe_cost, 0.0
+                    )
+                    service_check.result.fail(
+                        feedback=f"{service_check.service_name} on host {service_check.target_host} is still unreachable",
+                        staff_details={
+                            "circuit": OPEN,
+                            "consecutive_failures": breaker.consecutive_failures,
+                            "probe": probe_error,
+                        },
+                    )
+                    return
+
+        start = time.perf_counter()
+        await full_check()
+        self._record(breaker, service_check, time.perf_counter() - start)
+
+    async def _connect_probe(self, service_check: ServiceHealthCheck):
+        """Cheap TCP connect to the service port. Returns an error string, or None if it connected."""
+        host, port = probe_address(service_check)
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port),
+                self.probe_timeout,
+            )
+        except asyncio.TimeoutError:
+            return f"{host} port {port} did not answer"
+        except OSError as e:
+            return f"{host} port {port}: {e}"
+        writer.close()
+        return None
+
+    def _record(self, breaker: Breaker, service_check: ServiceHealthCheck, cost: float):
+        """Update the breaker from a full check's result."""
+        if service_check.result.result in (ResultCode.PASS, ResultCode.WARN):
+            if breaker.state == OPEN:
+                logger.info(
+                    "Circuit closed after %d failed rounds",
+                    breaker.consecutive_failures,
+                    extra=self._context(service_check),
+                )
+            breaker.state = CLOSED
+            breaker.consecutive_failures = 0
+            breaker.rounds_open = 0
+            return
+
+        breaker.consecutive_failures += 1
+        breaker.full_check_cost = cost
+        if breaker.state == CLOSED and breaker.consecutive_failures >= self.failure_threshold:
+            breaker.state = OPEN
+            breaker.rounds_open = 0
+            logger.warning(
+                "Circuit opened after %d failed rounds, probing before full checks",
+                breaker.consecutive_failures,
+                extra=self._context(service_check),
+            )
+
+    @staticmethod
+    def _context(service_check: ServiceHealthCheck) -> dict:
+        return {
+            "team_id": service_check.team_id,
+            "target_id": service_check.target_id,
+            "target_host": service_check.target_host,
+            "service_name": service_check.service_name,
+        }
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+import hashlib
+import re
+from typing import List, Optional
+
+# Defaults for content checks on HTTP/HTTPS actions.
+DEFAULT_MAX_BYTES = 1024 * 1024
+CHUNK_SIZE = 16 * 1024
+# How much earlier body a regex can look back across a chunk boundary.
+REGEX_WINDOW = 64 * 1024
+
+
+class ContentVerifier:
+    """
+    Verifies a response body as it streams in, against an expected MD5 sum,
+    a substring and/or a regex.
+
+    Memory is bounded by one chunk plus the substring/regex carry-over,
+    whatever the size of the page. Reading stops once data past max_bytes
+    arrives, or as soon as everything expected has been found when no hash
+    is needed. A page of exactly max_bytes takes one more read to tell it
+    from a longer one.
+    """
+
+    def __init__(
+        self,
+        md5_sum: Optional[str] = None,
+        substring: Optional[str] = None,
+        regex: Optional[str] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.md5_sum = md5_sum.lower() if md5_sum else None
+        self.substring = substring.encode() if substring else None
+        self.regex = re.compile(regex.encode()) if regex else None
+        self.max_bytes = max_bytes
+
+        self.bytes_read = 0
+        self.truncated = False
+        self._hash = hashlib.md5() if self.md5_sum else None
+        self._substring_found = self.substring is None
+        self._regex_found = self.regex is None
+        self._substring_tail = b""
+        self._regex_tail = b""
+
+    @classmethod
+    def from_info(cls, info) -> Optional["ContentVerifier"]:
+        """Build a verifier from HTTPInfo/HTTPSInfo, or None if it has no content checks."""
+        if not (info.md5_sum or info.contains or info.regex):
+            return None
+        return cls(
+            md5_sum=info.md5_sum,
+            substring=info.contains,
+            regex=info.regex,
+            max_bytes=info.max_bytes or DEFAULT_MAX_BYTES,
+        )
+
+    @property
+    def done(self) -> bool:
+        """True once no more of the body needs to be read."""
+        if self.truncated:
+            return True
+        return self._hash is None and self._substring_found and self._regex_found
+
+    def feed(self, chunk: bytes) -> bool:
+        """Check the next chunk of the body. Returns True when reading can stop."""
+        remaining = self.max_bytes - self.bytes_read
+        # Anything past the cap, even in a later chunk, means the page is too big.
+        if len(chunk) > remaining:
+            chunk = chunk[:remaining]
+            self.truncated = True
+        self.bytes_read += len(chunk)
+
+        if self._hash is not None:
+            self._hash.update(chunk)
+
+        if not self._substring_found:
+            # Keep just enough of the previous chunk to catch a split match.
+            window = self._substring_tail + chunk
+            if self.substring in window:
+                self._substring_found = True
+            carry = len(self.substring) - 1
+            self._substring_tail = window[-carry:] if carry else b""
+
+        if not self._regex_found:
+            window = self._regex_tail + chunk
+            if self.regex.search(window):
+                self._regex_found = True
+            self._regex_tail = window[-REGEX_WINDOW:]
+
+        return self.done
+
+    def problems(self) -> List[str]:
+        """Reasons the body did not verify, empty when it passed."""
+        problems = []
+        if self._hash is not None:
+            if self.truncated:
+                problems.append(f"page is larger than {self.max_bytes} bytes, MD5 not checked")
+            elif self._hash.hexdigest() != self.md5_sum:
+                problems.append("page MD5 does not match")
+        if not self._substring_found:
+            problems.append("expected text not found on page")
+        if not self._regex_found:
+            problems.append("page does not match expected pattern")
+        return problems
+
+    def details(self) -> dict:
+        """Staff details for the content check."""
+        return {
+            "bytes_read": self.bytes_read,
+            "truncated": self.truncated,
+            "md5_sum": self._hash.hexdigest() if self._hash is not None else None,
+        }
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+# Root logger name for everything the engine emits.
+LOGGER_NAME = "scoring_engine"
+
+# Defaults for the ENGINE -> LOGGING section of EnvVars.yaml.
+DEFAULT_SETTINGS = {
+    "LEVEL": "INFO",
+    "FILE": "logs/engine.jsonl",
+    "MAX_BYTES": 10 * 1024 * 1024,
+    "BACKUP_COUNT": 5,
+    "QUEUE_SIZE": 10000,
+    "STDOUT": True,
+    "ERROR_BURST": 5,
+    "ERROR_WINDOW": 60,
+}
+
+# Check context attributes copied from a record into the JSON line, in order.
+CONTEXT_FIELDS = (
+    "team_id",
+    "team_name",
+    "target_id",
+    "target_host",
+    "service_name",
+    "result",
+    "points",
+    "latency",
+    "suppressed",
+)
+
+_listener: logging.handlers.QueueListener = None
+_queue_handler = None
+
+
+class JSONLineFormatter(logging.Formatter):
+    """
+    Formats a record as a single JSON line including any check context.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RepeatedErrorFilter(logging.Filter):
+    """
+    Rate limits repeated warnings/errors for the same message and check.
+
+    The first ERROR_BURST occurrences inside ERROR_WINDOW seconds pass, the rest
+    are dropped and reported as a "suppressed" count on the next one let through.
+    """
+
+    def __init__(self, burst: int, window: float):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._seen = {}
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            return True
+        key = (
+            record.name,
+            record.msg,
+            getattr(record, "team_id", None),
+            getattr(record, "target_host", None),
+            getattr(record, "service_name", None),
+        )
+        state = self._seen.get(key)
+        if state is None or record.created - state[0] >= self.window:
+            # New window, report how many were dropped in the previous one.
+            if state is not None and state[1] > self.burst:
+                record.suppressed = state[1] - self.burst
+            self._seen[key] = [record.created, 1]
+            return True
+        state[1] += 1
+        return state[1] <= self.burst
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that never blocks the caller.
+
+    Records are handed to the writer thread unformatted, and dropped (and
+    counted) if the bounded queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatting happens on the writer thread, not in the check coroutine.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Get a child of the engine logger."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def setup_logging(settings: dict = None):
+    """
+    Start the background log writer. Safe to call more than once, only the
+    first call takes effect.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    config = dict(DEFAULT_SETTINGS)
+    config.update(settings or {})
+    formatter = JSONLineFormatter()
+
+    # Handlers owned by the writer thread, all blocking I/O happens there.
+    handlers = []
+    if config["FILE"]:
+        log_dir = os.path.dirname(os.path.abspath(config["FILE"]))
+        os.makedirs(log_dir, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            config["FILE"],
+            maxBytes=int(config["MAX_BYTES"]),
+            backupCount=int(config["BACKUP_COUNT"]),
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    if config["STDOUT"]:
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(formatter)
+        handlers.append(stream_handler)
+
+    log_queue = queue.Queue(maxsize=int(config["QUEUE_SIZE"]))
+    _queue_handler = DroppingQueueHandler(log_queue)
+    _queue_handler.addFilter(
+        RepeatedErrorFilter(int(config["ERROR_BURST"]), float(config["ERROR_WINDOW"]))
+    )
+
+    engine_logger = logging.getLogger(LOGGER_NAME)
+    engine_logger.setLevel(config["LEVEL"])
+    engine_logger.addHandler(_queue_handler)
+    engine_logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers)
+    _listener.start()
+    # Flush whatever is still queued when the engine exits.
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Stop the writer thread after draining the queue."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+    if _queue_handler and _queue_handler.dropped:
+        print(
+            f"Logging queue was full, dropped {_queue_handler.dropped} records",
+            file=sys.stderr,
+        )
+
+
+def check_context(service_check) -> dict:
+    """Build the logging context for a service check."""
+    result_code = service_check.result.result
+    return {
+        "team_id": service_check.team_id,
+        "team_name": service_check.team_name,
+        "target_id": service_check.target_id,
+        "target_host": service_check.target_host,
+        "service_name": service_check.service_name,
+        "result": result_code.value if result_code else None,
+        "points": service_check.points,
+        "latency": round(service_check.duration, 6),
+    }
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+import asyncio
+
+# Defaults for the ENGINE -> EVENT_LOOP section of EnvVars.yaml.
+# LOOP is "asyncio", "uvloop" or "auto" (uvloop when it is installed).
+DEFAULT_SETTINGS = {
+    "LOOP": "auto",
+}
+
+LOOPS = ("auto", "asyncio", "uvloop")
+
+# The implementation install() settled on, and why, reported once logging is up.
+selected = "asyncio"
+fallback_reason = None
+
+
+def install(name: str = None) -> str:
+    """
+    Set the event loop policy for the loop implementation `name`, before
+    asyncio.run() creates the loop. Falls back to the stock asyncio loop when
+    uvloop is not installed. Returns the implementation in use.
+    """
+    global selected, fallback_reason
+    name = (name or DEFAULT_SETTINGS["LOOP"]).lower()
+    if name not in LOOPS:
+        raise ValueError(f"Unknown event loop {name!r}, expected one of {', '.join(LOOPS)}")
+
+    selected = "asyncio"
+    fallback_reason = None
+    if name == "asyncio":
+        asyncio.set_event_loop_policy(asyncio.DefaultEventLoopPolicy())
+        return selected
+
+    try:
+        import uvloop  # Optional, pip install uvloop
+    except ImportError:
+        if name == "uvloop":
+            fallback_reason = "uvloop is not installed"
+        asyncio.set_event_loop_policy(asyncio.DefaultEventLoopPolicy())
+        return selected
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    selected = "uvloop"
+    return selected
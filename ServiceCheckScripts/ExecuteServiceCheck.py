@@ -1,22 +1,53 @@
-import sys
-from ServiceCheckScripts import CheckIcmp, CheckFTP, CheckSSH, CheckHTTP
+import time
+from ServiceCheckScripts import CheckRegistry
+from ServiceCheckScripts import Tracing
 from .Results import ServiceHealthCheck
+from .EngineLogger import get_logger, check_context
 
+logger = get_logger("execute")
 
-async def arrange_service_check(service_check: ServiceHealthCheck):
+
+async def arrange_service_check(
+    service_check: ServiceHealthCheck, circuit_breakers=None, adaptive_timeouts=None
+):
     service_name = service_check.service_name
+    start = time.perf_counter()
+    if adaptive_timeouts is not None:
+        # Checks use the learned timeout for their target when there is one.
+        adaptive_timeouts.assign(service_check)
+    # Collect spans for this check when the round is traced, a no-op otherwise.
+    Tracing.begin_check(service_check)
+
+    try:
+        # Check modules are imported the first time their service is seen.
+        plugin = CheckRegistry.get_plugin(service_name)
+    except KeyError:
+        logger.error(
+            "No service or Port Inputted? Call Staff.",
+            extra={"service_name": service_name},
+        )
+        service_check.result.error(
+            feedback="Unknown service, call staff",
+            staff_details={"service_name": service_name},
+        )
+        return service_check
 
-    match service_name:
-        case "ICMP":
-            service_check_result = await CheckIcmp.ICMPCheck(service_check).execute()
-        case "FTP":
-            service_check_result = await CheckFTP.FTPCheck(service_check).execute()
-        case "SSH":
-            service_check_result = await CheckSSH.SSHCheck(service_check).execute()
-        case "HTTP":
-            service_check_result = await CheckHTTP.HTTPCheck(service_check).execute()
-        case _:
-            print("ERROR, No service or Port Inputted? Call Staff.")
-            sys.exit(0)
+    try:
+        check = plugin.check_class(service_check)
+        if circuit_breakers is not None:
+            # Persistently failing services may get a cheap probe instead.
+            await circuit_breakers.run(service_check, check.execute)
+        else:
+            await check.execute()
+    except Exception as e:
+        # A broken check costs its own result, not the round.
+        logger.exception("Service check raised", extra=check_context(service_check))
+        service_check.result.error(
+            feedback="Service check failed to run, call staff",
+            staff_details={"service_name": service_name, "raw": repr(e)},
+        )
 
-    return service_check_result
+    end = time.perf_counter()
+    service_check.duration = end - start
+    Tracing.end_check(service_check, start, end)
+    return service_check
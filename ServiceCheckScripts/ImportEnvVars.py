@@ -21,3 +21,9 @@ def load_env_vars():
     env_vars = yaml_to_json(yaml_data)
 
     return env_vars
+
+
+def get_engine_settings(env_vars: dict, section: str) -> dict:
+    """Return a section of the optional ENGINE block, or an empty dict."""
+    engine_settings = env_vars.get("ENGINE") or {}
+    return engine_settings.get(section) or {}
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+import asyncio
+from urllib.parse import urlsplit, parse_qs
+
+from .EngineLogger import get_logger
+
+logger = get_logger("http")
+
+STATUS_TEXT = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Content Too Large",
+    500: "Internal Server Error",
+}
+
+# Largest request head and body accepted, these endpoints take no large requests.
+MAX_HEADER_BYTES = 16384
+MAX_BODY_BYTES = 65536
+
+
+class BadRequest(Exception):
+    """A request that is answered with an error status and the connection closed."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    """A parsed HTTP request."""
+
+    def __init__(self, method: str, target: str, headers: dict, body: bytes):
+        split_target = urlsplit(target)
+        self.method = method
+        self.path = split_target.path
+        self.query = {key: values[-1] for key, values in parse_qs(split_target.query).items()}
+        self.headers = headers
+        self.body = body
+
+
+class Response:
+    """A complete HTTP response."""
+
+    def __init__(self, status: int = 200, body: bytes = b"", content_type: str = "text/plain", headers: dict = None):
+        self.status = status
+        self.body = body
+        self.headers = {"Content-Type": content_type}
+        self.headers.update(headers or {})
+
+
+class LocalHTTPServer:
+    """
+    Minimal asyncio HTTP/1.1 server for the engine's local endpoints.
+
+    Routes map a path to `async def handler(request, writer)`. A handler
+    returns a Response, or writes a long lived response to the writer itself
+    and returns None, which hands it the connection.
+    """
+
+    def __init__(self, host: str, port: int, ssl_context=None, backlog: int = 100):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.backlog = backlog
+        self.routes = {}
+        self._server = None
+
+    def route(self, path: str, handler):
+        """Register a handler for a path."""
+        self.routes[path] = handler
+
+    async def start(self):
+        """Start listening."""
+        self._server = await asyncio.start_server(
+            self._handle,
+            self.host,
+            self.port,
+            ssl=self.ssl_context,
+            backlog=self.backlog,
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(
+            "Serving %s on %s://%s:%d",
+            ", ".join(self.routes),
+            "https" if self.ssl_context else "http",
+            self.host,
+            self.port,
+        )
+
+    async def stop(self):
+        """Stop listening."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except BadRequest as e:
+                    # The rest of the request can't be skipped, so the connection goes too.
+                    response = Response(e.status, f"{e}\n".encode(), headers={"Connection": "close"})
+                    await write_response(writer, response)
+                    break
+                if request is None:
+                    break
+                handler = self.routes.get(request.path)
+                if handler is None:
+                    await write_response(writer, Response(404, b"not found\n"))
+                    continue
+                try:
+                    response = await handler(request, writer)
+                except Exception as e:
+                    logger.error("Handler for %s failed: %s", request.path, e)
+                    response = Response(500, b"internal error\n")
+                if response is None:
+                    # The handler streamed its own response and owns the connection.
+                    break
+                await write_response(writer, response)
+                if request.headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        if len(head) > MAX_HEADER_BYTES:
+            return None
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            return None
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise BadRequest(400, "malformed Content-Length") from None
+        if length < 0:
+            raise BadRequest(400, "malformed Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise BadRequest(413, f"request body is larger than {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method, target, headers, body)
+
+
+async def write_response(writer: asyncio.StreamWriter, response: Response):
+    """Write a complete response."""
+    head = [f"HTTP/1.1 {response.status} {STATUS_TEXT.get(response.status, 'OK')}"]
+    headers = dict(response.headers)
+    headers["Content-Length"] = str(len(response.body))
+    head.extend(f"{name}: {value}" for name, value in headers.items())
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.body)
+    await writer.drain()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+import asyncio
+import bisect
+import time
+
+from .LocalHTTPServer import LocalHTTPServer, Response
+from .EngineLogger import get_logger
+
+logger = get_logger("metrics")
+
+# Defaults for the ENGINE -> METRICS section of EnvVars.yaml.
+DEFAULT_SETTINGS = {
+    "ENABLED": False,
+    "HOST": "127.0.0.1",
+    "PORT": 9109,
+    "LOOP_LAG_INTERVAL": 0.5,
+}
+
+# Upper bounds in seconds, from a fast local connect to a stuck transfer.
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+ROUND_BUCKETS = (1.0, 2.5, 5.0, 10.0, 15.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """One labelled histogram series. observe() is a bisect and two adds."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # One extra slot for observations above the last bound (+Inf).
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Counter:
+    """One labelled counter series."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Gauge:
+    """One labelled gauge series."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Family:
+    """A metric name with one series per distinct label values."""
+
+    def __init__(self, kind: str, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = None):
+        self.kind = kind
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series = {}
+
+    def labels(self, *values):
+        """Get the series for these label values, creating it on first use."""
+        series = self.series.get(values)
+        if series is None:
+            if self.kind == "histogram":
+                series = Histogram(self.buckets)
+            elif self.kind == "counter":
+                series = Counter()
+            else:
+                series = Gauge()
+            self.series[values] = series
+        return series
+
+    def render(self, lines: list):
+        lines.append(f"# HELP {self.name} {self.help_text}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for values, series in self.series.items():
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{_label_text(self.labelnames, values)} {series.value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                le = _label_text(self.labelnames, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _label_text(self.labelnames, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {series.count}")
+            labels = _label_text(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {series.sum}")
+            lines.append(f"{self.name}_count{labels} {series.count}")
+
+
+_families = []
+_lag_task = None
+
+
+def _family(kind: str, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = None) -> Family:
+    family = Family(kind, name, help_text, labelnames, buckets)
+    _families.append(family)
+    return family
+
+
+CHECK_PHASE_SECONDS = _family(
+    "histogram",
+    "scoring_check_phase_seconds",
+    "Time spent in each phase of a service check.",
+    ("service", "phase"),
+    LATENCY_BUCKETS,
+)
+CHECK_DURATION_SECONDS = _family(
+    "histogram",
+    "scoring_check_duration_seconds",
+    "Total service check duration.",
+    ("service", "result"),
+    LATENCY_BUCKETS,
+)
+CHECKS_TOTAL = _family(
+    "counter",
+    "scoring_checks_total",
+    "Service checks completed.",
+    ("service", "result"),
+)
+ROUND_PHASE_SECONDS = _family(
+    "histogram",
+    "scoring_round_phase_seconds",
+    "Time spent in per-round phases such as persisting results.",
+    ("phase",),
+    LATENCY_BUCKETS,
+)
+ROUND_DURATION_SECONDS = _family(
+    "histogram",
+    "scoring_round_duration_seconds",
+    "Time from a round starting to its results being persisted.",
+    (),
+    ROUND_BUCKETS,
+)
+ROUNDS_TOTAL = _family("counter", "scoring_rounds_total", "Rounds completed.")
+LAST_ROUND = _family("gauge", "scoring_last_round", "Number of the last completed round.")
+RESULT_BYTES = _family(
+    "gauge",
+    "scoring_result_bytes",
+    "Bytes of feedback and details held by the last round's results.",
+)
+LOOP_LAG_SECONDS = _family(
+    "histogram",
+    "scoring_event_loop_lag_seconds",
+    "How late the event loop woke a sleeping sampler.",
+    (),
+    LATENCY_BUCKETS,
+)
+LOOP_LAG_MAX_SECONDS = _family(
+    "gauge",
+    "scoring_event_loop_lag_max_seconds",
+    "Worst event loop lag seen since the last round finished.",
+)
+SLOW_CALLBACKS_TOTAL = _family(
+    "counter",
+    "scoring_slow_callbacks_total",
+    "Event loop callbacks slower than the slow callback duration, by check type.",
+    ("service",),
+)
+
+
+class phase:
+    """
+    Times a phase of a service check:
+
+        with phase(service_check, "connect"):
+            ...
+
+    Repeated phases (one transfer per file) add up. The totals are observed
+    into the histograms once the check finishes, see observe_check(). When
+    the round is traced each phase is also kept as a span.
+    """
+
+    __slots__ = ("service_check", "name", "start")
+
+    def __init__(self, service_check, name: str):
+        self.service_check = service_check
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        add_phase(self.service_check, self.name, time.perf_counter() - self.start, self.start)
+        return False
+
+
+class timed_calls:
+    """
+    Wraps a function called from inside another phase, such as hashing each
+    chunk of a transfer, and adds up the time spent in it:
+
+        update = timed_calls(file_hash.update)
+        with phase(service_check, "transfer"):
+            ftp.retrbinary(command, update)
+        update.split(service_check, "hash", "transfer")
+
+    Only the total is recorded, a span per chunk would swamp the trace.
+    """
+
+    __slots__ = ("function", "elapsed")
+
+    def __init__(self, function):
+        self.function = function
+        self.elapsed = 0.0
+
+    def __call__(self, *args):
+        start = time.perf_counter()
+        try:
+            return self.function(*args)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+    def split(self, service_check, name: str, out_of: str):
+        """Move the time spent in the calls out of the enclosing phase into its own."""
+        if self.elapsed:
+            add_phase(service_check, name, self.elapsed)
+            add_phase(service_check, out_of, -self.elapsed)
+            self.elapsed = 0.0
+
+
+def add_phase(service_check, name: str, elapsed: float, start: float = None):
+    """Add time measured elsewhere to a phase of a service check."""
+    phases = service_check.phases
+    phases[name] = phases.get(name, 0.0) + elapsed
+    if service_check.spans is not None and start is not None:
+        service_check.spans.append((name, start, elapsed))
+
+
+def observe_check(service_check):
+    """Record a finished check's phases, duration and result."""
+    service = service_check.service_name
+    result_code = service_check.result.result
+    result = result_code.value if result_code else "NONE"
+    for name, elapsed in service_check.phases.items():
+        CHECK_PHASE_SECONDS.labels(service, name).observe(elapsed)
+    CHECK_DURATION_SECONDS.labels(service, result).observe(service_check.duration)
+    CHECKS_TOTAL.labels(service, result).inc()
+
+
+def observe_round_phase(name: str, elapsed: float):
+    """Record a per-round phase such as persisting results."""
+    ROUND_PHASE_SECONDS.labels(name).observe(elapsed)
+
+
+class round_phase:
+    """Times a per-round phase, `with round_phase("prepare"): ...`."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe_round_phase(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def observe_round(round_number: int, elapsed: float, result_bytes: int):
+    """Record a finished round, and start a new window for the lag maximum."""
+    ROUND_DURATION_SECONDS.labels().observe(elapsed)
+    ROUNDS_TOTAL.labels().inc()
+    LAST_ROUND.labels().set(round_number)
+    RESULT_BYTES.labels().set(result_bytes)
+    LOOP_LAG_MAX_SECONDS.labels().set(0.0)
+
+
+def render() -> bytes:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for family in _families:
+        family.render(lines)
+    return ("\n".join(lines) + "\n").encode()
+
+
+async def monitor_loop_lag(interval: float):
+    """Sleep `interval` at a time and record how late each wakeup was."""
+    lag_histogram = LOOP_LAG_SECONDS.labels()
+    lag_max = LOOP_LAG_MAX_SECONDS.labels()
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - start - interval)
+        lag_histogram.observe(lag)
+        if lag > lag_max.value:
+            lag_max.set(lag)
+
+
+async def _serve_metrics(request, writer):
+    return Response(200, render(), CONTENT_TYPE)
+
+
+async def start(settings: dict = None):
+    """
+    Start the /metrics endpoint and the event loop lag sampler.
+    Returns the server, or None when metrics are disabled.
+    """
+    global _lag_task
+    config = dict(DEFAULT_SETTINGS)
+    config.update(settings or {})
+    if not config["ENABLED"]:
+        return None
+    server = LocalHTTPServer(config["HOST"], int(config["PORT"]))
+    server.route("/metrics", _serve_metrics)
+    await server.start()
+    _lag_task = asyncio.get_running_loop().create_task(
+        monitor_loop_lag(float(config["LOOP_LAG_INTERVAL"])), name="metrics:loop-lag"
+    )
+    return server
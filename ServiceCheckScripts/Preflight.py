@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+import asyncio
+import collections
+import itertools
+import socket
+import time
+
+from ServiceCheckScripts import CheckRegistry
+from .Results import ServiceHealthCheck, ResultCode
+from .Scheduler import TokenBucket, percentile
+from .Scheduler import DEFAULT_SETTINGS as SCHEDULER_DEFAULTS
+from .EngineLogger import get_logger, check_context
+
+logger = get_logger("preflight")
+
+# Defaults for the ENGINE -> PREFLIGHT section of EnvVars.yaml.
+DEFAULT_SETTINGS = {
+    "ENABLED": False,
+    # Lookups and warm-up checks started per second, and at most at once.
+    "RATE": 20,
+    "MAX_IN_FLIGHT": 32,
+    # Seconds after which scoring starts whether or not warm-up has finished.
+    "DEADLINE": 120,
+    "RESOLVE_TIMEOUT": 5,
+    # Seconds a round should finish in, the estimate is compared against it.
+    "ROUND_BUDGET": 20,
+}
+
+# Phases spent setting up a connection rather than using it.
+HANDSHAKE_PHASES = ("connect", "handshake", "auth")
+
+
+def hosts_of(service_check: ServiceHealthCheck) -> set:
+    """Every host name a check connects to."""
+    hosts = {service_check.target_host}
+    for info in (service_check.http_info, service_check.https_info):
+        if info and info.url:
+            # URL is a host, optionally followed by a port and path.
+            hosts.add(info.url.split("://")[-1].split("/")[0].rsplit(":", 1)[0])
+    hosts.discard("")
+    return hosts
+
+
+def by_target(service_checks: list) -> list:
+    """The checks with their targets interleaved, so no target gets a burst."""
+    targets = collections.defaultdict(list)
+    for service_check in service_checks:
+        targets[service_check.target_host].append(service_check)
+    return [
+        service_check
+        for group in itertools.zip_longest(*targets.values())
+        for service_check in group
+        if service_check is not None
+    ]
+
+
+class Preflight:
+    """
+    Resolves every host and runs every check of the plan once, unscored, at
+    RATE starts per second, so the first round finds warm TLS session and key
+    caches and learned timeouts instead of opening everything at once. The
+    measured check costs give the shortest round period the SCHEDULER limits
+    allow.
+    """
+
+    def __init__(self, settings: dict = None, scheduler_settings: dict = None):
+        config = dict(DEFAULT_SETTINGS)
+        config.update(settings or {})
+        self.rate = float(config["RATE"])
+        self.max_in_flight = int(config["MAX_IN_FLIGHT"])
+        self.deadline = float(config["DEADLINE"])
+        self.resolve_timeout = float(config["RESOLVE_TIMEOUT"])
+        self.round_budget = float(config["ROUND_BUDGET"])
+        self.limits = dict(SCHEDULER_DEFAULTS)
+        self.limits.update(scheduler_settings or {})
+        self.hosts = 0
+        self.resolved = 0
+        self.unresolved = {}
+        self.resolve_seconds = 0.0
+        self.service_checks = []
+        self.measured = []
+        self.warm_up_seconds = 0.0
+        self.deadline_passed = False
+
+    async def _paced(self, items: list, coroutine):
+        """Run coroutine(item) for every item, within RATE and MAX_IN_FLIGHT."""
+        bucket = TokenBucket(self.rate)
+        slots = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+
+        def finished(task):
+            tasks.discard(task)
+            slots.release()
+
+        try:
+            for item in items:
+                await slots.acquire()
+                wait = bucket.wait_time(time.monotonic())
+                while wait:
+                    await asyncio.sleep(wait)
+                    wait = bucket.wait_time(time.monotonic())
+                bucket.take()
+                task = asyncio.ensure_future(coroutine(item))
+                tasks.add(task)
+                task.add_done_callback(finished)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            # The deadline passed, checks still in the executor finish on their own.
+            for task in list(tasks):
+                task.cancel()
+
+    async def _resolve(self, host: str):
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(
+                loop.getaddrinfo(host, None, type=socket.SOCK_STREAM),
+                self.resolve_timeout,
+            )
+        except asyncio.TimeoutError:
+            self.unresolved[host] = f"no answer in {self.resolve_timeout:g} seconds"
+        except OSError as e:
+            self.unresolved[host] = str(e)
+        else:
+            self.resolved += 1
+
+    async def _warm(self, service_check: ServiceHealthCheck, run, observe):
+        try:
+            await run(service_check)
+        except Exception as e:
+            logger.warning(
+                "Warm-up check raised: %s", e, extra=check_context(service_check)
+            )
+            return
+        self.measured.append(service_check)
+        if observe:
+            observe(service_check)
+
+    async def _run(self, service_checks: list, run, observe, resolve_hosts: bool):
+        if resolve_hosts:
+            hosts = set()
+            for service_check in service_checks:
+                hosts.update(hosts_of(service_check))
+            self.hosts = len(hosts)
+            start = time.perf_counter()
+            await self._paced(sorted(hosts), self._resolve)
+            self.resolve_seconds = time.perf_counter() - start
+            for host, error in sorted(self.unresolved.items()):
+                logger.warning("Could not resolve %s: %s", host, error)
+
+        start = time.perf_counter()
+        try:
+            await self._paced(
+                by_target(service_checks),
+                lambda service_check: self._warm(service_check, run, observe),
+            )
+        finally:
+            self.warm_up_seconds = time.perf_counter() - start
+
+    async def run(self, service_checks: list, run, observe=None, resolve_hosts: bool = True):
+        """
+        Warm up with `run(service_check)`, stopping at the DEADLINE. Each
+        finished check is passed to `observe`.
+        """
+        self.service_checks = service_checks
+        plugins = CheckRegistry.load_plan(service_checks)
+        await CheckRegistry.setup_round(plugins)
+        try:
+            await asyncio.wait_for(
+                self._run(service_checks, run, observe, resolve_hosts), self.deadline
+            )
+        except asyncio.TimeoutError:
+            self.deadline_passed = True
+            logger.warning(
+                "Preflight deadline of %g seconds passed, %d of %d checks warmed up",
+                self.deadline,
+                len(self.measured),
+                len(service_checks),
+            )
+        finally:
+            await CheckRegistry.teardown_round(plugins)
+
+    def estimate(self) -> tuple:
+        """
+        (seconds, what bounds it) for the shortest round the SCHEDULER limits
+        allow with the measured check costs. Checks that were not measured
+        cost their service's median. It assumes perfect packing, so it is a
+        lower bound.
+        """
+        durations = collections.defaultdict(list)
+        for service_check in self.measured:
+            durations[service_check.service_name].append(service_check.duration)
+        medians = {
+            service: percentile(sorted(values), 0.5)
+            for service, values in durations.items()
+        }
+        measured = {id(service_check) for service_check in self.measured}
+
+        total = 0.0
+        longest = 0.0
+        teams = collections.defaultdict(lambda: [0.0, 0])
+        targets = collections.defaultdict(lambda: [0.0, 0])
+        for service_check in self.service_checks:
+            if id(service_check) in measured:
+                cost = service_check.duration
+            else:
+                cost = medians.get(service_check.service_name, 0.0)
+            total += cost
+            longest = max(longest, cost)
+            for load in (teams[service_check.team_id], targets[service_check.target_host]):
+                load[0] += cost
+                load[1] += 1
+
+        bounds = [
+            (longest, "the slowest check"),
+            (total / int(self.limits["MAX_IN_FLIGHT"]), "MAX_IN_FLIGHT"),
+        ]
+        for loads, name, kind in ((teams, "team", "TEAM"), (targets, "target", "TARGET")):
+            concurrency = int(self.limits[f"{kind}_MAX_IN_FLIGHT"])
+            rate = float(self.limits[f"{kind}_CONNECTS_PER_SECOND"])
+            for key, (seconds, count) in loads.items():
+                bounds.append((seconds / concurrency, f"{kind}_MAX_IN_FLIGHT for {name} {key}"))
+                if rate:
+                    bounds.append((count / rate, f"{kind}_CONNECTS_PER_SECOND for {name} {key}"))
+        return max(bounds, key=lambda bound: bound[0])
+
+    def report(self) -> str:
+        lines = [
+            f"Resolved {self.resolved} of {self.hosts} hosts in {self.resolve_seconds:.2f} s"
+            if self.hosts
+            else "Host lookups skipped",
+            f"Warmed up {len(self.measured)} of {len(self.service_checks)} checks "
+            f"in {self.warm_up_seconds:.2f} s"
+            + (", the deadline passed" if self.deadline_passed else ""),
+            f"{'Service':<8} {'checks':>7} {'passed':>7} {'handshake p50':>14} "
+            f"{'check p50':>10} {'check p95':>10}",
+        ]
+        services = collections.defaultdict(list)
+        for service_check in self.measured:
+            services[service_check.service_name].append(service_check)
+        for service, checks in sorted(services.items()):
+            passed = sum(
+                1
+                for service_check in checks
+                if service_check.result.result in (ResultCode.PASS, ResultCode.WARN)
+            )
+            durations = sorted(service_check.duration for service_check in checks)
+            handshakes = sorted(
+                sum(service_check.phases.get(name, 0.0) for name in HANDSHAKE_PHASES)
+                for service_check in checks
+                if any(name in service_check.phases for name in HANDSHAKE_PHASES)
+            )
+            handshake = (
+                f"{percentile(handshakes, 0.5) * 1000:>11.1f} ms" if handshakes else f"{'-':>14}"
+            )
+            lines.append(
+                f"{service:<8} {len(checks):>7} {passed:>7} {handshake} "
+                f"{percentile(durations, 0.5) * 1000:>7.1f} ms {percentile(durations, 0.95) * 1000:>7.1f} ms"
+            )
+        seconds, bound = self.estimate()
+        lines.append(
+            f"Shortest sustainable round: {seconds:.2f} s, bound by {bound} "
+            f"(budget {self.round_budget:g} s)"
+        )
+        if seconds > self.round_budget:
+            lines.append(
+                "Rounds will overrun the budget, raise the SCHEDULER limits or check fewer services"
+            )
+        return "\n".join(lines)
+
+
+async def warm_up(
+    service_checks: list,
+    run,
+    settings: dict = None,
+    scheduler_settings: dict = None,
+    observe=None,
+    resolve_hosts: bool = True,
+) -> Preflight:
+    """Run the preflight over a prepared plan, see Preflight."""
+    preflight = Preflight(settings, scheduler_settings)
+    logger.info(
+        "Preflight: warming up %d checks at %g per second", len(service_checks), preflight.rate
+    )
+    await preflight.run(service_checks, run, observe, resolve_hosts)
+    return preflight
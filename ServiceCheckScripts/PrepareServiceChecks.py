@@ -1,6 +1,14 @@
 from ServiceCheckScripts import Results
 
 
+def _read_content_checks(web_info, action: dict):
+    # Optional page content checks shared by HTTP and HTTPS actions.
+    web_info.md5_sum = action.get("MD5_SUM")
+    web_info.contains = action.get("CONTAINS")
+    web_info.regex = action.get("REGEX")
+    web_info.max_bytes = action.get("MAX_BYTES")
+
+
 def prepare_service_check(loaded_env_dict: dict) -> list:
     prepared_service_checks = []
 
@@ -15,6 +23,8 @@ def prepare_service_check(loaded_env_dict: dict) -> list:
                 new_http_info = None
                 new_ftp_info = None
                 new_sql_info = None
+                new_tcp_info = None
+                new_https_info = None
                 service_name = action["SERVICE_NAME"]
 
                 match service_name:
@@ -22,17 +32,39 @@ def prepare_service_check(loaded_env_dict: dict) -> list:
                         new_ssh_info = Results.SSHInfo()
                         new_ssh_info.ssh_username = action["SSH_USERNAME"]
                         new_ssh_info.ssh_priv_key = action["SSH_PRIV_KEY"]
-                        new_ssh_info.md5sum = action["MD5_SUM"]
-                        new_ssh_info.ssh_script = action["SSH_SCRIPT"]
+                        new_ssh_info.files = action.get("FILES")
+                        if new_ssh_info.files:
+                            # SFTP mode, a list of sums like FTP GET.
+                            new_ssh_info.md5_sums = action.get("MD5_SUM", [])
+                            new_ssh_info.max_bytes = action.get("MAX_BYTES")
+                            new_ssh_info.md5sum = None
+                            new_ssh_info.ssh_script = None
+                        else:
+                            new_ssh_info.md5sum = action["MD5_SUM"]
+                            new_ssh_info.ssh_script = action["SSH_SCRIPT"]
                     case "HTTP":
                         new_http_info = Results.HTTPInfo()
                         new_http_info.url = action["URL"]
                         new_http_info.path = action["PATH"]
+                        _read_content_checks(new_http_info, action)
+                    case "HTTPS":
+                        new_https_info = Results.HTTPSInfo()
+                        new_https_info.url = action["URL"]
+                        new_https_info.path = action["PATH"]
+                        _read_content_checks(new_https_info, action)
+                        new_https_info.ca_file = action.get("CA_FILE")
+                        new_https_info.cert_warn_days = int(
+                            action.get("CERT_WARN_DAYS", 14)
+                        )
+                        new_https_info.cert_fail_on_invalid = bool(
+                            action.get("CERT_FAIL_ON_INVALID", False)
+                        )
                     case "FTP":
                         new_ftp_info = Results.FTPInfo()
                         new_ftp_info.ftp_username = action["FTP_USERNAME"]
                         new_ftp_info.ftp_password = action["FTP_PASSWORD"]
                         new_ftp_info.files = action["FILES"]
+                        new_ftp_info.md5_sums = action.get("MD5_SUM", [])
                         new_ftp_info.directory = action["DIRECTORY"]
                         new_ftp_info.ftp_action = action["FTP_ACTION"]
                     case "SQL":
@@ -42,6 +74,11 @@ def prepare_service_check(loaded_env_dict: dict) -> list:
                         new_sql_info.db_name = action["DB_NAME"]
                         new_sql_info.table_name = action["TABLE_NAME"]
                         new_sql_info.test_data = action["TEST_DATA"]
+                    case "TCP":
+                        new_tcp_info = Results.TCPInfo()
+                        new_tcp_info.banner_regex = action.get("BANNER_REGEX")
+                        new_tcp_info.connect_timeout = action.get("CONNECT_TIMEOUT")
+                        new_tcp_info.banner_timeout = action.get("BANNER_TIMEOUT")
 
                     case _:
                         None
@@ -57,6 +94,8 @@ def prepare_service_check(loaded_env_dict: dict) -> list:
                     http_info=new_http_info,
                     ftp_info=new_ftp_info,
                     sql_info=new_sql_info,
+                    tcp_info=new_tcp_info,
+                    https_info=new_https_info,
                 )
                 prepared_service_checks.append(new_service_health_check)
 
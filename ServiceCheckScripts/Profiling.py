@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+import cProfile
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+
+from .EngineLogger import get_logger
+from .Metrics import SLOW_CALLBACKS_TOTAL
+
+logger = get_logger("profiling")
+
+# Defaults for the ENGINE -> PROFILING section of EnvVars.yaml, the command
+# line flags of StatusCheckEngine.py override them.
+# A threshold or duration of 0 turns that feature off.
+DEFAULT_SETTINGS = {
+    "ROUNDS": [],
+    "EVERY_ROUNDS": 0,
+    "DIRECTORY": "profiles",
+    "WATCHDOG_THRESHOLD": 0,
+    "SLOW_CALLBACK_DURATION": 0,
+}
+
+# Scheduler task names are check:SERVICE:TEAM:TARGET, asyncio includes the
+# task repr (and so its name) in slow callback warnings.
+TASK_NAME = re.compile(r"name='check:([^:']*):([^:']*):([^']*)'")
+
+
+class RoundProfiler:
+    """
+    Runs cProfile over selected rounds and dumps a stats file per round.
+
+    Only the event loop thread is profiled, which is where a blocking call
+    hurts; time spent in executor threads does not show up.
+    """
+
+    def __init__(self, rounds, every_rounds: int, directory: str):
+        self.rounds = set(rounds or ())
+        self.every_rounds = int(every_rounds or 0)
+        self.directory = directory
+        self.round_number = 0
+        self._profile = None
+
+    def _selected(self, round_number: int) -> bool:
+        if round_number in self.rounds:
+            return True
+        return bool(self.every_rounds) and round_number % self.every_rounds == 0
+
+    def start_round(self, round_number: int):
+        """Start profiling if this round is selected."""
+        self.round_number = round_number
+        if not self._selected(round_number):
+            return
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def end_round(self):
+        """Stop profiling and write profiles/round-NNNNNN.prof."""
+        if self._profile is None:
+            return None
+        self._profile.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"round-{self.round_number:06d}.prof")
+        self._profile.dump_stats(path)
+        self._profile = None
+        logger.info(
+            "Round %d profile written to %s, view it with: python -m pstats %s",
+            self.round_number,
+            path,
+            path,
+        )
+        return path
+
+
+class LoopWatchdog:
+    """
+    Thread that logs the event loop thread's stack when the loop stops
+    running callbacks for longer than `threshold` seconds.
+
+    The loop bumps a heartbeat every threshold / 4 seconds. When the
+    heartbeat is late, whatever the loop thread is executing right now is
+    the blocking call, so its stack is captured while it is still stuck.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.interval = threshold / 4
+        self._loop = None
+        self._loop_thread_id = None
+        self._last_beat = time.monotonic()
+        self._reported_beat = None
+        self._beat_handle = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, loop):
+        """Start watching. Call from the event loop thread."""
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._beat()
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._beat_handle is not None:
+            self._beat_handle.cancel()
+
+    def _beat(self):
+        self._last_beat = time.monotonic()
+        self._beat_handle = self._loop.call_later(self.interval, self._beat)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            last_beat = self._last_beat
+            blocked = time.monotonic() - last_beat - self.interval
+            # Report each stall once, while it is happening.
+            if blocked < self.threshold or last_beat == self._reported_beat:
+                continue
+            self._reported_beat = last_beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "unavailable"
+            logger.warning(
+                "Event loop blocked for %.3fs so far, loop thread stack:\n%s",
+                blocked,
+                stack,
+            )
+
+
+class SlowCallbackFilter(logging.Filter):
+    """
+    Turns asyncio debug mode's "Executing ... took N seconds" warnings into
+    engine log records attributed to the check that was running.
+    """
+
+    def filter(self, record):
+        if not str(record.msg).startswith("Executing") or len(record.args) != 2:
+            return True
+        handle, seconds = record.args
+        match = TASK_NAME.search(str(handle))
+        if match:
+            service_name, team_id, target_host = match.groups()
+            context = {
+                "service_name": service_name,
+                "team_id": team_id,
+                "target_host": target_host,
+            }
+        else:
+            service_name = "none"
+            context = {}
+        SLOW_CALLBACKS_TOTAL.labels(service_name).inc()
+        logger.warning(
+            "Slow callback took %.3fs in %s: %s",
+            seconds,
+            f"{service_name} check" if match else "the engine",
+            handle,
+            extra=context,
+        )
+        # The engine record replaces the plain asyncio one.
+        return False
+
+
+def start(loop, settings: dict = None) -> RoundProfiler:
+    """
+    Start the watchdog and slow callback reporting as configured, and return
+    the round profiler.
+    """
+    config = dict(DEFAULT_SETTINGS)
+    config.update(settings or {})
+
+    watchdog_threshold = float(config["WATCHDOG_THRESHOLD"] or 0)
+    if watchdog_threshold:
+        LoopWatchdog(watchdog_threshold).start(loop)
+
+    slow_callback_duration = float(config["SLOW_CALLBACK_DURATION"] or 0)
+    if slow_callback_duration:
+        # Debug mode adds overhead to every callback, keep it for investigations.
+        loop.set_debug(True)
+        loop.slow_callback_duration = slow_callback_duration
+        logging.getLogger("asyncio").addFilter(SlowCallbackFilter())
+        logger.info(
+            "asyncio debug mode on, reporting callbacks slower than %.3fs",
+            slow_callback_duration,
+        )
+
+    return RoundProfiler(config["ROUNDS"], config["EVERY_ROUNDS"], config["DIRECTORY"])
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+import asyncio
+import hmac
+import json
+
+from ServiceCheckScripts import PrepareServiceChecks
+from .LocalHTTPServer import LocalHTTPServer, Response
+from .Results import ResultJSONEncoder
+from .EngineLogger import get_logger
+
+logger = get_logger("recheck")
+
+# Defaults for the ENGINE -> RECHECK section of EnvVars.yaml.
+DEFAULT_SETTINGS = {
+    "ENABLED": False,
+    "HOST": "127.0.0.1",
+    "PORT": 9111,
+    # When set, requests must send "Authorization: Bearer <TOKEN>".
+    "TOKEN": "",
+}
+
+
+def select_actions(loaded_vars: dict, team_id: str, target_id=None, service_name=None) -> dict:
+    """The part of a config that a recheck covers, shaped like the config itself."""
+    teams = []
+    for team in loaded_vars["TEAMS"]:
+        if str(team["TEAM_ID"]) != team_id:
+            continue
+        targets = []
+        for target in team["TARGETS"]:
+            if target_id is not None and str(target["ID"]) != target_id:
+                continue
+            actions = [
+                action
+                for action in target["ACTIONS"]
+                if service_name is None or action["SERVICE_NAME"] == service_name
+            ]
+            if actions:
+                targets.append(dict(target, ACTIONS=actions))
+        if targets:
+            teams.append(dict(team, TARGETS=targets))
+    return {"TEAMS": teams}
+
+
+def describe(service_check) -> dict:
+    """A recheck's outcome, with the result, feedback and details, staff ones included."""
+    return {
+        "team_id": service_check.team_id,
+        "target_id": service_check.target_id,
+        "target_host": service_check.target_host,
+        "service_name": service_check.service_name,
+        "duration": service_check.duration,
+        "queue_wait": service_check.queue_wait,
+        "result": {
+            "result": service_check.result.result,
+            "feedback": service_check.result.feedback,
+            "details": service_check.result.details,
+            "staff_feedback": service_check.result.staff_feedback,
+            "staff_details": service_check.result.staff_details,
+        },
+    }
+
+
+class RecheckQueue:
+    """
+    Runs staff requested rechecks through the scheduler's priority lane.
+
+    A request for a service that is already being rechecked waits on that
+    check instead of starting another. Rechecks aren't scored, the next
+    round scores the service as usual.
+    """
+
+    def __init__(self, scheduler, run, token: str = ""):
+        self.scheduler = scheduler
+        self.run = run
+        self.token = token
+        self.loaded_vars = {"TEAMS": []}
+        # (team_id, target_id, service_name) -> future of the running recheck.
+        self._in_flight = {}
+        self.server = None
+
+    def set_config(self, loaded_vars: dict):
+        """Use this config to find the actions to recheck, called every round."""
+        self.loaded_vars = loaded_vars
+
+    def recheck(self, team_id: str, target_id=None, service_name=None) -> list:
+        """Queue rechecks of the matching actions and return a future for each."""
+        futures = []
+        service_checks = PrepareServiceChecks.prepare_service_check(
+            select_actions(self.loaded_vars, team_id, target_id, service_name)
+        )
+        for service_check in service_checks:
+            key = (
+                service_check.team_id,
+                service_check.target_id,
+                service_check.service_name,
+            )
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self.scheduler.submit(service_check, self.run, priority=True)
+                self._in_flight[key] = future
+                future.add_done_callback(lambda _, key=key: self._in_flight.pop(key, None))
+                logger.info(
+                    "Recheck queued for target %s",
+                    service_check.target_host,
+                    extra={
+                        "team_id": service_check.team_id,
+                        "service_name": service_check.service_name,
+                    },
+                )
+            futures.append(future)
+        return futures
+
+    def _authorized(self, request) -> bool:
+        if not self.token:
+            return True
+        return hmac.compare_digest(
+            request.headers.get("authorization", ""), f"Bearer {self.token}"
+        )
+
+    async def serve_recheck(self, request, writer):
+        """POST /recheck?team=N[&target=N][&service=NAME], answers once the checks finish."""
+        if request.method != "POST":
+            return Response(405, b"use POST\n")
+        if not self._authorized(request):
+            return Response(403, b"forbidden\n")
+        team_id = request.query.get("team")
+        if not team_id:
+            return Response(400, b"team is required\n")
+        futures = self.recheck(
+            team_id, request.query.get("target"), request.query.get("service")
+        )
+        if not futures:
+            return Response(404, b"no matching checks\n")
+        # shield() so a caller hanging up doesn't cancel a check others share.
+        service_checks = await asyncio.gather(
+            *(asyncio.shield(future) for future in futures)
+        )
+        body = json.dumps(
+            [describe(service_check) for service_check in service_checks],
+            cls=ResultJSONEncoder,
+        )
+        return Response(200, body.encode(), "application/json")
+
+
+async def start(scheduler, run, settings: dict = None):
+    """
+    Start serving /recheck. Returns the RecheckQueue, or None when it is disabled.
+    """
+    config = dict(DEFAULT_SETTINGS)
+    config.update(settings or {})
+    if not config["ENABLED"]:
+        return None
+    queue = RecheckQueue(scheduler, run, str(config["TOKEN"] or ""))
+    server = LocalHTTPServer(config["HOST"], int(config["PORT"]))
+    server.route("/recheck", queue.serve_recheck)
+    await server.start()
+    queue.server = server
+    return queue
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+import asyncio
+import concurrent.futures
+import gzip
+import json
+import os
+import time
+
+from .Results import ServiceHealthCheck
+from .EngineLogger import get_logger
+
+# pyarrow is optional, without it only the JSONL export is written.
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+logger = get_logger("export")
+
+# Defaults for the ENGINE -> EXPORT section of EnvVars.yaml.
+DEFAULT_SETTINGS = {
+    "ENABLED": False,
+    "DIRECTORY": "exports",
+    "ROTATE_ROUNDS": 180,
+    "MAX_BYTES": 256 * 1024 * 1024,
+    "KEEP_FILES": 0,
+    "COMPRESS_LEVEL": 5,
+    "COLUMNAR": True,
+    "BATCH_ROWS": 1024,
+}
+
+# Exported columns and their Parquet types, in order.
+# Every value is a str, int, float or None.
+RECORD_COLUMNS = (
+    ("round", "int64"),
+    ("timestamp", "float64"),
+    ("team_id", "string"),
+    ("team_name", "string"),
+    ("target_id", "int64"),
+    ("target_host", "string"),
+    ("target_port", "string"),
+    ("service_name", "string"),
+    ("result", "string"),
+    ("points", "int64"),
+    ("duration", "float64"),
+    ("feedback", "string"),
+    ("staff_feedback", "string"),
+)
+RECORD_FIELDS = tuple(field for field, _ in RECORD_COLUMNS)
+
+# Built once: records only hold plain values so no default hook is needed,
+# and the C encoder handles the whole record in one call.
+encode_record = json.JSONEncoder(
+    separators=(",", ":"), ensure_ascii=False, check_circular=False
+).encode
+
+
+def build_record(service_check: ServiceHealthCheck, round_number: int, timestamp: float):
+    """Flatten a scored service check into a dict of plain values."""
+    result_code = service_check.result.result
+    return {
+        "round": round_number,
+        "timestamp": timestamp,
+        "team_id": service_check.team_id,
+        "team_name": service_check.team_name,
+        "target_id": service_check.target_id,
+        "target_host": service_check.target_host,
+        "target_port": service_check.target_port,
+        "service_name": service_check.service_name,
+        "result": result_code.value if result_code else None,
+        "points": service_check.points,
+        "duration": service_check.duration,
+        "feedback": service_check.result.feedback,
+        "staff_feedback": service_check.result.staff_feedback,
+    }
+
+
+class ColumnarWriter:
+    """
+    Appends records to a Parquet file, one row group every BATCH_ROWS records,
+    so at most one batch of column values is held in memory.
+    """
+
+    def __init__(self, path: str, batch_rows: int):
+        self.path = path
+        self.batch_rows = batch_rows
+        self._columns = {field: [] for field in RECORD_FIELDS}
+        self._pending = 0
+        self._writer = None
+        # Fixed schema, so a batch of all-None values can't change a column type.
+        self._schema = pyarrow.schema(
+            [(field, getattr(pyarrow, type_name)()) for field, type_name in RECORD_COLUMNS]
+        )
+
+    def write(self, record: dict):
+        for field in RECORD_FIELDS:
+            self._columns[field].append(record[field])
+        self._pending += 1
+        if self._pending >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        table = pyarrow.table(self._columns, schema=self._schema)
+        if self._writer is None:
+            self._writer = pyarrow.parquet.ParquetWriter(self.path, self._schema)
+        self._writer.write_table(table)
+        for values in self._columns.values():
+            values.clear()
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+
+
+class RoundExporter:
+    """
+    Streams scored service checks to rotating gzip JSONL files, and to
+    Parquet files when pyarrow is installed.
+
+    Records are handed to a single writer thread every BATCH_ROWS records,
+    so compression and Parquet encoding stay off the event loop and at most
+    one batch is kept in memory. The files are only touched by that thread.
+    """
+
+    def __init__(self, settings: dict = None):
+        self.config = dict(DEFAULT_SETTINGS)
+        self.config.update(settings or {})
+        self.directory = self.config["DIRECTORY"]
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.columnar = bool(self.config["COLUMNAR"])
+        if self.columnar and pyarrow is None:
+            logger.warning("pyarrow is not installed, columnar export disabled")
+            self.columnar = False
+
+        self.round_number = 0
+        self._round_timestamp = 0.0
+        self._batch_rows = int(self.config["BATCH_ROWS"])
+        self._pending = []
+        # One thread, so batches are written in order.
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="export"
+        )
+        self._jsonl = None
+        self._columnar_writer = None
+        self._segment_rounds = 0
+        self._segment_bytes = 0
+        self._segment_files = []
+
+    def _open_segment(self, round_number: int):
+        """Start a new set of export files named after the first round in them."""
+        base = os.path.join(self.directory, f"results-{round_number:06d}-{int(time.time())}")
+        self._jsonl = gzip.open(
+            base + ".jsonl.gz",
+            "wt",
+            compresslevel=int(self.config["COMPRESS_LEVEL"]),
+            encoding="utf-8",
+        )
+        files = [base + ".jsonl.gz"]
+        if self.columnar:
+            self._columnar_writer = ColumnarWriter(base + ".parquet", self._batch_rows)
+            files.append(base + ".parquet")
+        self._segment_files.append(files)
+        self._segment_rounds = 0
+        self._segment_bytes = 0
+
+    def _close_segment(self):
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+        if self._columnar_writer is not None:
+            self._columnar_writer.close()
+            self._columnar_writer = None
+        # Remove the oldest segments beyond KEEP_FILES (0 keeps everything).
+        keep = int(self.config["KEEP_FILES"])
+        while keep and len(self._segment_files) > keep:
+            for path in self._segment_files.pop(0):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _write_batch(self, records: list):
+        # Runs on the writer thread.
+        if self._jsonl is None:
+            self._open_segment(records[0]["round"])
+        for record in records:
+            line = encode_record(record)
+            self._jsonl.write(line)
+            self._jsonl.write("\n")
+            self._segment_bytes += len(line) + 1
+            if self._columnar_writer is not None:
+                self._columnar_writer.write(record)
+
+    def _finish_round(self, records: list):
+        # Runs on the writer thread.
+        if records:
+            self._write_batch(records)
+        if self._jsonl is None:
+            return
+        self._segment_rounds += 1
+        self._jsonl.flush()
+        if (
+            self._segment_rounds >= int(self.config["ROTATE_ROUNDS"])
+            or self._segment_bytes >= int(self.config["MAX_BYTES"])
+        ):
+            self._close_segment()
+
+    @staticmethod
+    def _report(future):
+        if future.exception() is not None:
+            logger.error("Writing exported results failed: %s", future.exception())
+
+    def _submit(self, records: list):
+        self._executor.submit(self._write_batch, records).add_done_callback(self._report)
+
+    def _take_pending(self) -> list:
+        records, self._pending = self._pending, []
+        return records
+
+    def start_round(self, round_number: int):
+        """Begin exporting a round."""
+        self.round_number = round_number
+        self._round_timestamp = time.time()
+
+    def write(self, service_check: ServiceHealthCheck):
+        """Export a single scored service check."""
+        self._pending.append(
+            build_record(service_check, self.round_number, self._round_timestamp)
+        )
+        if len(self._pending) >= self._batch_rows:
+            self._submit(self._take_pending())
+
+    async def end_round(self):
+        """
+        Flush the round and rotate once the segment is big or old enough.
+        Returns once everything written so far is on disk.
+        """
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._finish_round, self._take_pending()
+        )
+
+    def close(self):
+        """Write what is left and close the export files, waiting for the writer."""
+        records = self._take_pending()
+        if records:
+            self._submit(records)
+        self._executor.submit(self._close_segment).result()
+        self._executor.shutdown()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Publishes every scored check into a shared memory ring buffer for local
+readers: dashboards, exporters and alerting scripts.
+
+Follow it from another process with
+    python -m ServiceCheckScripts.ResultRing [NAME]
+or from a script:
+    reader = ResultRing.ResultRingReader()
+    for record in reader.follow():
+        ...
+"""
+import argparse
+import collections
+import json
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+from .Results import ServiceHealthCheck
+from .EngineLogger import get_logger
+
+logger = get_logger("ring")
+
+# Defaults for the ENGINE -> RESULT_RING section of EnvVars.yaml.
+DEFAULT_SETTINGS = {
+    "ENABLED": False,
+    "NAME": "cyber_games_results",
+    # Records kept, a reader further behind than this loses records.
+    "SLOTS": 32768,
+}
+
+MAGIC = b"CGRR"
+VERSION = 1
+
+# magic, version, record size, slots, epoch, then the write sequence: the
+# number of records published so far. It is the only header field that
+# changes and is 8 byte aligned.
+HEADER = struct.Struct("<4sHxxIIQ")
+WRITE_SEQ = struct.Struct("<Q")
+WRITE_SEQ_OFFSET = HEADER.size
+HEADER_SIZE = 64
+
+# Every slot starts with the sequence number of the record in it, set to
+# WRITING while the record is being replaced.
+SLOT_SEQ = struct.Struct("<Q")
+WRITING = 2**64 - 1
+
+# Fixed layout of a record after its sequence number. Strings are UTF-8,
+# null padded and cut at these lengths.
+RECORD_FIELDS = (
+    ("round", "I"),
+    ("timestamp", "d"),
+    ("duration", "d"),
+    ("points", "i"),
+    ("target_id", "i"),
+    ("team_id", "16s"),
+    ("team_name", "32s"),
+    ("target_host", "64s"),
+    ("target_port", "8s"),
+    ("service_name", "8s"),
+    ("result", "4s"),
+    ("feedback", "256s"),
+    ("staff_feedback", "256s"),
+)
+RECORD = struct.Struct("<" + "".join(code for _, code in RECORD_FIELDS))
+SLOT_SIZE = SLOT_SEQ.size + RECORD.size
+STRING_FIELDS = frozenset(
+    index for index, (_, code) in enumerate(RECORD_FIELDS) if code.endswith("s")
+)
+
+ResultRecord = collections.namedtuple(
+    "ResultRecord", ("seq",) + tuple(name for name, _ in RECORD_FIELDS)
+)
+
+
+def _encode(value) -> bytes:
+    # struct cuts and pads "s" fields itself.
+    return str(value if value is not None else "").encode("utf-8", "replace")
+
+
+class ResultRing:
+    """
+    The writer. Each record is written in place into the slot for its
+    sequence number, and the slot's sequence number is written last, so
+    readers can tell a record that changed while they copied it. Readers
+    never write to the buffer and the writer never waits for them: the cost
+    of publishing is the same however many are attached.
+
+    The buffer outlives the engine, a restarted engine reuses it so readers
+    stay attached.
+    """
+
+    def __init__(self, name: str, slots: int):
+        self.name = name
+        self.slots = slots
+        size = HEADER_SIZE + slots * SLOT_SIZE
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name=name)
+            if self._shm.size < size:
+                # SLOTS grew, readers of the old buffer have to attach again.
+                self._shm.close()
+                self._shm.unlink()
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        # Otherwise the resource tracker removes the buffer when the engine exits.
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+        self._buf = self._shm.buf
+        self.write_seq = 0
+        WRITE_SEQ.pack_into(self._buf, WRITE_SEQ_OFFSET, 0)
+        # A new epoch tells attached readers the engine restarted.
+        HEADER.pack_into(self._buf, 0, MAGIC, VERSION, SLOT_SIZE, slots, time.time_ns())
+
+    def publish(self, service_check: ServiceHealthCheck, round_number: int):
+        """Write a scored check into the next slot."""
+        result_code = service_check.result.result
+        seq = self.write_seq
+        offset = HEADER_SIZE + (seq % self.slots) * SLOT_SIZE
+        buf = self._buf
+        SLOT_SEQ.pack_into(buf, offset, WRITING)
+        RECORD.pack_into(
+            buf,
+            offset + SLOT_SEQ.size,
+            round_number,
+            time.time(),
+            service_check.duration,
+            service_check.points,
+            service_check.target_id,
+            _encode(service_check.team_id),
+            _encode(service_check.team_name),
+            _encode(service_check.target_host),
+            _encode(service_check.target_port),
+            _encode(service_check.service_name),
+            _encode(result_code.value if result_code else ""),
+            _encode(service_check.result.feedback),
+            _encode(service_check.result.staff_feedback),
+        )
+        SLOT_SEQ.pack_into(buf, offset, seq)
+        self.write_seq = seq + 1
+        WRITE_SEQ.pack_into(buf, WRITE_SEQ_OFFSET, self.write_seq)
+
+    def close(self):
+        self._buf = None
+        self._shm.close()
+
+
+class ReaderLagged(Exception):
+    """The writer overwrote records before the reader got to them."""
+
+    def __init__(self, missed: int):
+        super().__init__(f"fell behind the writer, {missed} records lost")
+        self.missed = missed
+
+
+class ResultRingReader:
+    """
+    Follows a ResultRing from another process. read() returns the records
+    published since the last call. When the reader falls more than the ring's
+    SLOTS behind it raises ReaderLagged with the number of records lost,
+    and carries on from half a ring behind the writer.
+    """
+
+    def __init__(self, name: str = DEFAULT_SETTINGS["NAME"], from_oldest: bool = False):
+        self._shm = shared_memory.SharedMemory(name=name)
+        # Attaching registers the buffer for removal when this process exits,
+        # which would remove it from under the engine.
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+        self._buf = self._shm.buf
+        magic, version, slot_size, self.slots, self.epoch = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION or slot_size != SLOT_SIZE:
+            self.close()
+            raise ValueError(f"{name} is not a version {VERSION} result ring")
+        write_seq = self.write_seq
+        self.next_seq = max(0, write_seq - self.slots) if from_oldest else write_seq
+
+    @property
+    def write_seq(self) -> int:
+        return WRITE_SEQ.unpack_from(self._buf, WRITE_SEQ_OFFSET)[0]
+
+    @property
+    def lag(self) -> int:
+        """Records published that this reader has not read yet."""
+        return self.write_seq - self.next_seq
+
+    def _restarted(self) -> bool:
+        # A restarted engine has a new epoch and counts from 0 again.
+        slots, epoch = HEADER.unpack_from(self._buf, 0)[3:]
+        if epoch == self.epoch:
+            return False
+        self.slots = slots
+        self.epoch = epoch
+        self.next_seq = 0
+        return True
+
+    def _skip_ahead(self, write_seq: int):
+        missed = write_seq - self.slots // 2 - self.next_seq
+        self.next_seq = write_seq - self.slots // 2
+        raise ReaderLagged(missed)
+
+    def read(self, max_records: int = None) -> list:
+        """Records published since the last read, oldest first."""
+        self._restarted()
+        write_seq = self.write_seq
+        if write_seq - self.next_seq > self.slots:
+            self._skip_ahead(write_seq)
+        end = write_seq if max_records is None else min(write_seq, self.next_seq + max_records)
+
+        buf = self._buf
+        records = []
+        for seq in range(self.next_seq, end):
+            offset = HEADER_SIZE + (seq % self.slots) * SLOT_SIZE
+            values = RECORD.unpack_from(buf, offset + SLOT_SEQ.size)
+            # Checked after the copy, a changed slot was overwritten while it was read.
+            if SLOT_SEQ.unpack_from(buf, offset)[0] != seq:
+                if self._restarted():
+                    return records
+                self.next_seq = seq
+                if records:
+                    # Hand over what was read, the next read reports the lag.
+                    return records
+                self._skip_ahead(self.write_seq)
+            records.append(
+                ResultRecord(
+                    seq,
+                    *(
+                        value.rstrip(b"\0").decode("utf-8", "ignore")
+                        if index in STRING_FIELDS
+                        else value
+                        for index, value in enumerate(values)
+                    ),
+                )
+            )
+        self.next_seq = end
+        return records
+
+    def follow(self, interval: float = 0.1):
+        """Yield records as they are published, logging records lost to lag."""
+        while True:
+            try:
+                records = self.read()
+            except ReaderLagged as e:
+                logger.warning("Result ring reader %s", e)
+                continue
+            if not records:
+                time.sleep(interval)
+            yield from records
+
+    def close(self):
+        self._buf = None
+        self._shm.close()
+
+
+def start(settings: dict = None):
+    """A ResultRing from ENGINE -> RESULT_RING, or None when it is disabled."""
+    config = dict(DEFAULT_SETTINGS)
+    config.update(settings or {})
+    if not config["ENABLED"]:
+        return None
+    ring = ResultRing(config["NAME"], int(config["SLOTS"]))
+    logger.info(
+        "Publishing results to shared memory %s, %d slots of %d bytes",
+        ring.name,
+        ring.slots,
+        SLOT_SIZE,
+    )
+    return ring
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("name", nargs="?", default=DEFAULT_SETTINGS["NAME"])
+    parser.add_argument("--from-oldest", action="store_true", help="start with the oldest record kept")
+    args = parser.parse_args()
+    reader = ResultRingReader(args.name, args.from_oldest)
+    try:
+        for record in reader.follow():
+            print(json.dumps(record._asdict(), ensure_ascii=False), flush=True)
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import enum
 import json
+from collections import deque
 from typing import Optional, Union, Any, List, Dict
 
 
@@ -18,8 +19,12 @@ class ResultCode(enum.Enum):
 class SSHInfo:
     ssh_priv_key: str
     ssh_username: str
-    ssh_script: str
-    md5sum: str
+    ssh_script: Optional[str]
+    md5sum: Optional[str]
+    # Remote files verified over SFTP instead of running ssh_script, one MD5 each.
+    files: Optional[List[str]] = None
+    md5_sums: Optional[List[str]] = None
+    max_bytes: Optional[int] = None
 
 
 # Represents SQL configuration and test data.
@@ -41,16 +46,34 @@ class FTPInfo:
     md5_sums: Optional[List[str]]
 
 
-# Represents basic HTTP information.
+# Represents basic HTTP information, plus optional page content checks.
 class HTTPInfo:
     url: str
     path: str
+    md5_sum: Optional[str] = None
+    contains: Optional[str] = None
+    regex: Optional[str] = None
+    max_bytes: Optional[int] = None
 
 
-# Represents basic HTTPS information, functionally same as HTTPInfo in this context.
+# Represents HTTPS information, HTTPInfo plus certificate validation settings.
 class HTTPSInfo:
     url: str
     path: str
+    ca_file: Optional[str]
+    cert_warn_days: int
+    cert_fail_on_invalid: bool
+    md5_sum: Optional[str] = None
+    contains: Optional[str] = None
+    regex: Optional[str] = None
+    max_bytes: Optional[int] = None
+
+
+# Represents a TCP port reachability check, optionally matching the service banner.
+class TCPInfo:
+    banner_regex: Optional[str]
+    connect_timeout: Optional[float] = None
+    banner_timeout: Optional[float] = None
 
 
 class ResultJSONEncoder(json.JSONEncoder):
@@ -66,28 +89,117 @@ class ResultJSONEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, o)
 
 
+# Limits on what a single Feedback holds, see configure_detail_limits.
+DETAIL_LIMITS = {
+    "MAX_DETAILS": 32,
+    "MAX_DETAIL_BYTES": 16384,
+    "MAX_STRING": 1024,
+    "MAX_FEEDBACK": 4096,
+}
+
+
+def configure_detail_limits(settings: dict):
+    """Override the detail limits, from the ENGINE -> RESULTS section of EnvVars.yaml."""
+    for key in DETAIL_LIMITS:
+        if key in settings:
+            DETAIL_LIMITS[key] = int(settings[key])
+
+
+def compact_detail(val: Any, depth: int = 0):
+    """
+    Copy a detail into plain, bounded values and estimate its size in bytes.
+
+    Exceptions become truncated strings so their tracebacks and frames are not
+    kept alive, long strings are truncated, and dicts/lists are copied so a
+    later change to the caller's object can't grow the stored detail.
+    """
+    max_string = DETAIL_LIMITS["MAX_STRING"]
+    if val is None or isinstance(val, (bool, int, float)):
+        return val, 8
+    if isinstance(val, ResultCode):
+        return val.value, 8
+    if isinstance(val, str):
+        text = val[:max_string]
+        return text, len(text)
+    if isinstance(val, BaseException):
+        text = f"{type(val).__name__}: {val}"[:max_string]
+        return text, len(text)
+    if depth < 3 and isinstance(val, dict):
+        copied = {}
+        size = 0
+        for key, item in val.items():
+            key_text = str(key)[:max_string]
+            copied[key_text], item_size = compact_detail(item, depth + 1)
+            size += len(key_text) + item_size
+        return copied, size
+    if depth < 3 and isinstance(val, (list, tuple, set)):
+        copied = []
+        size = 0
+        for item in val:
+            compacted, item_size = compact_detail(item, depth + 1)
+            copied.append(compacted)
+            size += item_size
+        return copied, size
+    text = str(val)[:max_string]
+    return text, len(text)
+
+
 class Feedback:
     """
     Holds Feedback from a script, either participant or staff details
+
+    Details are kept in a bounded queue, the oldest are dropped once there are
+    more than MAX_DETAILS or they hold more than MAX_DETAIL_BYTES.
     """
 
     def __init__(self):
         self.feedback = ""
-        self._details = []
+        self._details = deque()
+        self._detail_sizes = deque()
+        self.detail_bytes = 0
+        self.dropped_details = 0
 
     @property
     def details(self):
         """Get Details."""
-        return self._details
+        return list(self._details)
+
+    @property
+    def bytes_held(self) -> int:
+        """Approximate bytes held by the feedback and its details."""
+        return len(self.feedback) + self.detail_bytes
 
     def add_details(self, val: Union[List, Any]):
         """
         Add details to the Feedback. Accepts a value or list of values.
         """
         if isinstance(val, list):
-            self._details.extend(val)
+            for item in val:
+                self._add_detail(item)
         else:
-            self._details.append(val)
+            self._add_detail(val)
+
+    def _add_detail(self, val: Any):
+        detail, size = compact_detail(val)
+        self._details.append(detail)
+        self._detail_sizes.append(size)
+        self.detail_bytes += size
+        # Always keep the newest detail, drop from the oldest end.
+        while len(self._details) > 1 and (
+            len(self._details) > DETAIL_LIMITS["MAX_DETAILS"]
+            or self.detail_bytes > DETAIL_LIMITS["MAX_DETAIL_BYTES"]
+        ):
+            self._details.popleft()
+            self.detail_bytes -= self._detail_sizes.popleft()
+            self.dropped_details += 1
+
+    def reportJSON(self):
+        """Serializable form of the Feedback, used by ResultJSONEncoder."""
+        return {
+            "feedback": self.feedback,
+            "details": list(self._details),
+            "dropped_details": self.dropped_details,
+        }
 
 
 class FinalResult:
@@ -118,7 +230,7 @@ class FinalResult:
         """Set Participant Feedback. Verifies Feedback is a string."""
         if not isinstance(val, str):
             raise ValueError("feedback must be a string")
-        self._participant_result.feedback = val
+        self._participant_result.feedback = val[: DETAIL_LIMITS["MAX_FEEDBACK"]]
 
     @property
     def staff_feedback(self) -> str:
@@ -130,7 +242,22 @@ class FinalResult:
         """Set Staff Feedback. Verifies Feedback is a string."""
         if not isinstance(val, str):
             raise ValueError("feedback must be a string")
-        self._staff_result.feedback = val
+        self._staff_result.feedback = val[: DETAIL_LIMITS["MAX_FEEDBACK"]]
+
+    @property
+    def details(self) -> list:
+        """Get Participant Details."""
+        return self._participant_result.details
+
+    @property
+    def staff_details(self) -> list:
+        """Get Staff Details."""
+        return self._staff_result.details
+
+    @property
+    def bytes_held(self) -> int:
+        """Approximate bytes held by participant and staff feedback and details."""
+        return self._participant_result.bytes_held + self._staff_result.bytes_held
 
     def add_detail(self, detail):
         """Add Participant Detail."""
@@ -198,10 +325,16 @@ class ServiceHealthCheck:
     service_name: str = ""
     ssh_info: Optional[SSHInfo]
     http_info: Optional[HTTPInfo]
+    https_info: Optional[HTTPSInfo]
     ftp_info: Optional[FTPInfo]
     sql_info: Optional[SQLInfo]
+    tcp_info: Optional[TCPInfo]
     points: int = 0
-    result: FinalResult = FinalResult()
+    duration: float = 0.0
+    queue_wait: float = 0.0
+    # Timeout learned for this target and service, None for the check's default.
+    timeout: Optional[float] = None
+    result: FinalResult
 
     def __init__(
         self,
@@ -215,6 +348,8 @@ class ServiceHealthCheck:
         http_info: Optional[HTTPInfo] = None,
         ftp_info: Optional[FTPInfo] = None,
         sql_info: Optional[SQLInfo] = None,
+        tcp_info: Optional[TCPInfo] = None,
+        https_info: Optional[HTTPSInfo] = None,
     ):
         self.target_id = target_id
         self.target_host = target_host
@@ -226,3 +361,11 @@ class ServiceHealthCheck:
         self.http_info = http_info
         self.ftp_info = ftp_info
         self.sql_info = sql_info
+        self.tcp_info = tcp_info
+        self.https_info = https_info
+        # Each check needs its own result, a class level default is shared by every instance.
+        self.result = FinalResult()
+        # Phase name -> seconds spent, filled in by Metrics.phase.
+        self.phases = {}
+        # (name, start, seconds) of each phase, only collected when the round is traced.
+        self.spans = None
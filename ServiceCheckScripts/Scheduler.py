@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+import asyncio
+import collections
+import time
+
+from .Results import ServiceHealthCheck
+from .EngineLogger import get_logger
+
+logger = get_logger("scheduler")
+
+# Defaults for the ENGINE -> SCHEDULER section of EnvVars.yaml.
+# A rate of 0 means no connects-per-second limit.
+DEFAULT_SETTINGS = {
+    "MAX_IN_FLIGHT": 512,
+    "TEAM_MAX_IN_FLIGHT": 16,
+    "TEAM_CONNECTS_PER_SECOND": 50,
+    "TARGET_MAX_IN_FLIGHT": 8,
+    "TARGET_CONNECTS_PER_SECOND": 10,
+}
+
+# How far into a team's queue to look for a check whose target has capacity.
+QUEUE_SCAN_DEPTH = 16
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class TokenBucket:
+    """Allows `rate` starts per second with bursts of up to `rate` starts."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available, 0 if one is available now."""
+        if not self.rate:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def take(self):
+        if self.rate:
+            self.tokens -= 1.0
+
+
+class Job:
+    """A queued service check."""
+
+    __slots__ = ("service_check", "run", "future", "queued_at", "started_at", "target")
+
+    def __init__(self, service_check: ServiceHealthCheck, run, future):
+        self.service_check = service_check
+        self.run = run
+        self.future = future
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self.target = service_check.target_host
+
+
+class FairScheduler:
+    """
+    Runs service checks round-robin across teams.
+
+    Each team and each target host has a concurrency cap and a token bucket on
+    new starts, and MAX_IN_FLIGHT caps the whole engine. Teams take turns, one
+    check per turn, so a team with 40 actions can't crowd out a team with 4.
+
+    Priority jobs, such as staff rechecks, start ahead of every team's turn
+    whenever the same limits allow.
+    """
+
+    def __init__(self, settings: dict = None):
+        config = dict(DEFAULT_SETTINGS)
+        config.update(settings or {})
+        self.max_in_flight = int(config["MAX_IN_FLIGHT"])
+        self.team_max_in_flight = int(config["TEAM_MAX_IN_FLIGHT"])
+        self.team_rate = float(config["TEAM_CONNECTS_PER_SECOND"])
+        self.target_max_in_flight = int(config["TARGET_MAX_IN_FLIGHT"])
+        self.target_rate = float(config["TARGET_CONNECTS_PER_SECOND"])
+
+        # team_id -> deque of Jobs, ordered by whose turn is next.
+        self._queues = collections.OrderedDict()
+        # Priority Jobs in the order they were submitted.
+        self._priority = collections.deque()
+        self._in_flight = 0
+        self._team_in_flight = collections.Counter()
+        self._target_in_flight = collections.Counter()
+        self._team_buckets = {}
+        self._target_buckets = {}
+        self._wakeup = None
+        self._dispatcher = None
+        self._tasks = set()
+
+        # team_id -> [(queue wait, total latency)] for the current round.
+        self._team_latency = collections.defaultdict(list)
+
+    def submit(self, service_check: ServiceHealthCheck, run, priority: bool = False) -> asyncio.Future:
+        """
+        Queue run(service_check) and return a future for its result.
+        Priority jobs go ahead of the teams' queues. Must be called from the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch(), name="scheduler")
+        job = Job(service_check, run, loop.create_future())
+        if priority:
+            self._priority.append(job)
+        else:
+            team_queue = self._queues.get(service_check.team_id)
+            if team_queue is None:
+                team_queue = self._queues[service_check.team_id] = collections.deque()
+            team_queue.append(job)
+        self._wakeup.set()
+        return job.future
+
+    async def run_round(self, service_checks: list, run):
+        """Schedule a round of checks and yield their results as they complete."""
+        futures = [self.submit(service_check, run) for service_check in service_checks]
+        for future in asyncio.as_completed(futures):
+            yield await future
+
+    def _bucket(self, buckets: dict, key, rate: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate)
+        return bucket
+
+    def _team_wait(self, team_id, now: float):
+        """None if the team is at its concurrency cap, else seconds until it may start a check."""
+        if self._team_in_flight[team_id] >= self.team_max_in_flight:
+            return None
+        return self._bucket(self._team_buckets, team_id, self.team_rate).wait_time(now)
+
+    def _target_wait(self, target: str, now: float):
+        """None if the target is at its concurrency cap, else seconds until it may start a check."""
+        if self._target_in_flight[target] >= self.target_max_in_flight:
+            return None
+        return self._bucket(self._target_buckets, target, self.target_rate).wait_time(now)
+
+    def _pick(self, team_id, team_queue, now: float):
+        """
+        Find a job of this team that can start now.
+        Returns (job, None) or (None, seconds to wait before retrying).
+        """
+        team_wait = self._team_wait(team_id, now)
+        if team_wait is None or team_wait:
+            return None, team_wait
+
+        retry = None
+        for index, job in enumerate(team_queue):
+            if index >= QUEUE_SCAN_DEPTH:
+                break
+            target_wait = self._target_wait(job.target, now)
+            if target_wait is None:
+                continue
+            if target_wait:
+                retry = target_wait if retry is None else min(retry, target_wait)
+                continue
+            del team_queue[index]
+            return job, None
+        return None, retry
+
+    def _pick_priority(self, now: float):
+        """
+        Find a priority job whose team and target can start a check now.
+        Returns (job, None) or (None, seconds to wait before retrying).
+        """
+        retry = None
+        for index, job in enumerate(self._priority):
+            if index >= QUEUE_SCAN_DEPTH:
+                break
+            waits = (
+                self._team_wait(job.service_check.team_id, now),
+                self._target_wait(job.target, now),
+            )
+            if None in waits:
+                continue
+            wait = max(waits)
+            if wait:
+                retry = wait if retry is None else min(retry, wait)
+                continue
+            del self._priority[index]
+            return job, None
+        return None, retry
+
+    async def _dispatch(self):
+        """Start queued jobs whenever capacity allows, one per team per turn."""
+        while True:
+            self._wakeup.clear()
+            retry = None
+            started = True
+            while (
+                started
+                and (self._queues or self._priority)
+                and self._in_flight < self.max_in_flight
+            ):
+                started = False
+                now = time.monotonic()
+                while self._priority and self._in_flight < self.max_in_flight:
+                    job, wait = self._pick_priority(now)
+                    if job is None:
+                        if wait is not None:
+                            retry = wait if retry is None else min(retry, wait)
+                        break
+                    self._start(job.service_check.team_id, job)
+                    started = True
+                for team_id in list(self._queues):
+                    if self._in_flight >= self.max_in_flight:
+                        break
+                    team_queue = self._queues[team_id]
+                    job, wait = self._pick(team_id, team_queue, now)
+                    if job is None:
+                        if wait is not None:
+                            retry = wait if retry is None else min(retry, wait)
+                        continue
+                    self._start(team_id, job)
+                    started = True
+                    # The team goes to the back of the line.
+                    if team_queue:
+                        self._queues.move_to_end(team_id)
+                    else:
+                        del self._queues[team_id]
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), retry)
+            except asyncio.TimeoutError:
+                pass
+
+    def _start(self, team_id, job: Job):
+        self._bucket(self._team_buckets, team_id, self.team_rate).take()
+        self._bucket(self._target_buckets, job.target, self.target_rate).take()
+        self._in_flight += 1
+        self._team_in_flight[team_id] += 1
+        self._target_in_flight[job.target] += 1
+        job.started_at = time.monotonic()
+
+        service_check = job.service_check
+        service_check.queue_wait = job.started_at - job.queued_at
+        task = asyncio.get_running_loop().create_task(
+            job.run(service_check),
+            name=f"check:{service_check.service_name}:{team_id}:{service_check.target_host}",
+        )
+        self._tasks.add(task)
+        task.add_done_callback(lambda finished: self._finish(team_id, job, finished))
+
+    def _finish(self, team_id, job: Job, task: asyncio.Task):
+        self._tasks.discard(task)
+        self._in_flight -= 1
+        self._team_in_flight[team_id] -= 1
+        self._target_in_flight[job.target] -= 1
+        finished_at = time.monotonic()
+        self._team_latency[team_id].append(
+            (job.started_at - job.queued_at, finished_at - job.queued_at)
+        )
+
+        if not job.future.done():
+            if task.cancelled():
+                job.future.cancel()
+            elif task.exception() is not None:
+                job.future.set_exception(task.exception())
+            else:
+                job.future.set_result(task.result())
+        self._wakeup.set()
+
+    def report(self, round_number: int):
+        """Log per-team queue wait and latency percentiles, then reset them."""
+        for team_id, samples in self._team_latency.items():
+            waits = sorted(sample[0] for sample in samples)
+            latencies = sorted(sample[1] for sample in samples)
+            logger.info(
+                "Round %d team checks: %d, wait p50 %.3fs p99 %.3fs, latency p50 %.3fs p95 %.3fs p99 %.3fs",
+                round_number,
+                len(samples),
+                percentile(waits, 0.50),
+                percentile(waits, 0.99),
+                percentile(latencies, 0.50),
+                percentile(latencies, 0.95),
+                percentile(latencies, 0.99),
+                extra={"team_id": team_id},
+            )
+        self._team_latency.clear()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+import asyncio
+import hashlib
+import json
+
+from .LocalHTTPServer import LocalHTTPServer, Response
+from .Results import ServiceHealthCheck, ResultCode
+from .EngineLogger import get_logger
+
+logger = get_logger("scoreboard")
+
+# Defaults for the ENGINE -> SCOREBOARD section of EnvVars.yaml.
+DEFAULT_SETTINGS = {
+    "ENABLED": False,
+    "HOST": "127.0.0.1",
+    "PORT": 9110,
+    # Seconds between keep-alive comments on idle event streams.
+    "KEEPALIVE": 15,
+    # Rounds an event stream client may fall behind before it is dropped.
+    "MAX_BEHIND": 8,
+    # Seconds an event stream client may take to accept a message before it is dropped.
+    "SEND_TIMEOUT": 10,
+}
+
+encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+class Page:
+    """An encoded JSON body and its ETag."""
+
+    def __init__(self, document):
+        self.body = encode(document).encode()
+        self.etag = _etag(self.body)
+
+    def response(self, request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == self.etag:
+            return Response(304, b"", "application/json", headers)
+        return Response(200, self.body, "application/json", headers)
+
+
+class Scoreboard:
+    """
+    Team points and service status as of the last finished round.
+
+    Checks are recorded as they are scored and only become visible when the
+    round is published, so every reader sees whole rounds. Pages are encoded
+    once per round, however many spectators ask for them.
+    """
+
+    def __init__(self, keepalive: float = 15, max_behind: int = 8, send_timeout: float = 10):
+        self.keepalive = keepalive
+        self.max_behind = max_behind
+        self.send_timeout = send_timeout
+        self.round_number = 0
+        # team_id -> {"team_id", "team_name", "points", "services_up", "services"}
+        self._teams = {}
+        # team_id -> {(target_id, service_name): status row}
+        self._rows = {}
+        # This round's scored checks, published with it.
+        self._pending_rows = {}
+        self._pending_points = {}
+        self._pending_names = {}
+        self.scoreboard_page = Page({"round": 0, "teams": []})
+        self._team_pages = {}
+        self._subscribers = set()
+        self.server = None
+
+    def record(self, health_check: ServiceHealthCheck):
+        """Add a scored check to the round being run."""
+        team_id = int(health_check.team_id)
+        result_code = health_check.result.result
+        self._pending_names[team_id] = health_check.team_name
+        self._pending_points[team_id] = (
+            self._pending_points.get(team_id, 0) + health_check.points
+        )
+        self._pending_rows[(team_id, health_check.target_id, health_check.service_name)] = {
+            "team_id": team_id,
+            "target_id": health_check.target_id,
+            "service": health_check.service_name,
+            "port": health_check.target_port,
+            "result": (result_code or ResultCode.UNKNOWN).value,
+            "feedback": health_check.result.feedback,
+            "points": health_check.points,
+        }
+
+    def publish(self, round_number: int):
+        """Make the recorded round visible and push what changed to event streams."""
+        changed_teams = set()
+        changed_rows = []
+        for team_id, team_name in self._pending_names.items():
+            team = self._teams.get(team_id)
+            if team is None:
+                team = self._teams[team_id] = {
+                    "team_id": team_id,
+                    "team_name": team_name,
+                    "points": 0,
+                    "services_up": 0,
+                    "services": 0,
+                }
+                self._rows[team_id] = {}
+            if self._pending_points[team_id]:
+                team["points"] += self._pending_points[team_id]
+                changed_teams.add(team_id)
+
+        for (team_id, target_id, service_name), row in self._pending_rows.items():
+            team = self._teams[team_id]
+            team_rows = self._rows[team_id]
+            previous = team_rows.get((target_id, service_name))
+            if previous == row:
+                continue
+            if previous is None:
+                team["services"] += 1
+            elif previous["result"] == ResultCode.PASS.value:
+                team["services_up"] -= 1
+            if row["result"] == ResultCode.PASS.value:
+                team["services_up"] += 1
+            team_rows[(target_id, service_name)] = row
+            changed_rows.append(row)
+            changed_teams.add(team_id)
+
+        self._pending_rows = {}
+        self._pending_points = {}
+        self._pending_names = {}
+        self.round_number = round_number
+        self.scoreboard_page = Page(
+            {
+                "round": round_number,
+                "teams": sorted(
+                    self._teams.values(), key=lambda team: (-team["points"], team["team_id"])
+                ),
+            }
+        )
+        self._team_pages = {}
+
+        event = encode(
+            {
+                "round": round_number,
+                "teams": [self._teams[team_id] for team_id in sorted(changed_teams)],
+                "services": changed_rows,
+            }
+        )
+        self._broadcast(f"id: {round_number}\nevent: round\ndata: {event}\n\n".encode())
+        logger.info(
+            "Scoreboard round %d published: %d changed services, %d event stream clients",
+            round_number,
+            len(changed_rows),
+            len(self._subscribers),
+        )
+
+    def state(self) -> dict:
+        """The published teams and service rows, for a checkpoint."""
+        return {"round_number": self.round_number, "teams": self._teams, "rows": self._rows}
+
+    def restore(self, state: dict):
+        """Pick up the published round from a checkpoint."""
+        self._teams = state["teams"]
+        self._rows = state["rows"]
+        self.publish(state["round_number"])
+
+    def seed(self, team_points: dict):
+        """Start from stored totals, team_id -> (team_name, points), e.g. after a restart."""
+        for team_id, (team_name, points) in team_points.items():
+            team = self._teams.get(team_id)
+            if team is None:
+                team = self._teams[team_id] = {
+                    "team_id": team_id,
+                    "team_name": team_name,
+                    "points": 0,
+                    "services_up": 0,
+                    "services": 0,
+                }
+                self._rows[team_id] = {}
+            team["points"] = points
+        self.publish(self.round_number)
+
+    def team_page(self, team_id: int):
+        """A team's service rows, encoded the first time it is asked for this round."""
+        page = self._team_pages.get(team_id)
+        if page is None and team_id in self._teams:
+            page = self._team_pages[team_id] = Page(
+                {
+                    "round": self.round_number,
+                    "team": self._teams[team_id],
+                    "services": list(self._rows[team_id].values()),
+                }
+            )
+        return page
+
+    def _broadcast(self, message: bytes):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too far behind, end its stream so it reconnects and refetches.
+                self._subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def serve_scoreboard(self, request, writer):
+        return self.scoreboard_page.response(request)
+
+    async def serve_team(self, request, writer):
+        try:
+            page = self.team_page(int(request.query.get("id", "")))
+        except ValueError:
+            return Response(400, b"id must be a team id\n")
+        if page is None:
+            return Response(404, b"no such team\n")
+        return page.response(request)
+
+    async def serve_events(self, request, writer):
+        """Stream each round's changes as a server-sent event."""
+        queue = asyncio.Queue(self.max_behind)
+        self._subscribers.add(queue)
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n"
+                + f"retry: 5000\nid: {self.round_number}\n\n".encode()
+            )
+            await asyncio.wait_for(writer.drain(), self.send_timeout)
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    message = b": keepalive\n\n"
+                if message is None:
+                    break
+                writer.write(message)
+                await asyncio.wait_for(writer.drain(), self.send_timeout)
+        except asyncio.TimeoutError:
+            # A stalled client would hold its buffered events forever, drop it.
+            logger.info("Dropped an event stream client that stopped reading")
+        finally:
+            self._subscribers.discard(queue)
+        return None
+
+
+async def start(settings: dict = None):
+    """
+    Start serving /scoreboard, /team?id=N and /events.
+    Returns the Scoreboard, or None when it is disabled.
+    """
+    config = dict(DEFAULT_SETTINGS)
+    config.update(settings or {})
+    if not config["ENABLED"]:
+        return None
+    scoreboard = Scoreboard(
+        float(config["KEEPALIVE"]), int(config["MAX_BEHIND"]), float(config["SEND_TIMEOUT"])
+    )
+    server = LocalHTTPServer(config["HOST"], int(config["PORT"]), backlog=1024)
+    server.route("/scoreboard", scoreboard.serve_scoreboard)
+    server.route("/team", scoreboard.serve_team)
+    server.route("/events", scoreboard.serve_events)
+    await server.start()
+    scoreboard.server = server
+    return scoreboard
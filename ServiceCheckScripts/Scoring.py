@@ -1,5 +1,7 @@
 from .Results import ServiceHealthCheck, ResultCode
-import sys
+from .EngineLogger import get_logger
+
+logger = get_logger("scoring")
 
 
 def score_generic(
@@ -30,6 +32,18 @@ def score_http(given_service_health_check: ServiceHealthCheck) -> int:
     return score_generic(given_service_health_check, pass_score=25, warn_score=10)
 
 
+def score_https(given_service_health_check: ServiceHealthCheck) -> int:
+    return score_generic(given_service_health_check, pass_score=25, warn_score=10)
+
+
+def score_sql(given_service_health_check: ServiceHealthCheck) -> int:
+    return score_generic(given_service_health_check, pass_score=40, warn_score=10)
+
+
+def score_tcp(given_service_health_check: ServiceHealthCheck) -> int:
+    return score_generic(given_service_health_check, pass_score=5, warn_score=2)
+
+
 def score_health_check(
     given_service_health_check: ServiceHealthCheck,
 ) -> ServiceHealthCheck:
@@ -38,13 +52,19 @@ def score_health_check(
         "FTP": score_ftp,
         "SSH": score_ssh,
         "HTTP": score_http,
+        "HTTPS": score_https,
+        "SQL": score_sql,
+        "TCP": score_tcp,
     }
 
     scoring_function = scoring_functions.get(given_service_health_check.service_name)
     if scoring_function:
         given_service_health_check.points = scoring_function(given_service_health_check)
     else:
-        print("ERROR, while scoring...")
-        sys.exit(0)
+        logger.error(
+            "ERROR, while scoring...",
+            extra={"service_name": given_service_health_check.service_name},
+        )
+        given_service_health_check.points = 0
 
     return given_service_health_check
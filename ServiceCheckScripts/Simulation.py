@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+import asyncio
+import math
+import os
+import random
+import resource
+import time
+
+from ServiceCheckScripts import CheckRegistry
+from .Results import ServiceHealthCheck
+from .Scheduler import percentile
+from .EngineLogger import get_logger
+
+logger = get_logger("simulation")
+
+# Defaults for the ENGINE -> SIMULATION section of EnvVars.yaml, used by
+# `StatusCheckEngine.py --simulate`.
+DEFAULT_SETTINGS = {
+    "SIZES": [1000, 10000, 100000],
+    "ROUNDS_PER_SIZE": 3,
+    "TARGETS_PER_TEAM": 4,
+    "SERVICES": ["ICMP", "TCP", "HTTP", "HTTPS", "FTP", "SSH", "SQL"],
+    "LATENCY_MS": 50,
+    "JITTER": 0.8,
+    "FAIL_RATE": 0.05,
+    "TIMEOUT_RATE": 0.01,
+    "TIMEOUT_SECONDS": 4,
+    "SEED": 1,
+}
+
+# The outcome distribution simulated checks draw from, set by Simulation.install().
+_behavior = None
+
+
+def rss_bytes() -> int:
+    """Current resident set size, or the peak where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Behavior:
+    """Latency and outcome distribution of the simulated checks."""
+
+    def __init__(self, config: dict):
+        self.latency = float(config["LATENCY_MS"]) / 1000
+        self.jitter = float(config["JITTER"])
+        self.fail_rate = float(config["FAIL_RATE"])
+        self.timeout_rate = float(config["TIMEOUT_RATE"])
+        self.timeout_seconds = float(config["TIMEOUT_SECONDS"])
+        self.random = random.Random(config["SEED"])
+
+    def delay(self) -> float:
+        if self.latency <= 0:
+            return 0.0
+        return self.random.lognormvariate(math.log(self.latency), self.jitter)
+
+
+class SimulatedCheck:
+    """Stands in for every check class: sleeps, then reports a drawn outcome."""
+
+    # TIMEOUT_SECONDS, set by Simulation.install().
+    timeout = None
+
+    def __init__(self, service_check: ServiceHealthCheck):
+        self.service_check_priv = service_check
+
+    async def execute(self):
+        """Execute the simulated check."""
+        service_check = self.service_check_priv
+        roll = _behavior.random.random()
+        details = {"target": service_check.target_host, "simulated": True}
+        timeout = service_check.timeout or self.timeout
+        delay = _behavior.delay()
+        if roll < _behavior.timeout_rate or delay > timeout:
+            # A hung service holds the check for its whole timeout.
+            await asyncio.sleep(timeout)
+            service_check.result.timeout(
+                feedback=f"Simulated timeout for host {service_check.target_host}",
+                staff_details=details,
+            )
+            return service_check
+
+        await asyncio.sleep(delay)
+        if roll < _behavior.timeout_rate + _behavior.fail_rate:
+            service_check.result.fail(
+                feedback=f"Simulated failure for host {service_check.target_host}",
+                staff_details=details,
+            )
+        else:
+            service_check.result.success(
+                feedback=f"Simulated {service_check.service_name} check passed",
+                staff_details=details,
+            )
+        return service_check
+
+
+async def simulated_probe(service_check: ServiceHealthCheck):
+    """Stands in for the circuit breaker's TCP connect, with the same outcome rates."""
+    await asyncio.sleep(_behavior.delay())
+    if _behavior.random.random() < _behavior.timeout_rate + _behavior.fail_rate:
+        return f"simulated probe of {service_check.target_host} failed"
+    return None
+
+
+def _fake_names(seed: int):
+    """Faker for realistic names when it is installed, plain names otherwise."""
+    try:
+        from faker import Faker
+    except ImportError:
+        logger.warning("faker is not installed, simulated teams get plain names")
+        return None
+    fake = Faker()
+    Faker.seed(seed)
+    return fake
+
+
+def _action(service: str, fake, index: int) -> dict:
+    """An EnvVars action for `service` with the keys PrepareServiceChecks reads."""
+    username = fake.user_name() if fake else f"user{index}"
+    password = fake.password() if fake else f"password{index}"
+    match service:
+        case "SSH":
+            return {
+                "SERVICE_NAME": "SSH",
+                "PORT": 22,
+                "SSH_USERNAME": username,
+                "SSH_PRIV_KEY": "simulated.pem",
+                "SSH_SCRIPT": "md5sum md5checkfile.txt",
+                "MD5_SUM": "0" * 32,
+            }
+        case "HTTP" | "HTTPS":
+            return {
+                "SERVICE_NAME": service,
+                "PORT": 80 if service == "HTTP" else 443,
+                "URL": fake.domain_name() if fake else f"team{index}.example",
+                "PATH": "index.html",
+            }
+        case "FTP":
+            return {
+                "SERVICE_NAME": "FTP",
+                "PORT": 21,
+                "FTP_USERNAME": username,
+                "FTP_PASSWORD": password,
+                "FTP_ACTION": "GET",
+                "FILES": ["test.txt"],
+                "MD5_SUM": ["0" * 32],
+                "DIRECTORY": "/srv/ftp/",
+            }
+        case "SQL":
+            return {
+                "SERVICE_NAME": "SQL",
+                "PORT": 3306,
+                "SQL_USERNAME": username,
+                "SQL_PASSWORD": password,
+                "DB_NAME": "scoring",
+                "TABLE_NAME": "flags",
+                "TEST_DATA": {"name": username, "points": 1},
+            }
+        case "TCP":
+            return {"SERVICE_NAME": "TCP", "PORT": 8080}
+        case _:
+            return {"SERVICE_NAME": service}
+
+
+def generate_config(check_count: int, config: dict) -> dict:
+    """
+    A synthetic EnvVars TEAMS block with about `check_count` checks: every
+    target runs one action of each service in SERVICES.
+    """
+    services = list(config["SERVICES"])
+    targets_per_team = int(config["TARGETS_PER_TEAM"])
+    target_count = max(1, math.ceil(check_count / len(services)))
+    fake = _fake_names(config["SEED"])
+
+    teams = []
+    for target_index in range(target_count):
+        team_index = target_index // targets_per_team
+        if team_index == len(teams):
+            teams.append(
+                {
+                    "TEAM_NAME": fake.company() if fake else f"Team {team_index + 1}",
+                    "TEAM_ID": team_index + 1,
+                    "TARGETS": [],
+                }
+            )
+        teams[team_index]["TARGETS"].append(
+            {
+                "ID": target_index + 1,
+                # Unique addresses so per-target limits behave as with real teams.
+                "IP": f"10.{target_index >> 16 & 255}.{target_index >> 8 & 255}.{target_index & 255}",
+                "ACTIONS": [_action(service, fake, target_index) for service in services],
+            }
+        )
+    return {"TEAMS": teams}
+
+
+def dry_run_persist(round_writes) -> int:
+    """Stands in for DBConnector.persist_round: counts the rows it would write."""
+    return round_writes.rows_written
+
+
+class Simulation:
+    """
+    Drives the engine through rounds of growing size with simulated checks,
+    and reports how the round scales.
+    """
+
+    def __init__(self, settings: dict = None):
+        self.config = dict(DEFAULT_SETTINGS)
+        self.config.update(settings or {})
+        self.sizes = [int(size) for size in self.config["SIZES"]]
+        self.rounds_per_size = int(self.config["ROUNDS_PER_SIZE"])
+        self.rows = []
+        self._size_index = -1
+        self._teams = None
+        self._round_start = 0.0
+        self._cpu_start = 0.0
+
+    def install(self):
+        """Replace every registered check with SimulatedCheck."""
+        global _behavior
+        _behavior = Behavior(self.config)
+        SimulatedCheck.timeout = _behavior.timeout_seconds
+        for service_name in CheckRegistry.CHECK_PLUGINS:
+            CheckRegistry.register_check(service_name, __name__, "SimulatedCheck")
+
+    def config_for_round(self, round_number: int, loaded_vars: dict):
+        """
+        The config to run this round with, the real ENGINE settings plus
+        simulated TEAMS. Returns None once every size has been run.
+        """
+        size_index = (round_number - 1) // self.rounds_per_size
+        if size_index >= len(self.sizes):
+            return None
+        if size_index != self._size_index:
+            self._size_index = size_index
+            # Drop the previous size's config before building the next one.
+            self._teams = None
+            self._teams = generate_config(self.sizes[size_index], self.config)["TEAMS"]
+            logger.info("Simulating %d checks per round", self.sizes[size_index])
+        simulated_vars = dict(loaded_vars)
+        simulated_vars["TEAMS"] = self._teams
+        return simulated_vars
+
+    def start_round(self):
+        self._round_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def end_round(self, round_number: int, service_checks: list, result_bytes: int):
+        """Measure a finished round."""
+        seconds = time.perf_counter() - self._round_start
+        cpu_seconds = time.process_time() - self._cpu_start
+        waits = sorted(service_check.queue_wait for service_check in service_checks)
+        slowest = max(
+            (service_check.duration for service_check in service_checks), default=0.0
+        )
+        row = {
+            "round": round_number,
+            "checks": len(service_checks),
+            "round_seconds": round(seconds, 3),
+            "slowest_check_seconds": round(slowest, 3),
+            # Simulated checks only sleep, so all CPU time is engine overhead.
+            "cpu_us_per_check": round(cpu_seconds / max(1, len(service_checks)) * 1e6, 1),
+            "loop_busy": round(cpu_seconds / seconds, 3) if seconds else 0.0,
+            "queue_wait_p50": round(percentile(waits, 0.50), 3),
+            "queue_wait_p99": round(percentile(waits, 0.99), 3),
+            "rss_mb": round(rss_bytes() / 2**20, 1),
+            "result_bytes": result_bytes,
+        }
+        self.rows.append(row)
+        logger.info(
+            "Simulated round %d: %d checks in %.2fs (slowest check %.2fs), "
+            "%.1fus CPU per check, loop %.0f%% busy, queue wait p99 %.2fs, RSS %.1f MB",
+            round_number,
+            row["checks"],
+            row["round_seconds"],
+            row["slowest_check_seconds"],
+            row["cpu_us_per_check"],
+            row["loop_busy"] * 100,
+            row["queue_wait_p99"],
+            row["rss_mb"],
+        )
+
+    def report(self) -> str:
+        """A table of every simulated round."""
+        lines = [
+            f"{'checks':>8} {'round s':>8} {'slowest s':>9} {'CPU us/check':>12} "
+            f"{'loop busy':>9} {'wait p99 s':>10} {'RSS MB':>8}"
+        ]
+        for row in self.rows:
+            lines.append(
+                f"{row['checks']:>8} {row['round_seconds']:>8.2f} {row['slowest_check_seconds']:>9.2f} "
+                f"{row['cpu_us_per_check']:>12.1f} {row['loop_busy'] * 100:>8.0f}% "
+                f"{row['queue_wait_p99']:>10.2f} {row['rss_mb']:>8.1f}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+import concurrent.futures
+import contextvars
+import json
+import os
+import time
+
+from .EngineLogger import get_logger
+
+logger = get_logger("tracing")
+
+# Defaults for the ENGINE -> TRACING section of EnvVars.yaml.
+DEFAULT_SETTINGS = {
+    "ENABLED": False,
+    "DIRECTORY": "traces",
+    "EVERY_ROUNDS": 10,
+}
+
+# Span list of the check running in the current task, None when the round
+# is not traced. Read when a check hands work to the executor.
+current_spans = contextvars.ContextVar("current_spans", default=None)
+
+_tracer = None
+
+
+class TracingExecutor(concurrent.futures.ThreadPoolExecutor):
+    """
+    Default executor that records how long a traced check's call waited for
+    a free worker thread and how long it ran. Untraced calls go straight through.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        spans = current_spans.get()
+        if spans is None:
+            return super().submit(fn, *args, **kwargs)
+        submitted = time.perf_counter()
+
+        def traced_call():
+            started = time.perf_counter()
+            spans.append(("executor wait", submitted, started - submitted))
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                spans.append(("executor", started, time.perf_counter() - started))
+
+        return super().submit(traced_call)
+
+
+class RoundTracer:
+    """
+    Collects the spans of every check in a sampled round and writes them as a
+    Chrome trace (chrome://tracing, ui.perfetto.dev). Each team is a process
+    and each check a thread in the viewer.
+    """
+
+    def __init__(self, settings: dict = None):
+        config = dict(DEFAULT_SETTINGS)
+        config.update(settings or {})
+        self.directory = config["DIRECTORY"]
+        self.every_rounds = max(1, int(config["EVERY_ROUNDS"]))
+        self.round_number = 0
+        self.round_start = 0.0
+        self.active = False
+        # (service_check, start, end) for every check of the traced round.
+        self._checks = []
+        os.makedirs(self.directory, exist_ok=True)
+
+    def start_round(self, round_number: int):
+        """Trace rounds 1, 1 + EVERY_ROUNDS, 1 + 2 * EVERY_ROUNDS, ..."""
+        self.round_number = round_number
+        self.active = (round_number - 1) % self.every_rounds == 0
+        self.round_start = time.perf_counter()
+        self._checks = []
+
+    def end_round(self):
+        """
+        Write the round's trace if it was sampled. Returns the file path or None.
+        Blocking, call it from the executor.
+        """
+        if not self.active:
+            return None
+        self.active = False
+        path = os.path.join(self.directory, f"round-{self.round_number:06d}.trace.json")
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump(
+                {"traceEvents": self._events(), "displayTimeUnit": "ms"},
+                trace_file,
+                separators=(",", ":"),
+                default=str,
+            )
+        logger.info(
+            "Round %d trace written to %s (%d checks)",
+            self.round_number,
+            path,
+            len(self._checks),
+        )
+        self._checks = []
+        return path
+
+    def add_check(self, service_check, start: float, end: float):
+        self._checks.append((service_check, start, end))
+
+    def _micros(self, seconds: float) -> float:
+        return round((seconds - self.round_start) * 1e6, 1)
+
+    def _events(self) -> list:
+        events = []
+        team_pids = {}
+        for tid, (service_check, start, end) in enumerate(self._checks, 1):
+            pid = team_pids.get(service_check.team_id)
+            if pid is None:
+                pid = team_pids[service_check.team_id] = len(team_pids) + 1
+                events.append(
+                    {
+                        "ph": "M",
+                        "name": "process_name",
+                        "pid": pid,
+                        "args": {"name": f"team {service_check.team_id} {service_check.team_name}"},
+                    }
+                )
+            events.append(
+                {
+                    "ph": "M",
+                    "name": "thread_name",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": f"{service_check.service_name} {service_check.target_host}"},
+                }
+            )
+            result_code = service_check.result.result
+            events.append(
+                {
+                    "ph": "X",
+                    "name": service_check.service_name,
+                    "cat": "check",
+                    "pid": pid,
+                    "tid": tid,
+                    "ts": self._micros(start),
+                    "dur": round((end - start) * 1e6, 1),
+                    "args": {
+                        "team_id": service_check.team_id,
+                        "target_id": service_check.target_id,
+                        "target_host": service_check.target_host,
+                        "result": result_code.value if result_code else None,
+                        "queue_wait": round(service_check.queue_wait, 6),
+                    },
+                }
+            )
+            if service_check.queue_wait:
+                # Time spent in the scheduler queue, right before the check started.
+                events.append(
+                    {
+                        "ph": "X",
+                        "name": "scheduler wait",
+                        "cat": "queue",
+                        "pid": pid,
+                        "tid": tid,
+                        "ts": self._micros(start - service_check.queue_wait),
+                        "dur": round(service_check.queue_wait * 1e6, 1),
+                    }
+                )
+            for name, span_start, elapsed in service_check.spans:
+                events.append(
+                    {
+                        "ph": "X",
+                        "name": name,
+                        "cat": "phase",
+                        "pid": pid,
+                        "tid": tid,
+                        "ts": self._micros(span_start),
+                        "dur": round(elapsed * 1e6, 1),
+                    }
+                )
+        return events
+
+
+def configure(settings: dict = None):
+    """Set up tracing from ENGINE -> TRACING. Returns the tracer, or None when disabled."""
+    global _tracer
+    config = dict(DEFAULT_SETTINGS)
+    config.update(settings or {})
+    _tracer = RoundTracer(config) if config["ENABLED"] else None
+    return _tracer
+
+
+def begin_check(service_check):
+    """Start collecting spans for a check if this round is traced."""
+    if _tracer is None or not _tracer.active:
+        return
+    service_check.spans = []
+    current_spans.set(service_check.spans)
+
+
+def end_check(service_check, start: float, end: float):
+    """Add a finished check to the round's trace."""
+    if service_check.spans is None or _tracer is None or not _tracer.active:
+        return
+    _tracer.add_check(service_check, start, end)
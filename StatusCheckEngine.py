@@ -1,45 +1,443 @@
 #!/usr/bin/env python3
+import argparse
 import asyncio
+import signal
+import time
+import uuid
 from ServiceCheckScripts import PrepareServiceChecks
 from ServiceCheckScripts import ExecuteServiceCheck
+from ServiceCheckScripts import CheckRegistry
 from ServiceCheckScripts import ImportEnvVars
 from ServiceCheckScripts import Scoring
+from ServiceCheckScripts import EngineLogger
+from ServiceCheckScripts import ResultExport
+from ServiceCheckScripts import Results
+from ServiceCheckScripts import CircuitBreaker
+from ServiceCheckScripts import Scheduler
+from ServiceCheckScripts import Metrics
+from ServiceCheckScripts import Tracing
+from ServiceCheckScripts import Profiling
+from ServiceCheckScripts import EventLoop
+from ServiceCheckScripts import Simulation
+from ServiceCheckScripts import Scoreboard
+from ServiceCheckScripts import Checkpoint
+from ServiceCheckScripts import Recheck
+from ServiceCheckScripts import AdaptiveTimeouts
+from ServiceCheckScripts import Preflight
+from ServiceCheckScripts import ResultRing
 from DBScripts import DBConnector
+from DBScripts import DeltaPersistence
 
+logger = EngineLogger.get_logger("engine")
 
-async def main():
+
+async def persist_round(delta_tracker, round_writes, writer=DBConnector.persist_round):
+    """Write a round's changed rows off the event loop and report the write volume."""
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        rows_written = await loop.run_in_executor(None, writer, round_writes)
+    except Exception as e:
+        # The rows and points go out with the next round instead.
+        logger.error("Failed to persist round %d: %s", round_writes.round_number, e)
+        delta_tracker.defer(round_writes)
+        return
+    finally:
+        Metrics.observe_round_phase("persist", time.perf_counter() - start)
+    delta_tracker.commit(round_writes)
+    logger.info(
+        "Round %d persisted: %d rows written (%d status, %d team), %d unchanged statuses skipped",
+        round_writes.round_number,
+        rows_written,
+        len(round_writes.status_rows),
+        len(round_writes.team_points),
+        round_writes.unchanged,
+    )
+
+
+def engine_state(run_id, delta_tracker, circuit_breakers, scoreboard) -> dict:
+    """What a checkpoint keeps across rounds."""
+    return {
+        "run_id": run_id,
+        "tracker": delta_tracker.state() if delta_tracker is not None else None,
+        "breakers": circuit_breakers.state() if circuit_breakers else None,
+        "scoreboard": scoreboard.state() if scoreboard else None,
+    }
+
+
+async def resume(checkpointer, delta_tracker, circuit_breakers, scoreboard, writer) -> tuple:
+    """
+    Restore the last checkpoint and replay the round written ahead of it.
+    Returns the run id and the last finished round number.
+    """
+    state = checkpointer.load()
+    if state is None:
+        logger.warning("No checkpoint in %s, starting from round 1", checkpointer.directory)
+        return uuid.uuid4().hex, 0
+    run_id = state["run_id"]
+    round_number = state["round_number"]
+    if delta_tracker is not None and state["tracker"] is not None:
+        delta_tracker.restore(state["tracker"])
+    if circuit_breakers and state["breakers"] is not None:
+        circuit_breakers.restore(state["breakers"])
+    if scoreboard and state["scoreboard"] is not None:
+        scoreboard.restore(state["scoreboard"])
+
+    pending_writes = checkpointer.pending_writes()
+    if delta_tracker is not None and pending_writes and pending_writes.run_id == run_id:
+        # Already written rounds are skipped by the database, so this is
+        # only applied if the crash beat the commit.
+        logger.info("Replaying round %d written ahead", pending_writes.round_number)
+        await persist_round(delta_tracker, pending_writes, writer)
+        round_number = max(round_number, pending_writes.round_number)
+    logger.info("Resuming run %s after round %d", run_id, round_number)
+    return run_id, round_number
+
+
+def simulation_settings(loaded_vars: dict, args) -> dict:
+    """ENGINE -> SIMULATION with the --simulate sizes applied."""
+    settings = dict(Simulation.DEFAULT_SETTINGS)
+    settings.update(ImportEnvVars.get_engine_settings(loaded_vars, "SIMULATION"))
+    if args.simulate:
+        settings["SIZES"] = [int(size) for size in args.simulate.split(",")]
+    return settings
+
+
+def profiling_settings(loaded_vars: dict, args) -> dict:
+    """ENGINE -> PROFILING with any command line overrides applied."""
+    settings = dict(Profiling.DEFAULT_SETTINGS)
+    settings.update(ImportEnvVars.get_engine_settings(loaded_vars, "PROFILING"))
+    if args.profile_rounds:
+        settings["ROUNDS"] = [int(number) for number in args.profile_rounds.split(",")]
+    if args.profile_every is not None:
+        settings["EVERY_ROUNDS"] = args.profile_every
+    if args.watchdog is not None:
+        settings["WATCHDOG_THRESHOLD"] = args.watchdog
+    if args.slow_callbacks is not None:
+        settings["SLOW_CALLBACK_DURATION"] = args.slow_callbacks
+    return settings
+
+
+def stop_on_sigterm():
+    """Cancel the running main task on SIGTERM so its cleanup runs."""
+    try:
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM, asyncio.current_task().cancel
+        )
+    except NotImplementedError:
+        # Windows event loops have no signal handlers.
+        pass
+
+
+async def main(args):
+    exporter = None
+    stop_on_sigterm()
     try:
         # Targets must be able to be loaded to start program
         loaded_vars = ImportEnvVars.load_env_vars()
+        EngineLogger.setup_logging(
+            ImportEnvVars.get_engine_settings(loaded_vars, "LOGGING")
+        )
+        if EventLoop.fallback_reason:
+            logger.warning(
+                "Falling back to the asyncio event loop: %s", EventLoop.fallback_reason
+            )
+        logger.info("Using the %s event loop", EventLoop.selected)
+        Results.configure_detail_limits(
+            ImportEnvVars.get_engine_settings(loaded_vars, "RESULTS")
+        )
+        export_settings = ImportEnvVars.get_engine_settings(loaded_vars, "EXPORT")
+        if export_settings.get("ENABLED"):
+            exporter = ResultExport.RoundExporter(export_settings)
+        db_settings = ImportEnvVars.get_engine_settings(loaded_vars, "DATABASE")
+        DBConnector.configure(db_settings)
+        delta_tracker = None
+        if db_settings.get("ENABLED"):
+            delta_tracker = DeltaPersistence.StatusDeltaTracker()
+        simulation = None
+        persist_writer = DBConnector.persist_round
+        if args.simulate is not None:
+            # Simulated checks over a generated config, rows are counted not written.
+            simulation = Simulation.Simulation(simulation_settings(loaded_vars, args))
+            simulation.install()
+            delta_tracker = DeltaPersistence.StatusDeltaTracker()
+            persist_writer = Simulation.dry_run_persist
+        breaker_settings = dict(CircuitBreaker.DEFAULT_SETTINGS)
+        breaker_settings.update(
+            ImportEnvVars.get_engine_settings(loaded_vars, "CIRCUIT_BREAKER")
+        )
+        circuit_breakers = None
+        if breaker_settings["ENABLED"]:
+            # Simulated breakers probe without touching the network.
+            circuit_breakers = CircuitBreaker.CircuitBreakers(
+                breaker_settings, Simulation.simulated_probe if simulation else None
+            )
+        scheduler_settings = ImportEnvVars.get_engine_settings(loaded_vars, "SCHEDULER")
+        scheduler = Scheduler.FairScheduler(scheduler_settings)
+        adaptive_timeouts = AdaptiveTimeouts.configure(
+            ImportEnvVars.get_engine_settings(loaded_vars, "ADAPTIVE_TIMEOUTS")
+        )
+        # Staff rechecks run the full check, skipping the circuit breakers.
+        recheck_queue = await Recheck.start(
+            scheduler,
+            ExecuteServiceCheck.arrange_service_check,
+            ImportEnvVars.get_engine_settings(loaded_vars, "RECHECK"),
+        )
+        # Serves /metrics when enabled, the histograms are kept either way.
+        await Metrics.start(ImportEnvVars.get_engine_settings(loaded_vars, "METRICS"))
+        scoreboard = await Scoreboard.start(
+            ImportEnvVars.get_engine_settings(loaded_vars, "SCOREBOARD")
+        )
+        result_ring = ResultRing.start(
+            ImportEnvVars.get_engine_settings(loaded_vars, "RESULT_RING")
+        )
+        tracer = Tracing.configure(
+            ImportEnvVars.get_engine_settings(loaded_vars, "TRACING")
+        )
+        if tracer:
+            # Records how long traced checks wait for an executor thread.
+            asyncio.get_running_loop().set_default_executor(Tracing.TracingExecutor())
+        profiler = Profiling.start(
+            asyncio.get_running_loop(), profiling_settings(loaded_vars, args)
+        )
+        checkpoint_settings = dict(Checkpoint.DEFAULT_SETTINGS)
+        checkpoint_settings.update(
+            ImportEnvVars.get_engine_settings(loaded_vars, "CHECKPOINT")
+        )
+        checkpointer = None
+        if checkpoint_settings["ENABLED"] or args.resume:
+            checkpointer = Checkpoint.Checkpointer(
+                checkpoint_settings["DIRECTORY"], int(checkpoint_settings["EVERY_ROUNDS"])
+            )
+        run_id = uuid.uuid4().hex
+        round_number = 0
+        if args.resume:
+            run_id, round_number = await resume(
+                checkpointer, delta_tracker, circuit_breakers, scoreboard, persist_writer
+            )
+        if scoreboard and db_settings.get("ENABLED") and simulation is None:
+            # Points on the board are the stored totals, not just this run's.
+            try:
+                team_points = await asyncio.get_running_loop().run_in_executor(
+                    None, DBConnector.load_team_points
+                )
+            except Exception as e:
+                logger.warning("Could not load team points for the scoreboard: %s", e)
+            else:
+                scoreboard.seed(team_points)
+        preflight_settings = dict(Preflight.DEFAULT_SETTINGS)
+        preflight_settings.update(
+            ImportEnvVars.get_engine_settings(loaded_vars, "PREFLIGHT")
+        )
+        round_teams = loaded_vars["TEAMS"]
+        if args.preflight or preflight_settings["ENABLED"]:
+            preflight_vars = loaded_vars
+            if simulation:
+                preflight_vars = (
+                    simulation.config_for_round(round_number + 1, loaded_vars)
+                    or loaded_vars
+                )
+            # The timeouts learned here carry into the first round.
+            round_teams = preflight_vars["TEAMS"]
+            # Full checks without the circuit breakers, so every handshake is made.
+            preflight = await Preflight.warm_up(
+                PrepareServiceChecks.prepare_service_check(preflight_vars),
+                lambda service_check: ExecuteServiceCheck.arrange_service_check(
+                    service_check, None, adaptive_timeouts
+                ),
+                preflight_settings,
+                scheduler_settings,
+                # Only the latency, warm-up timeouts don't count towards round 1.
+                adaptive_timeouts.learn if adaptive_timeouts else None,
+                # Simulated hosts don't exist.
+                resolve_hosts=simulation is None,
+            )
+            if args.preflight:
+                print(preflight.report(), flush=True)
+                return
+            for line in preflight.report().splitlines():
+                logger.info(line)
+        round_vars = loaded_vars
         while True:
-            prepare_service_checks = PrepareServiceChecks.prepare_service_check(
-                loaded_vars
+            round_number += 1
+            if simulation:
+                round_vars = simulation.config_for_round(round_number, loaded_vars)
+                if round_vars is None:
+                    print(simulation.report(), flush=True)
+                    break
+                simulation.start_round()
+            if recheck_queue:
+                recheck_queue.set_config(round_vars)
+            if adaptive_timeouts and round_vars["TEAMS"] is not round_teams:
+                # Targets may have changed, learn them again.
+                adaptive_timeouts.reset()
+            round_teams = round_vars["TEAMS"]
+            round_start = time.perf_counter()
+            if tracer:
+                tracer.start_round(round_number)
+            profiler.start_round(round_number)
+            if exporter:
+                exporter.start_round(round_number)
+            round_writes = DeltaPersistence.RoundWrites(round_number, run_id)
+            if delta_tracker is not None:
+                delta_tracker.carry_over(round_writes)
+            if circuit_breakers:
+                circuit_breakers.start_round()
+            # Bytes held by this round's feedback and details
+            result_bytes = 0
+            with Metrics.round_phase("prepare"):
+                prepare_service_checks = PrepareServiceChecks.prepare_service_check(
+                    round_vars
+                )
+            # Import only the checks this plan uses and let them set up for the round
+            plugins = CheckRegistry.load_plan(prepare_service_checks)
+            await CheckRegistry.setup_round(plugins)
+            try:
+                # Run the checks round-robin across teams, within the rate limits,
+                # and process results as they become available
+                async for result in scheduler.run_round(
+                    prepare_service_checks,
+                    lambda service_check: ExecuteServiceCheck.arrange_service_check(
+                        service_check, circuit_breakers, adaptive_timeouts
+                    ),
+                ):
+
+                    # Score all the service checks here
+                    if result:
+                        with Metrics.phase(result, "score"):
+                            scored_service_check = Scoring.score_health_check(result)
+                        Metrics.observe_check(scored_service_check)
+                        if adaptive_timeouts:
+                            adaptive_timeouts.observe(scored_service_check)
+                        logger.info(
+                            "check scored",
+                            extra=EngineLogger.check_context(scored_service_check),
+                        )
+                        result_bytes += scored_service_check.result.bytes_held
+                        if exporter:
+                            exporter.write(scored_service_check)
+                        if scoreboard:
+                            scoreboard.record(scored_service_check)
+                        if result_ring:
+                            result_ring.publish(scored_service_check, round_number)
+                        # Only changed statuses are kept for the database write
+                        if delta_tracker is not None:
+                            delta_tracker.record(round_writes, scored_service_check)
+            finally:
+                await CheckRegistry.teardown_round(plugins)
+            logger.info(
+                "Round %d finished: %d checks, %d bytes held in results",
+                round_number,
+                len(prepare_service_checks),
+                result_bytes,
             )
-            # Create a list of coroutine objects for each service check
-            tasks = [
-                ExecuteServiceCheck.arrange_service_check(service_check)
-                for service_check in prepare_service_checks
-            ]
-
-            # Use asyncio.as_completed to process results as they become available
-            for coro in asyncio.as_completed(tasks):
-
-                result = await coro  # Wait for the next task to complete
-
-                # Score all the service checks here
-                if result:
-                    scored_service_check = Scoring.score_health_check(result)
-                    print(scored_service_check.service_name)
-                    # print(scored_service_check.result.result)
-                # RESULT HANDLING HERE
-                # UNCOMMENT to enable scoring
-                # DBConnector.insert_service_health_check(scored_service_check)
+            scheduler.report(round_number)
+            if adaptive_timeouts:
+                adaptive_timeouts.report(round_number)
+            if circuit_breakers:
+                circuit_breakers.report(round_number)
+            if exporter:
+                await exporter.end_round()
+            if scoreboard:
+                scoreboard.publish(round_number)
+            if tracer:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, tracer.end_round
+                )
+            if checkpointer:
+                # The round is written ahead and checkpointed before the database
+                # flush, so a crash during the flush is replayed on resume.
+                loop = asyncio.get_running_loop()
+                if delta_tracker is not None:
+                    await loop.run_in_executor(
+                        None, checkpointer.write_ahead, round_writes
+                    )
+                await loop.run_in_executor(
+                    None,
+                    checkpointer.save,
+                    round_number,
+                    engine_state(run_id, delta_tracker, circuit_breakers, scoreboard),
+                )
+            if delta_tracker is not None:
+                await persist_round(delta_tracker, round_writes, persist_writer)
+            Metrics.observe_round(
+                round_number, time.perf_counter() - round_start, result_bytes
+            )
+            profiler.end_round()
+            if simulation:
+                simulation.end_round(round_number, prepare_service_checks, result_bytes)
+                continue
 
             # Wait 5 seconds, reattempt targets.
             await asyncio.sleep(20)
     except KeyboardInterrupt:
-        print("\nCtrl+C Detected, Quitting Status Check Engine.")
+        logger.info("Ctrl+C Detected, Quitting Status Check Engine.")
+    except asyncio.CancelledError:
+        logger.info("Stopped, Quitting Status Check Engine.")
+    finally:
+        # Writes the gzip trailers and Parquet footers, the files are unreadable without them.
+        if exporter:
+            exporter.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cyber games status check engine")
+    parser.add_argument(
+        "--loop",
+        choices=EventLoop.LOOPS,
+        help="event loop implementation, overrides ENGINE -> EVENT_LOOP -> LOOP",
+    )
+    parser.add_argument(
+        "--profile-rounds",
+        metavar="N[,N...]",
+        help="profile these rounds with cProfile and write a .prof file for each",
+    )
+    parser.add_argument(
+        "--profile-every",
+        type=int,
+        metavar="N",
+        help="profile every Nth round",
+    )
+    parser.add_argument(
+        "--watchdog",
+        type=float,
+        metavar="SECONDS",
+        help="log the event loop's stack when it is blocked this long, 0 to turn off",
+    )
+    parser.add_argument(
+        "--slow-callbacks",
+        type=float,
+        metavar="SECONDS",
+        help="asyncio debug mode, report callbacks slower than this by check type",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue from the checkpoint in ENGINE -> CHECKPOINT -> DIRECTORY",
+    )
+    parser.add_argument(
+        "--preflight",
+        action="store_true",
+        help="resolve every host and warm up every check once, print the report and exit",
+    )
+    parser.add_argument(
+        "--simulate",
+        nargs="?",
+        const="",
+        metavar="SIZE[,SIZE...]",
+        help="run simulated checks over generated teams at these check counts and report, "
+        "defaults to ENGINE -> SIMULATION -> SIZES",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    # The loop policy has to be in place before asyncio.run creates the loop.
+    EventLoop.install(
+        args.loop
+        or ImportEnvVars.get_engine_settings(
+            ImportEnvVars.load_env_vars(), "EVENT_LOOP"
+        ).get("LOOP")
+    )
+    asyncio.run(main(args))
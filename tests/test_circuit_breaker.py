@@ -0,0 +1,32 @@
+import pytest
+
+from ServiceCheckScripts.CircuitBreaker import CircuitBreakers, probe_address
+from ServiceCheckScripts.Results import HTTPInfo, HTTPSInfo, ServiceHealthCheck
+
+
+def test_http_probe_uses_the_url_host_and_port():
+    http_info = HTTPInfo()
+    http_info.url = "www.team1.example:8080"
+    service_check = ServiceHealthCheck(
+        "10.0.0.1", "team", "1", 1, "HTTP", http_info=http_info, target_port="80"
+    )
+    assert probe_address(service_check) == ("www.team1.example", 8080)
+
+
+def test_https_probe_uses_the_url_host_and_port():
+    https_info = HTTPSInfo()
+    https_info.url = "secure.team1.example"
+    service_check = ServiceHealthCheck(
+        "10.0.0.1", "team", "1", 1, "HTTPS", https_info=https_info, target_port="8443"
+    )
+    assert probe_address(service_check) == ("secure.team1.example", 8443)
+
+
+def test_probe_falls_back_to_the_service_port():
+    service_check = ServiceHealthCheck("10.0.0.1", "team", "1", 1, "SSH", target_port="None")
+    assert probe_address(service_check) == ("10.0.0.1", 22)
+
+
+def test_full_check_every_must_be_positive():
+    with pytest.raises(ValueError):
+        CircuitBreakers({"FULL_CHECK_EVERY": 0})
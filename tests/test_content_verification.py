@@ -0,0 +1,49 @@
+import hashlib
+
+from ServiceCheckScripts.ContentVerification import ContentVerifier
+
+
+def read_page(verifier: ContentVerifier, page: bytes, chunk_size: int):
+    """Feed a page the way the HTTP checks do, stopping when the verifier is done."""
+    for start in range(0, len(page), chunk_size):
+        if verifier.feed(page[start : start + chunk_size]):
+            break
+
+
+def test_page_exactly_at_the_cap_is_checked():
+    page = b"a" * 64
+    verifier = ContentVerifier(md5_sum=hashlib.md5(page).hexdigest(), max_bytes=64)
+    read_page(verifier, page, 16)
+    assert not verifier.truncated
+    assert verifier.bytes_read == 64
+    assert verifier.problems() == []
+
+
+def test_page_one_byte_over_the_cap_is_truncated():
+    page = b"a" * 65
+    verifier = ContentVerifier(md5_sum=hashlib.md5(page).hexdigest(), max_bytes=64)
+    read_page(verifier, page, 16)
+    assert verifier.truncated
+    assert verifier.bytes_read == 64
+    assert verifier.problems() == ["page is larger than 64 bytes, MD5 not checked"]
+
+
+def test_cap_on_a_chunk_boundary_reads_one_more_chunk():
+    # The cap lands on the end of the fourth chunk, the fifth tells the
+    # verifier the page goes on.
+    page = b"a" * 80
+    verifier = ContentVerifier(md5_sum=hashlib.md5(page[:64]).hexdigest(), max_bytes=64)
+    fed = 0
+    for start in range(0, len(page), 16):
+        fed += 1
+        if verifier.feed(page[start : start + 16]):
+            break
+    assert fed == 5
+    assert verifier.truncated
+    assert verifier.problems() == ["page is larger than 64 bytes, MD5 not checked"]
+
+
+def test_substring_split_across_chunks_is_found():
+    verifier = ContentVerifier(substring="needle", max_bytes=64)
+    read_page(verifier, b"xxxxxxxxxxnee" + b"dlexxxxx", 13)
+    assert verifier.problems() == []
@@ -0,0 +1,73 @@
+import asyncio
+
+from DBScripts.DeltaPersistence import RoundWrites, StatusDeltaTracker
+from ServiceCheckScripts.Results import ServiceHealthCheck
+from StatusCheckEngine import persist_round
+
+
+def scored_check(team_id: str, target_id: int, points: int, feedback: str = "up"):
+    service_check = ServiceHealthCheck("10.0.0.1", "team", team_id, target_id, "TCP")
+    service_check.result.success(feedback=feedback)
+    service_check.points = points
+    return service_check
+
+
+class FlakyWriter:
+    """Stands in for the database write, failing the first `failures` calls."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.written = []
+
+    def __call__(self, round_writes: RoundWrites) -> int:
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database went away")
+        self.written.append(round_writes)
+        return round_writes.rows_written
+
+
+def play_round(tracker, writer, round_number, checks):
+    round_writes = RoundWrites(round_number)
+    tracker.carry_over(round_writes)
+    for service_check in checks:
+        tracker.record(round_writes, service_check)
+    asyncio.run(persist_round(tracker, round_writes, writer))
+    return round_writes
+
+
+def test_failed_persist_carries_rows_and_points_to_the_next_round():
+    tracker = StatusDeltaTracker()
+    writer = FlakyWriter(failures=1)
+
+    play_round(tracker, writer, 1, [scored_check("1", 1, 5), scored_check("2", 1, 3)])
+    assert writer.written == []
+    assert len(tracker) == 0
+
+    play_round(tracker, writer, 2, [scored_check("1", 1, 5), scored_check("2", 1, 3)])
+    (round_two,) = writer.written
+    assert round_two.team_points == {1: 10, 2: 6}
+    assert set(round_two.status_rows) == {(1, 1, "TCP"), (2, 1, "TCP")}
+    assert len(tracker) == 2
+
+
+def test_points_survive_several_failed_persists():
+    tracker = StatusDeltaTracker()
+    writer = FlakyWriter(failures=2)
+    for round_number in (1, 2, 3):
+        play_round(tracker, writer, round_number, [scored_check("1", 1, 5)])
+    (round_three,) = writer.written
+    assert round_three.team_points == {1: 15}
+
+
+def test_carried_row_is_dropped_when_status_returns_to_the_persisted_one():
+    tracker = StatusDeltaTracker()
+    writer = FlakyWriter(failures=0)
+    play_round(tracker, writer, 1, [scored_check("1", 1, 5, "up")])
+
+    writer.failures = 1
+    play_round(tracker, writer, 2, [scored_check("1", 1, 0, "down")])
+    play_round(tracker, writer, 3, [scored_check("1", 1, 5, "up")])
+    round_three = writer.written[-1]
+    assert round_three.status_rows == {}
+    assert round_three.team_points == {1: 5}
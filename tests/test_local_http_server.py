@@ -0,0 +1,46 @@
+import asyncio
+
+from ServiceCheckScripts.LocalHTTPServer import LocalHTTPServer, MAX_BODY_BYTES, Response
+
+
+async def exchange(request: bytes) -> bytes:
+    async def echo(request, writer):
+        return Response(200, request.body)
+
+    server = LocalHTTPServer("127.0.0.1", 0)
+    server.route("/echo", echo)
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(request)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return response
+    finally:
+        await server.stop()
+
+
+def post(content_length: str, body: bytes = b"") -> bytes:
+    return (
+        b"POST /echo HTTP/1.1\r\nConnection: close\r\nContent-Length: "
+        + content_length.encode()
+        + b"\r\n\r\n"
+        + body
+    )
+
+
+def test_body_is_read():
+    response = asyncio.run(exchange(post("5", b"hello")))
+    assert response.startswith(b"HTTP/1.1 200 ")
+    assert response.endswith(b"hello")
+
+
+def test_malformed_content_length_is_rejected():
+    assert asyncio.run(exchange(post("five"))).startswith(b"HTTP/1.1 400 ")
+    assert asyncio.run(exchange(post("-1"))).startswith(b"HTTP/1.1 400 ")
+
+
+def test_oversized_body_is_rejected():
+    response = asyncio.run(exchange(post(str(MAX_BODY_BYTES + 1))))
+    assert response.startswith(b"HTTP/1.1 413 ")
@@ -0,0 +1,16 @@
+import time
+
+from ServiceCheckScripts.Metrics import phase, timed_calls
+from ServiceCheckScripts.Results import ServiceHealthCheck
+
+
+def test_timed_calls_move_their_time_out_of_the_enclosing_phase():
+    service_check = ServiceHealthCheck("10.0.0.1", "team", "1", 1, "HTTP")
+    feed = timed_calls(lambda chunk: time.sleep(0.01))
+    with phase(service_check, "transfer"):
+        for chunk in range(3):
+            feed(chunk)
+        time.sleep(0.01)
+    feed.split(service_check, "hash", "transfer")
+    assert service_check.phases["hash"] >= 0.03
+    assert 0.01 <= service_check.phases["transfer"] < service_check.phases["hash"]